@@ -0,0 +1,15 @@
+"""
+Punto de entrada ASGI, con las variantes asíncronas de los endpoints JSON
+(ASYNC_VIEWS=1, ver main/async_views.py).
+
+El despliegue de render.yaml sigue en WSGI. Para servir con ASGI:
+    uvicorn baseDeProyectos.asgi:application --host 0.0.0.0 --port $PORT --workers 2
+`python manage.py compare_sync_async` mide antes ambos modos en la misma máquina.
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'baseDeProyectos.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
@@ -31,10 +31,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    'main.snapshots.SnapshotFallbackMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.profiling.ProfilingMiddleware',
+    'main.db_router.ReplicaPinningMiddleware',
+    'main.cache.CacheInvalidationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,6 +62,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'baseDeProyectos.wsgi.application'
+ASGI_APPLICATION = 'baseDeProyectos.asgi.application'
+
+# Variantes asíncronas de los endpoints JSON (main/async_views.py). Las activa
+# baseDeProyectos/asgi.py; bajo WSGI se sirven siempre las vistas síncronas
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
@@ -71,6 +80,131 @@ DATABASES = {
         ssl_require=False
     )
 }
+
+# Réplica de solo lectura opcional para listados, búsquedas y recomendaciones
+# (ver main/db_router.py). En local: DATABASE_REPLICA_URL=sqlite:///ruta/replica.sqlite3
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.parse(
+        os.environ['DATABASE_REPLICA_URL'],
+        conn_max_age=600,
+        ssl_require=False
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Perfil de rendimiento para SQLite (WAL, transacciones IMMEDIATE, ver main/sqlite.py)
+SQLITE_PERFORMANCE_PROFILE = os.environ.get('SQLITE_PERFORMANCE_PROFILE') == '1'
+
+if SQLITE_PERFORMANCE_PROFILE and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    })
+
+DATABASE_ROUTERS = ['main.db_router.ReplicaRouter']
+
+# Segundos que una sesión lee de la base principal después de escribir
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+# Caché compartida (nivel 2 de main/cache.py): memcached si se define
+# MEMCACHED_LOCATION (requiere pymemcache), archivos en disco por defecto y memoria local con
+# CACHE_BACKEND=locmem (pruebas)
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+elif os.environ.get('CACHE_BACKEND') == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('FILE_CACHE_DIR', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Reservas atómicas entre procesos (main/leases.py): con memcached van a la caché;
+# con otros backends, a archivos bloqueados con flock en este directorio
+LEASE_DIR = os.environ.get('LEASE_DIR', str(BASE_DIR / '.leases'))
+
+# Intervalo mínimo entre lecturas del bus de invalidación de caché por proceso
+CACHE_BUS_POLL_INTERVAL_MS = int(os.environ.get('CACHE_BUS_POLL_INTERVAL_MS', 500))
+
+# Cola de trabajos en segundo plano (main/jobs.py). Por defecto, sin worker, los
+# trabajos se ejecutan en un hilo del propio proceso web al confirmar la
+# transacción; donde corre `python manage.py run_worker` (Procfile) los procesos
+# web deben usar JOB_QUEUE_EAGER=0
+JOB_QUEUE_EAGER = os.environ.get('JOB_QUEUE_EAGER', '1') == '1'
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get('JOB_VISIBILITY_TIMEOUT', 600))
+
+# Registro de eventos de actividad en segmentos NDJSON (main/events.py); se
+# agregan a tablas diarias con `python manage.py ingest_events`
+EVENT_LOG_ENABLED = os.environ.get('EVENT_LOG_ENABLED', '1') == '1'
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', str(BASE_DIR / 'eventlog'))
+EVENT_LOG_SEGMENT_BYTES = int(os.environ.get('EVENT_LOG_SEGMENT_BYTES', 8 * 1024 * 1024))
+EVENT_LOG_SEGMENT_SECONDS = int(os.environ.get('EVENT_LOG_SEGMENT_SECONDS', 300))
+EVENT_LOG_BUFFER_SIZE = int(os.environ.get('EVENT_LOG_BUFFER_SIZE', 100))
+EVENT_LOG_FLUSH_SECONDS = float(os.environ.get('EVENT_LOG_FLUSH_SECONDS', 1))
+
+# Contador de visitas de recetas (main/view_counts.py): cada cuánto se vuelcan
+# los incrementos acumulados y ventana en la que un visitante cuenta una vez
+VIEW_COUNT_FLUSH_SECONDS = float(os.environ.get('VIEW_COUNT_FLUSH_SECONDS', 5))
+VIEW_DEDUP_SECONDS = int(os.environ.get('VIEW_DEDUP_SECONDS', 1800))
+
+# Instantáneas HTML de respaldo (main/snapshots.py, `python manage.py export_snapshots`):
+# se sirven a los anónimos cuando la latencia de las consultas supera el umbral de forma
+# sostenida (mediana de la ventana, con un mínimo de peticiones)
+SNAPSHOT_FALLBACK_ENABLED = os.environ.get('SNAPSHOT_FALLBACK_ENABLED', '1') == '1'
+SNAPSHOT_FALLBACK_LATENCY_MS = float(os.environ.get('SNAPSHOT_FALLBACK_LATENCY_MS', 250))
+SNAPSHOT_FALLBACK_COOLDOWN = int(os.environ.get('SNAPSHOT_FALLBACK_COOLDOWN', 30))
+SNAPSHOT_FALLBACK_WINDOW = float(os.environ.get('SNAPSHOT_FALLBACK_WINDOW', 10))
+SNAPSHOT_FALLBACK_MIN_SAMPLES = int(os.environ.get('SNAPSHOT_FALLBACK_MIN_SAMPLES', 20))
+# La tarea snapshots.export las regenera periódicamente (además de en el build)
+SNAPSHOT_REFRESH_SECONDS = int(os.environ.get('SNAPSHOT_REFRESH_SECONDS', 900))
+# Las instantáneas llevan el hash del contenido en el nombre: caché de un año
+WHITENOISE_IMMUTABLE_FILE_TEST = r'/snapshots/.+\.[0-9a-f]{12}\.html$'
+
+# Métricas de todos los procesos (main/metrics.py) en /metrics/: accesibles para los
+# administradores o con la cabecera "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Cada proceso vuelca aquí sus métricas y /metrics/ suma las de todos (main/metrics.py)
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_DUMP_SECONDS = float(os.environ.get('METRICS_DUMP_SECONDS', 5))
+# Presupuesto por ejecución de cada proceso instrumentado; al superarlo se
+# escribe una línea JSON con el desglose por etapas en el log main.metrics
+PIPELINE_BUDGETS_MS = {
+    'smart_recommendations': int(os.environ.get('SMART_RECOMMENDATIONS_BUDGET_MS', 1000)),
+}
+
+# Perfilado por muestreo (main/profiling.py): fracción de peticiones perfiladas
+# (con 0 solo las que pida un administrador con ?_profile=1 o "X-Profile: 1") y
+# búfer circular en disco con los últimos perfiles
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', 50))
+
+# Control de admisión de las vistas caras (main/admission.py): plazas simultáneas
+# entre todos los workers, puestos en cola, espera máxima (s) y caducidad de una plaza (s)
+ADMISSION_CONTROL = {
+    'smart_recommendations': {
+        'concurrency': int(os.environ.get('SMART_RECOMMENDATIONS_CONCURRENCY', 2)),
+        'queue': 4, 'timeout': 2.0, 'lease': 60,
+    },
+    'recommendations': {
+        'concurrency': int(os.environ.get('RECOMMENDATIONS_CONCURRENCY', 4)),
+        'queue': 8, 'timeout': 2.0, 'lease': 60,
+    },
+}
+
+# Sesiones en caché con respaldo en base de datos
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -108,6 +242,8 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
+# Instantáneas de respaldo (main/snapshots.py); dentro de STATIC_ROOT para que las sirva WhiteNoise
+SNAPSHOT_ROOT = os.environ.get('SNAPSHOT_ROOT', str(STATIC_ROOT / 'snapshots'))
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
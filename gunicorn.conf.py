@@ -0,0 +1,43 @@
+"""
+Configuración de gunicorn (se lee automáticamente desde el directorio del proyecto).
+
+Con preload_app la aplicación se carga en el proceso maestro antes de crear
+los workers, y when_ready calienta las cachés allí mismo (ver main/warmup.py):
+la caché compartida queda llena y los workers heredan la LRU en memoria.
+Mientras tanto no se atienden peticiones, así que el calentamiento se corta a
+los WARM_CACHES_TIMEOUT segundos (lo que falte se llena con las primeras
+visitas). Se desactiva con WARM_CACHES_ON_START=0.
+"""
+import os
+import time
+
+preload_app = True
+
+def when_ready(server):
+    if os.environ.get('WARM_CACHES_ON_START', '1') != '1':
+        return
+
+    from django.core.cache import caches
+    from django.db import connections
+    from main.warmup import warm, warmup_targets
+
+    started = time.perf_counter()
+    try:
+        results = warm(warmup_targets(
+            list_pages=int(os.environ.get('WARM_CACHES_LIST_PAGES', 3)),
+            users=int(os.environ.get('WARM_CACHES_USERS', 10)),
+        ), timeout=float(os.environ.get('WARM_CACHES_TIMEOUT', 15)))
+    except Exception:
+        # Sin calentar la aplicación sigue funcionando
+        server.log.exception('No se pudieron calentar las cachés')
+        return
+    finally:
+        # Las conexiones abiertas en el maestro no deben heredarlas los workers
+        connections.close_all()
+        caches.close_all()
+
+    failed = [result for result in results if not result.ok]
+    server.log.info('Cachés calentadas: %s entradas en %.1fs (%s con error)',
+                    len(results), time.perf_counter() - started, len(failed))
+    for result in failed:
+        server.log.warning('Calentamiento de %s falló: %s', result.label, result.detail)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import CustomUser, Recipe, Ingredient, Tag, RecipeIngredient, RecipeImage, RecipeLike, UserSearchHistory, UserPreference
+from .models import (CustomUser, Recipe, Ingredient, Tag, RecipeIngredient, RecipeImage, RecipeLike, UserSearchHistory,
+                     UserPreference, SearchTermStat, SearchIngredientStat, SearchTagStat, DeletionJob, Job,
+                     EventDailyCount, RecipeDailyStat, SearchTermDailyCount, IngestedEventSegment)
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -27,7 +29,7 @@ class RecipeImageInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author', 'difficulty', 'prep_time', 'cook_time', 'servings', 'is_published', 'created_at']
+    list_display = ['title', 'author', 'difficulty', 'prep_time', 'cook_time', 'servings', 'is_published', 'view_count', 'created_at']
     list_filter = ['difficulty', 'is_published', 'created_at', 'tags']
     search_fields = ['title', 'description', 'author__username']
     filter_horizontal = ['tags']
@@ -48,7 +50,54 @@ class UserSearchHistoryAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['user__username', 'search_term']
 
+@admin.register(SearchTermStat)
+class SearchTermStatAdmin(admin.ModelAdmin):
+    list_display = ['user', 'term', 'count', 'last_searched_at']
+    search_fields = ['user__username', 'term']
+
+@admin.register(SearchIngredientStat)
+class SearchIngredientStatAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ingredient', 'count', 'last_searched_at']
+    search_fields = ['user__username', 'ingredient__name']
+
+@admin.register(SearchTagStat)
+class SearchTagStatAdmin(admin.ModelAdmin):
+    list_display = ['user', 'tag', 'count', 'last_searched_at']
+    search_fields = ['user__username', 'tag__name']
+
 @admin.register(UserPreference)
 class UserPreferenceAdmin(admin.ModelAdmin):
     list_display = ['user']
-    filter_horizontal = ['favorite_tags', 'favorite_ingredients']
\ No newline at end of file
+    filter_horizontal = ['favorite_tags', 'favorite_ingredients']
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ['target_type', 'target_label', 'status', 'deleted_rows', 'total_rows', 'created_at', 'finished_at']
+    list_filter = ['status', 'target_type']
+    readonly_fields = ['started_at', 'finished_at']
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'run_at', 'locked_by', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'unique_key']
+
+@admin.register(EventDailyCount)
+class EventDailyCountAdmin(admin.ModelAdmin):
+    list_display = ['day', 'event_type', 'count']
+    list_filter = ['event_type']
+    date_hierarchy = 'day'
+
+@admin.register(RecipeDailyStat)
+class RecipeDailyStatAdmin(admin.ModelAdmin):
+    list_display = ['day', 'recipe_id', 'views', 'likes', 'unlikes']
+    date_hierarchy = 'day'
+
+@admin.register(SearchTermDailyCount)
+class SearchTermDailyCountAdmin(admin.ModelAdmin):
+    list_display = ['day', 'term', 'count']
+    search_fields = ['term']
+    date_hierarchy = 'day'
+
+@admin.register(IngestedEventSegment)
+class IngestedEventSegmentAdmin(admin.ModelAdmin):
+    list_display = ['name', 'events', 'ingested_at']
@@ -0,0 +1,108 @@
+"""
+Control de admisión para las vistas caras.
+
+Cada vista limitada tiene `concurrency` plazas compartidas por todos los
+procesos: reservas atómicas de main/leases.py (como el candado de
+cache.get_or_compute) que caducan solas tras `lease` segundos si el worker que
+las tenía muere. Sin plaza libre, la petición espera en una cola de `queue`
+puestos (también reservas) hasta `timeout` segundos; si la
+cola está llena o se agota la espera, se responde con la versión degradada de
+la vista en lugar de seguir ocupando el worker.
+
+Los límites se configuran por vista en settings.ADMISSION_CONTROL; admitidas,
+rechazadas (por motivo) y respuestas degradadas se exportan en /metrics/.
+"""
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+
+from . import leases, metrics
+
+DEFAULT_LIMITS = {'concurrency': 4, 'queue': 8, 'timeout': 2.0, 'lease': 60}
+POLL_INTERVAL = 0.05
+
+admitted = metrics.counter('admission_admitted_total', 'Peticiones admitidas en vistas con control de admisión')
+rejected = metrics.counter('admission_rejected_total', 'Peticiones no admitidas, por vista y motivo')
+degraded = metrics.counter('admission_fallback_total', 'Respuestas degradadas servidas, por vista')
+wait_seconds = metrics.histogram('admission_wait_seconds', 'Espera hasta obtener plaza, por vista')
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class Limiter:
+    """Semáforo con cola acotada compartido entre procesos a través de reservas atómicas"""
+
+    def __init__(self, name, concurrency, queue, timeout, lease):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.lease = lease
+
+    def _take(self, kind, size, token, timeout):
+        for i in range(size):
+            key = f'admission:{self.name}:{kind}:{i}'
+            if leases.add(key, token, timeout):
+                return key
+        return None
+
+    def _give_back(self, key, token):
+        leases.release(key, token)
+
+    def acquire(self):
+        """Devuelve (clave, token) de la plaza obtenida o lanza AdmissionRejected"""
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        slot = self._take('slot', self.concurrency, token, self.lease)
+        if slot is None:
+            ticket = self._take('queue', self.queue, token, int(self.timeout) + 1)
+            if ticket is None:
+                raise AdmissionRejected('queue_full')
+            try:
+                deadline = started + self.timeout
+                while slot is None and time.monotonic() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    slot = self._take('slot', self.concurrency, token, self.lease)
+            finally:
+                self._give_back(ticket, token)
+            if slot is None:
+                raise AdmissionRejected('timeout')
+        wait_seconds.observe(time.monotonic() - started, view=self.name)
+        return slot, token
+
+    def release(self, acquired):
+        self._give_back(*acquired)
+
+def get_limiter(name):
+    limits = {**DEFAULT_LIMITS, **getattr(settings, 'ADMISSION_CONTROL', {}).get(name, {})}
+    return Limiter(name, limits['concurrency'], limits['queue'], limits['timeout'], limits['lease'])
+
+def admission_control(name, fallback):
+    """
+    Limita la vista decorada; cuando está saturada responde con
+    fallback(request, *args, **kwargs), marcada con la cabecera X-Degraded
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limiter = get_limiter(name)
+            try:
+                acquired = limiter.acquire()
+            except AdmissionRejected as e:
+                rejected.inc(view=name, reason=e.reason)
+                degraded.inc(view=name)
+                response = fallback(request, *args, **kwargs)
+                response['X-Degraded'] = e.reason
+                return response
+
+            admitted.inc(view=name)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                limiter.release(acquired)
+        return wrapper
+    return decorator
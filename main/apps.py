@@ -0,0 +1,25 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+
+
+class MainConfig(AppConfig):
+    name = 'main'
+
+    def ready(self):
+        from .sqlite import on_connection_created
+        connection_created.connect(on_connection_created, dispatch_uid='main.sqlite_profile')
+
+        from .signals import connect_signals
+        connect_signals()
+
+        # Registrar las tareas de la cola de trabajos
+        from . import tasks  # noqa: F401
+
+        # Métricas del proceso en METRICS_DIR para que /metrics/ sume las de todos
+        from .metrics import dump_if_due
+        request_finished.connect(dump_if_due, dispatch_uid='main.metrics_dump')
+
+        # Sin worker, los procesos web ejecutan también los trabajos pendientes
+        from .jobs import eager_maintenance
+        request_finished.connect(eager_maintenance, dispatch_uid='main.jobs_eager_maintenance')
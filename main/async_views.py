@@ -0,0 +1,100 @@
+"""
+Variantes asíncronas de los endpoints JSON.
+
+Solo se sirven bajo ASGI (ASYNC_VIEWS=1, que activa baseDeProyectos/asgi.py):
+con WSGI cada vista async pasaría por async_to_sync y un salto de hilo en
+cada petición. Responden igual que sus equivalentes de main/views.py, y
+compare_sync_async mide ambas implementaciones.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_POST
+
+from . import events
+from .db_router import use_replica
+from .models import CustomUser, Ingredient, Recipe
+from .sqlite import retry_on_locked
+from .views import _toggle_like
+
+@login_required
+@require_POST
+async def admin_toggle_user_status(request, user_id):
+    """Toggle activo/inactivo de un usuario"""
+    current_user = await request.auser()
+    if current_user.role != 'admin':
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    user = await aget_object_or_404(CustomUser, id=user_id, role='user')
+    user.is_active = not user.is_active
+    await user.asave(update_fields=['is_active'])
+
+    return JsonResponse({
+        'success': True,
+        'is_active': user.is_active,
+        'message': f'Usuario {"activado" if user.is_active else "desactivado"} correctamente'
+    })
+
+@login_required
+@require_POST
+async def admin_toggle_recipe_status(request, recipe_id):
+    """Toggle publicado/no publicado de una receta"""
+    user = await request.auser()
+    if user.role != 'admin':
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+
+    recipe = await aget_object_or_404(Recipe, id=recipe_id)
+    recipe.is_published = not recipe.is_published
+    await recipe.asave(update_fields=['is_published'])
+    events.emit('publish' if recipe.is_published else 'unpublish', recipe_id=recipe.id, user_id=user.id)
+
+    return JsonResponse({
+        'success': True,
+        'is_published': recipe.is_published,
+        'message': f'Receta {"publicada" if recipe.is_published else "ocultada"} correctamente'
+    })
+
+@login_required
+@require_POST
+@retry_on_locked
+async def toggle_like(request, recipe_id):
+    """Vista AJAX para dar/quitar like a una receta - Solo usuarios normales"""
+    user = await request.auser()
+    if user.role != 'user':
+        return JsonResponse({
+            'error': 'Los administradores no pueden dar "me gusta" a recetas. Esta función es exclusiva para usuarios.',
+            'liked': False,
+            'likes_count': 0
+        }, status=403)
+
+    recipe = await aget_object_or_404(Recipe, id=recipe_id)
+    # El ORM async aún no admite transacciones
+    liked = await sync_to_async(_toggle_like)(user, recipe)
+
+    return JsonResponse({
+        'liked': liked,
+        'likes_count': await recipe.likes.acount()
+    })
+
+@use_replica
+async def search_ingredients_api(request):
+    """API para buscar ingredientes en tiempo real"""
+    query = request.GET.get('q', '').strip()
+
+    if len(query) < 2:  # Solo buscar si hay al menos 2 caracteres
+        return JsonResponse({'ingredients': []})
+
+    ingredients = Ingredient.objects.filter(
+        name__icontains=query
+    ).order_by('name')[:20]  # Limitar a 20 resultados
+
+    ingredients_data = [
+        {
+            'id': ingredient.id,
+            'name': ingredient.name
+        }
+        async for ingredient in ingredients
+    ]
+
+    return JsonResponse({'ingredients': ingredients_data})
@@ -0,0 +1,371 @@
+"""
+Caché de dos niveles para la aplicación.
+
+Nivel 1: LRU en memoria de cada proceso (muy rápido, vida corta).
+Nivel 2: caché compartida de Django (settings.CACHES, archivos o memcached).
+
+Las claves se agrupan en namespaces versionados ("recipes", "catalog"...). La
+clave real es "<namespace>:v<versión>:<clave>", así que bump_namespace()
+invalida de golpe todas las entradas de una familia de modelos sin tener que
+borrarlas una a una. Los valores que devuelve el nivel local son los mismos
+objetos guardados: no deben modificarse.
+
+Las versiones viven en la tabla CacheNamespaceVersion, que hace de bus de
+invalidación entre workers y nodos: las señales de main/signals.py la
+incrementan al escribir y cada proceso la relee como mucho una vez por
+petición (y no más de una vez cada CACHE_BUS_POLL_INTERVAL_MS), descartando de
+su LRU solo los namespaces que cambiaron.
+
+Lo que solo depende de un usuario (sus recomendaciones) lleva además en la
+clave la versión de su ámbito (scope_version('user:<id>')), que vive solo en la
+caché compartida: un me gusta la cambia con bump_scopes() sin escribir en la
+base ni invalidar lo de los demás usuarios.
+
+get_or_compute() y el decorador single_flight() hacen que, cuando una clave
+cara caduca, solo un llamador (entre hilos y entre procesos) la recalcule
+mientras el resto espera un momento o recibe la copia obsoleta.
+"""
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import leases, metrics
+from .models import CacheNamespaceVersion
+
+DEFAULT_TIMEOUT = getattr(settings, 'APP_CACHE_TIMEOUT', 300)
+LOCAL_TIMEOUT = getattr(settings, 'APP_CACHE_LOCAL_TIMEOUT', 30)
+LOCAL_MAX_ENTRIES = getattr(settings, 'APP_CACHE_LOCAL_MAX_ENTRIES', 2000)
+
+# Milisegundos mínimos entre dos lecturas de las versiones por proceso
+BUS_POLL_INTERVAL = getattr(settings, 'CACHE_BUS_POLL_INTERVAL_MS', 500) / 1000
+
+# Namespaces de la aplicación
+NS_RECIPES = 'recipes'      # Recetas, imágenes, etiquetas e ingredientes de cada receta
+NS_LIKES = 'likes'          # Popularidad y tendencias (las recalcula update_trending, no cada me gusta)
+NS_CATALOG = 'catalog'      # Listados de etiquetas e ingredientes
+NS_RECOMMENDATIONS = 'recommendations'  # Por usuario, con la versión de su ámbito en la clave
+
+_MISSING = object()
+
+single_flight_outcomes = metrics.counter(
+    'cache_single_flight_total', 'Fallos de get_or_compute por resultado (computed, waited, stale, wait_timeout)'
+)
+
+class LocalLRU:
+    """LRU en memoria, segura entre hilos, con caducidad por entrada"""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=LOCAL_TIMEOUT):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+local_cache = LocalLRU()
+_versions = {}  # namespace -> versión conocida por este proceso
+_last_sync = None
+_sync_lock = threading.Lock()
+# Candado de cada clave que se está calculando con get_or_compute:
+# full_key -> [RLock, hilos que lo usan]. La entrada se borra al quedar sin uso
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+def shared_cache():
+    return caches[getattr(settings, 'APP_CACHE_ALIAS', 'default')]
+
+def sync_versions(force=False):
+    """
+    Relee las versiones de la base de datos (como mucho cada BUS_POLL_INTERVAL)
+    y descarta del nivel local los namespaces que hayan cambiado.
+    """
+    global _last_sync
+    now = time.monotonic()
+    if not force and _last_sync is not None and now - _last_sync < BUS_POLL_INTERVAL:
+        return
+    with _sync_lock:
+        if not force and _last_sync is not None and now - _last_sync < BUS_POLL_INTERVAL:
+            return
+        rows = dict(CacheNamespaceVersion.objects.values_list('namespace', 'version'))
+        for namespace, version in rows.items():
+            if _versions.get(namespace) != version:
+                local_cache.delete_prefix(f'{namespace}:')
+                _versions[namespace] = version
+        _last_sync = time.monotonic()
+
+def reset_local():
+    """Olvida la LRU y las versiones del proceso (al cambiar de base de datos y de caché)"""
+    global _last_sync
+    with _sync_lock:
+        local_cache.clear()
+        _versions.clear()
+        _last_sync = None
+
+def namespace_version(namespace):
+    """Versión actual del namespace según la última sincronización"""
+    sync_versions()
+    return _versions.get(namespace, 0)
+
+def bump_namespace(namespace):
+    """Invalida todas las claves del namespace en todos los procesos"""
+    updated = CacheNamespaceVersion.objects.filter(namespace=namespace).update(version=F('version') + 1)
+    if not updated:
+        try:
+            with transaction.atomic():
+                CacheNamespaceVersion.objects.create(namespace=namespace, version=1)
+        except IntegrityError:
+            # Otro proceso la creó a la vez
+            CacheNamespaceVersion.objects.filter(namespace=namespace).update(version=F('version') + 1)
+    sync_versions(force=True)
+    return _versions.get(namespace, 0)
+
+class CacheInvalidationMiddleware:
+    """Sincroniza las versiones del bus una vez al empezar cada petición"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sync_versions()
+        return self.get_response(request)
+
+def invalidate(*namespaces):
+    """Incrementa los namespaces cuando se confirme la transacción en curso"""
+    for namespace in namespaces:
+        transaction.on_commit(lambda namespace=namespace: bump_namespace(namespace))
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+def scope_version(scope):
+    """
+    Versión de un ámbito pequeño, guardada solo en la caché compartida. Si se
+    pierde (expulsión) se genera otra, así que nunca vuelven a servirse las
+    entradas calculadas con una versión anterior.
+    """
+    cache = shared_cache()
+    key = f'scope:{scope}'
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+def bump_scopes(*scopes):
+    """Cambia la versión de los ámbitos cuando se confirme la transacción en curso"""
+    def bump():
+        shared_cache().set_many({f'scope:{scope}': uuid.uuid4().hex[:12] for scope in scopes}, None)
+    if scopes:
+        transaction.on_commit(bump)
+
+def make_key(namespace, key):
+    return f'{namespace}:v{namespace_version(namespace)}:{key}'
+
+def get(namespace, key, default=None):
+    full_key = make_key(namespace, key)
+    value = local_cache.get(full_key)
+    if value is not _MISSING:
+        return value
+    value = shared_cache().get(full_key, _MISSING)
+    if value is _MISSING:
+        return default
+    local_cache.set(full_key, value, min(LOCAL_TIMEOUT, DEFAULT_TIMEOUT))
+    return value
+
+def set(namespace, key, value, timeout=DEFAULT_TIMEOUT):
+    full_key = make_key(namespace, key)
+    shared_cache().set(full_key, value, timeout)
+    local_cache.set(full_key, value, min(LOCAL_TIMEOUT, timeout))
+
+def delete(namespace, key):
+    full_key = make_key(namespace, key)
+    shared_cache().delete(full_key)
+    local_cache.delete(full_key)
+
+def get_many(namespace, keys):
+    """Devuelve {clave: valor} solo para las claves encontradas"""
+    full_keys = {make_key(namespace, key): key for key in keys}
+    found = {}
+    missing = []
+    for full_key, key in full_keys.items():
+        value = local_cache.get(full_key)
+        if value is _MISSING:
+            missing.append(full_key)
+        else:
+            found[key] = value
+    if missing:
+        for full_key, value in shared_cache().get_many(missing).items():
+            local_cache.set(full_key, value)
+            found[full_keys[full_key]] = value
+    return found
+
+def set_many(namespace, mapping, timeout=DEFAULT_TIMEOUT):
+    full_mapping = {make_key(namespace, key): value for key, value in mapping.items()}
+    shared_cache().set_many(full_mapping, timeout)
+    for full_key, value in full_mapping.items():
+        local_cache.set(full_key, value, min(LOCAL_TIMEOUT, timeout))
+
+@contextmanager
+def _local_lock(full_key):
+    """Candado propio de `full_key` en este proceso; claves distintas no se esperan"""
+    with _key_locks_lock:
+        entry = _key_locks.setdefault(full_key, [threading.RLock(), 0])
+        entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        with _key_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _key_locks[full_key]
+
+def _reset_key_locks_after_fork():
+    # Un hilo del padre podía tener alguno al hacer fork: en el hijo nadie los soltaría
+    global _key_locks_lock
+    _key_locks.clear()
+    _key_locks_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_key_locks_after_fork)
+
+def _stale_key(namespace, key):
+    # Sin versión: la copia obsoleta sobrevive a bump_namespace()
+    return f'stale:{namespace}:{key}'
+
+def _get_stale(namespace, key, stale_timeout):
+    if not stale_timeout:
+        return _MISSING
+    return shared_cache().get(_stale_key(namespace, key), _MISSING)
+
+def _store(namespace, key, value, timeout, stale_timeout):
+    set(namespace, key, value, timeout)
+    if stale_timeout:
+        shared_cache().set(_stale_key(namespace, key), value, timeout + stale_timeout)
+
+def get_or_compute(namespace, key, compute, timeout=DEFAULT_TIMEOUT, lock_timeout=30, wait=5.0, stale_timeout=0):
+    """
+    Devuelve el valor cacheado o lo calcula con compute() protegiendo contra
+    estampidas: dentro del proceso solo un hilo calcula cada clave y entre
+    procesos se usa un candado atómico (leases.add). Quien no
+    obtiene el candado espera hasta `wait` segundos a que aparezca el valor y,
+    si no llega, lo calcula él mismo.
+
+    Con `stale_timeout`, cada valor calculado se guarda también como copia
+    obsoleta durante timeout + stale_timeout segundos (también tras invalidar
+    el namespace) y, mientras otro lo recalcula, se devuelve esa copia al
+    momento en lugar de esperar.
+    """
+    value = get(namespace, key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    full_key = make_key(namespace, key)
+    with _local_lock(full_key) as local_lock:
+        if not local_lock.acquire(blocking=False):
+            value = _get_stale(namespace, key, stale_timeout)
+            if value is not _MISSING:
+                single_flight_outcomes.inc(outcome='stale')
+                return value
+            local_lock.acquire()
+        try:
+            value = get(namespace, key, _MISSING)
+            if value is not _MISSING:
+                single_flight_outcomes.inc(outcome='waited')
+                return value
+
+            lock_key = f'lock:{full_key}'
+            token = uuid.uuid4().hex
+            if not leases.add(lock_key, token, lock_timeout):
+                value = _get_stale(namespace, key, stale_timeout)
+                if value is not _MISSING:
+                    single_flight_outcomes.inc(outcome='stale')
+                    return value
+                deadline = time.monotonic() + wait
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = get(namespace, key, _MISSING)
+                    if value is not _MISSING:
+                        single_flight_outcomes.inc(outcome='waited')
+                        return value
+                single_flight_outcomes.inc(outcome='wait_timeout')
+                value = compute()
+                _store(namespace, key, value, timeout, stale_timeout)
+                return value
+
+            try:
+                single_flight_outcomes.inc(outcome='computed')
+                value = compute()
+                _store(namespace, key, value, timeout, stale_timeout)
+                return value
+            finally:
+                leases.release(lock_key, token)
+        finally:
+            local_lock.release()
+
+def single_flight(namespace, key, timeout=DEFAULT_TIMEOUT, stale_timeout=0, lock_timeout=30, wait=5.0):
+    """
+    Decorador que cachea el resultado de la función con get_or_compute(). `key`
+    es una plantilla que se rellena con los argumentos de la llamada por nombre
+    ('smart-recommendations:{user.id}:{limit}') o una función que recibe los
+    mismos argumentos y devuelve la clave. La función original queda en
+    `.uncached`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if callable(key):
+                cache_key = key(*args, **kwargs)
+            else:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                cache_key = key.format(**bound.arguments)
+            return get_or_compute(namespace, cache_key, lambda: func(*args, **kwargs),
+                                  timeout=timeout, lock_timeout=lock_timeout, wait=wait,
+                                  stale_timeout=stale_timeout)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+"""
+Generador de datos sintéticos para benchmarks y pruebas de carga.
+
+Crea usuarios, recetas (con etiquetas, ingredientes y fechas repartidas en el
+tiempo), me gusta y búsquedas con bulk_create, de forma reproducible a partir
+de una semilla.
+"""
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+from . import cache, metrics, view_counts
+from .models import (CustomUser, Ingredient, Recipe, RecipeIngredient, RecipeLike, Tag,
+                     UserSearchHistory)
+
+BATCH_SIZE = 1000
+
+# Contraseña de todos los usuarios generados
+DATASET_PASSWORD = 'bench-password'
+
+SEARCH_TERMS = ['pasta', 'pollo', 'arroz', 'postre', 'ensalada', 'sopa', 'vegana', 'rápida', 'tacos', 'pizza']
+
+_scratch_depth = 0
+
+def in_scratch_database():
+    """Si la conexión 'default' apunta ahora a una base temporal de scratch_database()"""
+    return _scratch_depth > 0
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """
+    Crea una base de datos temporal (como las del test runner), redirige la
+    conexión 'default' hacia ella y la destruye al salir. Mientras tanto los
+    trabajos encolados no se ejecutan en hilos (JOB_QUEUE_EAGER), y las cachés
+    y las reservas (LEASE_DIR) son otras, vacías y propias del bloque, y las
+    métricas medidas se descartan, para que nada calculado con datos
+    temporales llegue a las reales. Las visitas
+    pendientes de view_counts se vuelcan al entrar y al salir, para que
+    ninguna acabe en otra base que la suya.
+    """
+    global _scratch_depth
+    view_counts.flush()
+    old_config = setup_databases(verbosity=verbosity, interactive=False, aliases={'default'})
+    _scratch_depth += 1
+    isolated_caches = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'scratch-{alias}'}
+        for alias in settings.CACHES
+    }
+    try:
+        with tempfile.TemporaryDirectory(prefix='scratch_') as tmpdir, \
+                override_settings(JOB_QUEUE_EAGER=False, CACHES=isolated_caches,
+                                  LEASE_DIR=str(Path(tmpdir) / 'leases'), METRICS_DIR=str(Path(tmpdir) / 'metrics')):
+            cache.reset_local()
+            try:
+                yield
+            finally:
+                view_counts.flush()
+                # Si no se pudieron guardar, no deben acabar en la base real
+                view_counts.discard_pending()
+                clear_scratch_caches()
+                metrics.reset()
+    finally:
+        _scratch_depth -= 1
+        cache.reset_local()
+        teardown_databases(old_config, verbosity=verbosity)
+
+def clear_scratch_caches():
+    """Vacía las cachés aisladas de scratch_database() (nunca las reales)"""
+    if not in_scratch_database():
+        raise RuntimeError('clear_scratch_caches() solo puede usarse dentro de scratch_database()')
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    cache.reset_local()
+
+@contextmanager
+def _explicit_created_at(*models):
+    """Permite asignar created_at a mano aunque el campo use auto_now_add"""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+def _ensure_catalog(using, tags, ingredients):
+    if Tag.objects.using(using).count() < tags:
+        Tag.objects.using(using).bulk_create(
+            [Tag(name=f'etiqueta-{i}') for i in range(tags)], ignore_conflicts=True
+        )
+    if Ingredient.objects.using(using).count() < ingredients:
+        Ingredient.objects.using(using).bulk_create(
+            [Ingredient(name=f'Ingrediente {i}') for i in range(ingredients)], ignore_conflicts=True
+        )
+    return (list(Tag.objects.using(using).values_list('id', flat=True)),
+            list(Ingredient.objects.using(using).values_list('id', flat=True)))
+
+def generate_dataset(users=50, recipes=500, likes=2000, searches=1000, days=90,
+                     tags=16, ingredients=120, using='default', seed=42, prefix='bench'):
+    """
+    Genera un conjunto de datos sintético y devuelve un dict con lo creado.
+    Los nombres de usuario son '<prefix>-<n>' con contraseña DATASET_PASSWORD.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    tag_ids, ingredient_ids = _ensure_catalog(using, tags, ingredients)
+
+    def random_date():
+        return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+    password = make_password(DATASET_PASSWORD)
+    start = CustomUser.objects.using(using).filter(username__startswith=f'{prefix}-').count()
+    CustomUser.objects.using(using).bulk_create([
+        CustomUser(username=f'{prefix}-{start + i}', password=password, role='user')
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+    user_ids = list(CustomUser.objects.using(using).filter(
+        username__startswith=f'{prefix}-'
+    ).values_list('id', flat=True))
+
+    difficulties = [choice for choice, label in Recipe._meta.get_field('difficulty').choices]
+    with _explicit_created_at(Recipe, RecipeLike, UserSearchHistory):
+        new_recipes = Recipe.objects.using(using).bulk_create([
+            Recipe(
+                title=f'Receta de prueba {i}',
+                description=f'Descripción de la receta de prueba {i}',
+                instructions='Mezclar todo y cocinar.',
+                prep_time=rng.choice([5, 10, 15, 20, 30, 45]),
+                cook_time=rng.choice([0, 10, 20, 30, 60, 90]),
+                servings=rng.randint(1, 8),
+                difficulty=rng.choice(difficulties),
+                author_id=rng.choice(user_ids),
+                created_at=random_date(),
+                is_published=rng.random() < 0.9,
+            )
+            for i in range(recipes)
+        ], batch_size=BATCH_SIZE)
+        recipe_ids = [recipe.id for recipe in new_recipes]
+        if None in recipe_ids:
+            recipe_ids = list(Recipe.objects.using(using).values_list('id', flat=True))
+
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.using(using).bulk_create([
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(1, 3)))
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        RecipeIngredient.objects.using(using).bulk_create([
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id, quantity='al gusto')
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(ingredient_ids, min(len(ingredient_ids), rng.randint(3, 8)))
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+        pairs = {(rng.choice(user_ids), rng.choice(recipe_ids)) for _ in range(likes)}
+        RecipeLike.objects.using(using).bulk_create([
+            RecipeLike(user_id=user_id, recipe_id=recipe_id, created_at=random_date())
+            for user_id, recipe_id in pairs
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+        UserSearchHistory.objects.using(using).bulk_create([
+            UserSearchHistory(user_id=rng.choice(user_ids), search_term=rng.choice(SEARCH_TERMS),
+                              created_at=random_date())
+            for _ in range(searches)
+        ], batch_size=BATCH_SIZE)
+
+    return {
+        'users': users,
+        'recipes': len(recipe_ids),
+        'likes': len(pairs),
+        'searches': searches,
+    }
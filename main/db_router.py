@@ -0,0 +1,120 @@
+"""
+Enrutado de lecturas a una réplica de solo lectura.
+
+Solo las vistas marcadas con @use_replica leen de la base 'replica'; el resto
+del código y todas las escrituras siguen usando 'default'. Tras una escritura
+(cualquier petición POST/PUT/PATCH/DELETE) la sesión del usuario queda fijada a
+'default' durante REPLICA_PIN_SECONDS para que vea sus propios cambios aunque
+la réplica vaya con retraso.
+
+Configuración: definir DATABASE_REPLICA_URL (ver settings.py). Para probarlo en
+local con SQLite basta con copiar db.sqlite3 a otro archivo y apuntar
+DATABASE_REPLICA_URL a la copia.
+"""
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+PIN_SESSION_KEY = '_db_pinned_until'
+
+# Modelos que siempre se leen de la base principal (el retraso de la réplica
+# rompería su propósito)
+PRIMARY_ONLY_MODELS = {'main.CacheNamespaceVersion'}
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+def replica_enabled():
+    return REPLICA_ALIAS in settings.DATABASES
+
+def is_pinned(request):
+    """¿La sesión escribió hace poco y debe leer de la base principal?"""
+    session = getattr(request, 'session', None)
+    if session is None:
+        return False
+    return session.get(PIN_SESSION_KEY, 0) > time.time()
+
+def use_replica(view_func):
+    """Decorador para vistas de solo lectura (síncronas o async) que pueden leer de la réplica"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not replica_enabled() or await sync_to_async(is_pinned)(request):
+                return await view_func(request, *args, **kwargs)
+            token = _read_from_replica.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_from_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not replica_enabled() or is_pinned(request):
+            return view_func(request, *args, **kwargs)
+        token = _read_from_replica.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_from_replica.reset(token)
+    return wrapper
+
+@contextmanager
+def execute_wrapper_all(wrapper):
+    """connection.execute_wrapper en todas las bases (también la réplica)"""
+    with ExitStack() as stack:
+        for conn in connections.all(initialized_only=False):
+            stack.enter_context(conn.execute_wrapper(wrapper))
+        yield
+
+class ReplicaRouter:
+    """Lecturas a la réplica dentro de @use_replica; todo lo demás a 'default'"""
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and model._meta.label not in PRIMARY_ONLY_MODELS:
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambas bases contienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+class ReplicaPinningMiddleware:
+    """Fija la sesión a la base principal tras una petición de escritura"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # Cargar la sesión puede consultar la base de datos
+        await sync_to_async(self.pin)(request)
+        return response
+
+    def pin(self, request):
+        if (replica_enabled()
+                and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+                and hasattr(request, 'session')):
+            request.session[PIN_SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_PIN_SECONDS', 10)
@@ -0,0 +1,228 @@
+"""
+Borrado en segundo plano de usuarios y recetas.
+
+Borrar un usuario activo con user.delete() arrastra en una sola transacción
+todas sus recetas, ingredientes, imágenes, me gusta e historial, bloqueando la
+base de datos mientras dura y dejando los archivos de imagen en disco. Aquí el
+borrado se encola como un DeletionJob: al encolarlo el contenido se oculta de
+inmediato (usuario desactivado, recetas despublicadas) y después el worker de
+la cola (run_worker) o el comando run_deletion_jobs lo borra por lotes
+pequeños, cada uno en su propia transacción, anotando el progreso en el
+trabajo.
+
+Cada lote es idempotente (borra lo que quede), así que un trabajo 'running'
+cuyo worker murió (sin latido en DeletionJob.STALE_AFTER) se puede reanudar:
+claim_job lo acepta igual que uno pendiente. Si un lote falla, el trabajo
+queda 'failed' y el error llega a la cola de trabajos, cuyo reintento lo
+reanuda.
+"""
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache, jobs
+from .models import (CustomUser, DeletionJob, Recipe, RecipeImage, RecipeIngredient, RecipeLike,
+                     SearchIngredientStat, SearchTagStat, SearchTermStat, UserPreference,
+                     UserSearchHistory)
+from .signals import batched_invalidation
+from .snapshots import discard_recipe_snapshots
+from .sqlite import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+# Filas borradas por transacción
+CHUNK_SIZE = 500
+
+ACTIVE_STATUSES = ('pending', 'running')
+
+def _queue(target_type, target_id, target_label, requested_by):
+    """
+    Crea el trabajo salvo que ya haya uno pendiente o en curso para el mismo
+    objeto, y lo encola para el worker (run_worker). La restricción
+    deletionjob_unique_active_target impide que dos peticiones simultáneas
+    creen dos: la que pierde devuelve el de la otra
+    """
+    active = DeletionJob.objects.filter(target_type=target_type, target_id=target_id, status__in=ACTIVE_STATUSES)
+    job = active.first()
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            job = DeletionJob.objects.create(
+                target_type=target_type, target_id=target_id,
+                target_label=target_label, requested_by=requested_by,
+            )
+    except IntegrityError:
+        return active.get()
+    jobs.enqueue('deletion.run', deletion_job_id=job.pk)
+    return job
+
+def queue_user_deletion(user, requested_by=None):
+    """Desactiva al usuario, oculta sus recetas y encola el borrado"""
+    with transaction.atomic():
+        CustomUser.objects.filter(pk=user.pk).update(is_active=False)
+        published = Recipe.objects.filter(author=user, is_published=True)
+        recipe_ids = list(published.values_list('pk', flat=True))
+        published.update(is_published=False)
+        cache.invalidate(cache.NS_RECIPES, cache.NS_LIKES)
+        transaction.on_commit(lambda: discard_recipe_snapshots(recipe_ids))
+        return _queue('user', user.pk, user.username, requested_by)
+
+def queue_recipe_deletion(recipe, requested_by=None):
+    """Oculta la receta y encola el borrado"""
+    with transaction.atomic():
+        Recipe.objects.filter(pk=recipe.pk).update(is_published=False)
+        cache.invalidate(cache.NS_RECIPES, cache.NS_LIKES)
+        transaction.on_commit(lambda: discard_recipe_snapshots([recipe.pk]))
+        return _queue('recipe', recipe.pk, recipe.title, requested_by)
+
+def _user_steps(user_id):
+    """Consultas a vaciar, en orden, para borrar un usuario (hijos antes que padres)"""
+    recipes = Recipe.objects.filter(author_id=user_id)
+    return [
+        RecipeLike.objects.filter(user_id=user_id),
+        RecipeLike.objects.filter(recipe__in=recipes),
+        RecipeIngredient.objects.filter(recipe__in=recipes),
+        RecipeImage.objects.filter(recipe__in=recipes),
+        Recipe.tags.through.objects.filter(recipe__in=recipes),
+        recipes,
+        UserSearchHistory.ingredients_searched.through.objects.filter(usersearchhistory__user_id=user_id),
+        UserSearchHistory.tags_searched.through.objects.filter(usersearchhistory__user_id=user_id),
+        UserSearchHistory.objects.filter(user_id=user_id),
+        SearchTermStat.objects.filter(user_id=user_id),
+        SearchIngredientStat.objects.filter(user_id=user_id),
+        SearchTagStat.objects.filter(user_id=user_id),
+        UserPreference.objects.filter(user_id=user_id),
+        CustomUser.objects.filter(pk=user_id),
+    ]
+
+def _recipe_steps(recipe_id):
+    """Consultas a vaciar, en orden, para borrar una receta"""
+    return [
+        RecipeLike.objects.filter(recipe_id=recipe_id),
+        RecipeIngredient.objects.filter(recipe_id=recipe_id),
+        RecipeImage.objects.filter(recipe_id=recipe_id),
+        Recipe.tags.through.objects.filter(recipe_id=recipe_id),
+        Recipe.objects.filter(pk=recipe_id),
+    ]
+
+def job_steps(job):
+    if job.target_type == 'user':
+        return _user_steps(job.target_id)
+    return _recipe_steps(job.target_id)
+
+def _delete_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning('No se pudo borrar el archivo %s', name)
+
+@retry_on_locked
+def _delete_chunk(queryset, chunk_size):
+    """Borra hasta chunk_size filas de la consulta; devuelve cuántas había"""
+    model = queryset.model
+    with transaction.atomic(), batched_invalidation():
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return 0
+        chunk = model.objects.filter(pk__in=ids)
+        if model is RecipeImage:
+            names = [name for name in chunk.values_list('image', flat=True) if name]
+            transaction.on_commit(lambda: _delete_files(names))
+        chunk.delete()
+        return len(ids)
+
+def _claimable():
+    """Trabajos pendientes o en curso abandonados por un worker que murió"""
+    cutoff = timezone.now() - DeletionJob.STALE_AFTER
+    return DeletionJob.objects.filter(
+        Q(status='pending') |
+        Q(status='running', heartbeat_at__lt=cutoff) |
+        Q(status='running', heartbeat_at=None, started_at__lt=cutoff)
+    )
+
+def claim_job(job_id, include_failed=False):
+    """
+    Pasa el trabajo a 'running' si está pendiente o abandonado (o fallido, con
+    include_failed: el reintento de la cola); devuelve None si otro worker se
+    adelantó o lo está ejecutando
+    """
+    claimable = _claimable()
+    if include_failed:
+        claimable = claimable | DeletionJob.objects.filter(status='failed')
+    # Compare-and-swap: solo un worker consigue el cambio de estado
+    now = timezone.now()
+    claimed = claimable.filter(pk=job_id).update(status='running', error='', started_at=now, heartbeat_at=now)
+    return DeletionJob.objects.get(pk=job_id) if claimed else None
+
+def claim_next_job():
+    """Marca como 'running' el trabajo pendiente o abandonado más antiguo (o None si no hay)"""
+    for job_id in _claimable().order_by('created_at').values_list('pk', flat=True)[:10]:
+        job = claim_job(job_id)
+        if job:
+            return job
+    return None
+
+def run_deletion_job(job, chunk_size=CHUNK_SIZE):
+    """
+    Ejecuta un trabajo ya reclamado, guardando el progreso tras cada lote. Si
+    falla lo deja como 'failed' con el error y relanza la excepción
+    """
+    try:
+        steps = job_steps(job)
+        # Al reanudar se conserva lo ya borrado y se suma lo que queda
+        job.total_rows = job.deleted_rows + sum(queryset.count() for queryset in steps)
+        job.save(update_fields=['total_rows'])
+
+        for queryset in steps:
+            while True:
+                deleted = _delete_chunk(queryset, chunk_size)
+                if not deleted:
+                    break
+                job.deleted_rows += deleted
+                DeletionJob.objects.filter(pk=job.pk).update(deleted_rows=job.deleted_rows,
+                                                              heartbeat_at=timezone.now())
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+def reset_job(job_id):
+    """
+    Devuelve a 'pending' y encola un trabajo fallido o abandonado (desde el
+    panel); False si está pendiente, terminado o en curso con progreso reciente
+    """
+    with transaction.atomic():
+        resettable = _claimable().filter(status='running') | DeletionJob.objects.filter(status='failed')
+        if not resettable.filter(pk=job_id).update(status='pending', error=''):
+            return False
+        jobs.enqueue('deletion.run', deletion_job_id=job_id)
+    return True
+
+def resume_stale_jobs():
+    """Vuelve a encolar los trabajos abandonados por un worker que murió"""
+    resumed = 0
+    for job_id in _claimable().filter(status='running').values_list('pk', flat=True):
+        if jobs.enqueue('deletion.run', unique_key=f'deletion.run:{job_id}', deletion_job_id=job_id):
+            resumed += 1
+    return resumed
+
+def retry_failed_jobs():
+    """Vuelve a encolar los trabajos fallidos (los lotes ya borrados no se repiten)"""
+    retried = 0
+    for job_id in DeletionJob.objects.filter(status='failed').values_list('pk', flat=True):
+        with transaction.atomic():
+            if DeletionJob.objects.filter(pk=job_id, status='failed').update(status='pending', error=''):
+                jobs.enqueue('deletion.run', deletion_job_id=job_id)
+                retried += 1
+    return retried
@@ -0,0 +1,161 @@
+"""
+Evaluación offline de los algoritmos de recomendación.
+
+Se elige un instante de corte a partir de la fecha de los me gusta: los
+anteriores son el "pasado" que ven los algoritmos y los posteriores son lo que
+cada usuario acabó marcando (la verdad de referencia). Para que los algoritmos
+no vean el futuro, la evaluación se hace dentro de una transacción que borra
+los me gusta y búsquedas posteriores al corte, oculta las recetas creadas
+después y recalcula las tendencias a esa fecha; al terminar se deshace todo
+con un rollback. Mientras dura, esa transacción bloquea las escrituras de los
+demás procesos, así que por defecto solo se evalúa sobre una base temporal
+(dataset.scratch_database) y la base real exige live=True.
+
+Los algoritmos se registran en RECOMMENDATION_ENGINES (nombre -> ruta de una
+función user -> lista de recetas) y se pueden ampliar desde settings.
+"""
+import random
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .dataset import in_scratch_database
+from .db_router import execute_wrapper_all
+from .loadtest import percentile
+from .models import CustomUser, Recipe, RecipeLike, UserSearchHistory
+from .trending import update_trending_scores
+
+RECOMMENDATION_ENGINES = getattr(settings, 'RECOMMENDATION_ENGINES', {
+    'basic': 'main.views.get_basic_recommendations',
+    'smart': 'main.views.get_smart_recommendations',
+})
+
+class _Rollback(Exception):
+    pass
+
+class QueryCounter:
+    """Cuenta las consultas ejecutadas (sin el límite de 9000 de connection.queries)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+@dataclass
+class EngineResult:
+    name: str
+    k: int
+    precision: list = field(default_factory=list)
+    recall: list = field(default_factory=list)
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    recommended: set = field(default_factory=set)
+    errors: int = 0
+    first_error: str = ''
+
+    def summary(self, catalog_size):
+        users = len(self.precision)
+        return {
+            'engine': self.name,
+            'users': users,
+            f'precision@{self.k}': sum(self.precision) / users if users else 0,
+            f'recall@{self.k}': sum(self.recall) / users if users else 0,
+            'coverage': len(self.recommended) / catalog_size if catalog_size else 0,
+            'p50_ms': percentile(self.latencies, 50) * 1000,
+            'p95_ms': percentile(self.latencies, 95) * 1000,
+            'queries_avg': sum(self.queries) / len(self.queries) if self.queries else 0,
+            'queries_max': max(self.queries, default=0),
+            'errors': self.errors,
+            'first_error': self.first_error,
+        }
+
+def split_cutoff(test_fraction):
+    """Fecha que deja `test_fraction` de los me gusta (los más recientes) para la prueba"""
+    total = RecipeLike.objects.count()
+    if not total:
+        return None
+    offset = min(total - 1, int(total * (1 - test_fraction)))
+    return RecipeLike.objects.order_by('created_at').values_list('created_at', flat=True)[offset]
+
+def ground_truth(cutoff, sample_users, seed):
+    """
+    {user_id: {recipe_id}} con los me gusta posteriores al corte, solo para
+    usuarios con historia anterior y recetas que ya existían y eran visibles
+    """
+    eligible_recipes = Recipe.objects.filter(created_at__lt=cutoff, is_published=True)
+    future = (RecipeLike.objects.filter(created_at__gte=cutoff, recipe__in=eligible_recipes)
+              .exclude(recipe__author=F('user')).values_list('user_id', 'recipe_id'))
+    truth = {}
+    for user_id, recipe_id in future.iterator():
+        truth.setdefault(user_id, set()).add(recipe_id)
+
+    with_history = set(RecipeLike.objects.filter(created_at__lt=cutoff, user_id__in=list(truth))
+                       .values_list('user_id', flat=True).distinct())
+    users = sorted(user_id for user_id in truth if user_id in with_history)
+    random.Random(seed).shuffle(users)
+    return {user_id: truth[user_id] for user_id in users[:sample_users]}
+
+def _hide_future(cutoff):
+    """Deja la base como estaba en `cutoff` (solo dentro de una transacción)"""
+    RecipeLike.objects.filter(created_at__gte=cutoff).delete()
+    UserSearchHistory.objects.filter(created_at__gte=cutoff).delete()
+    Recipe.objects.filter(created_at__gte=cutoff, is_published=True).update(is_published=False)
+    update_trending_scores(full=True, now=cutoff)
+
+def evaluate(engine_names=None, k=10, test_fraction=0.2, sample_users=100, seed=0, progress=None, live=False):
+    """
+    Evalúa los algoritmos y devuelve (corte, número de usuarios, [resumen por algoritmo]).
+    No modifica la base de datos. Fuera de scratch_database() hay que pasar live=True.
+    """
+    if not live and not in_scratch_database():
+        raise ValueError('La evaluación sobre la base real bloquea sus escrituras: usa una base temporal o live=True')
+    engines = {name: import_string(path) for name, path in RECOMMENDATION_ENGINES.items()
+               if not engine_names or name in engine_names}
+    cutoff = split_cutoff(test_fraction)
+    if cutoff is None:
+        raise ValueError('No hay me gusta para evaluar')
+    truth = ground_truth(cutoff, sample_users, seed)
+    if not truth:
+        raise ValueError('Ningún usuario tiene me gusta antes y después del corte')
+
+    results = {name: EngineResult(name, k) for name in engines}
+    summaries = []
+    try:
+        with transaction.atomic():
+            _hide_future(cutoff)
+            catalog_size = Recipe.objects.filter(is_published=True).count()
+            users = CustomUser.objects.in_bulk(list(truth))
+
+            for name, engine in engines.items():
+                result = results[name]
+                for user_id, relevant in truth.items():
+                    # Algunos algoritmos tienen componentes aleatorios
+                    random.seed(seed + user_id)
+                    counter = QueryCounter()
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic(), execute_wrapper_all(counter):
+                            recommended = [recipe.id for recipe in engine(users[user_id])[:k]]
+                    except Exception as e:
+                        result.errors += 1
+                        result.first_error = result.first_error or f'{type(e).__name__}: {e}'
+                        continue
+                    result.latencies.append(time.perf_counter() - started)
+                    result.queries.append(counter.count)
+                    hits = len(relevant.intersection(recommended))
+                    result.precision.append(hits / k)
+                    result.recall.append(hits / len(relevant))
+                    result.recommended.update(recommended)
+                if progress:
+                    progress(name)
+                summaries.append(result.summary(catalog_size))
+            raise _Rollback
+    except _Rollback:
+        pass
+    return cutoff, len(truth), summaries
@@ -0,0 +1,316 @@
+"""
+Registro de eventos de actividad (solo se añade, nunca se modifica).
+
+Cada me gusta, me gusta retirado, búsqueda, visita y publicación se escribe
+como una línea JSON en un segmento del directorio EVENT_LOG_DIR. Cada proceso
+escribe en su propio segmento (`events-<fecha>-<host>-<pid>-<n>.open`) a
+través de un búfer que se vuelca cada EVENT_LOG_BUFFER_SIZE eventos o, como
+mucho, EVENT_LOG_FLUSH_SECONDS segundos después del primer evento pendiente
+(un temporizador lo vuelca aunque no lleguen más eventos); al superar EVENT_LOG_SEGMENT_BYTES o
+EVENT_LOG_SEGMENT_SECONDS el segmento se cierra (se renombra a `.ndjson`) y
+se empieza otro.
+
+`ingest_events()` agrega los segmentos cerrados a las tablas diarias
+(EventDailyCount, RecipeDailyStat, SearchTermDailyCount) y los mueve a
+`archive/`, de donde iter_events() los puede volver a leer (por ejemplo, para
+reentrenar las recomendaciones). Así los informes no consultan las tablas de
+la aplicación.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import EventDailyCount, IngestedEventSegment, RecipeDailyStat, SearchTermDailyCount
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('like', 'unlike', 'search', 'view', 'publish', 'unpublish')
+OPEN_SUFFIX = '.open'
+CLOSED_SUFFIX = '.ndjson'
+ARCHIVE_DIR = 'archive'
+# Margen antes de dar por cerrado el segmento abierto de un proceso inactivo o
+# que terminó sin cerrarlo (el escritor nunca añade a un segmento caducado)
+STALE_GRACE_SECONDS = 60
+
+def _segment_created_at(path):
+    """Fecha de creación codificada en el nombre del segmento"""
+    try:
+        return datetime.strptime(path.name.split('-')[1], '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+    except (IndexError, ValueError):
+        return None
+
+class EventWriter:
+    """Escritor con búfer de un proceso; seguro entre hilos"""
+
+    def __init__(self, directory, segment_bytes, segment_seconds, buffer_size, flush_seconds):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._path = None
+        self._opened_at = 0
+        self._size = 0
+        self._sequence = 0
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Proceso hijo (fork): el búfer y el segmento son del padre
+                self._reset()
+            self._buffer.append(line)
+            if (len(self._buffer) >= self.buffer_size
+                    or time.monotonic() - self._last_flush >= self.flush_seconds):
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if os.getpid() == self._pid:
+                self._flush()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+            self._timer = None
+            try:
+                self._flush()
+            except OSError:
+                logger.exception('No se pudo volcar el búfer de eventos')
+
+    def close(self):
+        """Vuelca el búfer y cierra el segmento actual"""
+        with self._lock:
+            if os.getpid() == self._pid:
+                self._flush()
+                self._close_segment()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        data = ''.join(self._buffer).encode()
+        self._buffer = []
+        if (self._path is None or self._size >= self.segment_bytes
+                or time.time() - self._opened_at >= self.segment_seconds):
+            self._close_segment()
+            self._open_segment()
+
+        fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        self._size += len(data)
+
+    def _open_segment(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        self._opened_at = time.time()
+        stamp = datetime.fromtimestamp(self._opened_at, dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        host = socket.gethostname().replace('-', '_')
+        self._path = self.directory / f'events-{stamp}-{host}-{self._pid}-{self._sequence}{OPEN_SUFFIX}'
+        self._size = 0
+
+    def _close_segment(self):
+        if self._path is None:
+            return
+        try:
+            self._path.rename(self._path.with_suffix(CLOSED_SUFFIX))
+        except FileNotFoundError:
+            # Ya lo cerró ingest_events() por inactivo
+            pass
+        self._path = None
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = EventWriter(
+                    settings.EVENT_LOG_DIR,
+                    segment_bytes=settings.EVENT_LOG_SEGMENT_BYTES,
+                    segment_seconds=settings.EVENT_LOG_SEGMENT_SECONDS,
+                    buffer_size=settings.EVENT_LOG_BUFFER_SIZE,
+                    flush_seconds=settings.EVENT_LOG_FLUSH_SECONDS,
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+def _write(event):
+    try:
+        get_writer().emit(event)
+    except OSError:
+        # El registro de eventos nunca debe romper una petición
+        logger.exception('No se pudo escribir el evento %s', event['type'])
+
+def emit(event_type, **fields):
+    """
+    Registra un evento. Dentro de una transacción se escribe al confirmarla,
+    para no registrar me gusta o publicaciones que acaben deshaciéndose.
+    """
+    if not settings.EVENT_LOG_ENABLED:
+        return
+    event = {'type': event_type, 'ts': timezone.now().isoformat(), **fields}
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _write(event))
+    else:
+        _write(event)
+
+def close_stale_segments(directory=None, now=None):
+    """Cierra los segmentos abiertos que su proceso ya no puede ampliar"""
+    directory = Path(directory or settings.EVENT_LOG_DIR)
+    limit = (now or timezone.now()) - timedelta(seconds=settings.EVENT_LOG_SEGMENT_SECONDS + STALE_GRACE_SECONDS)
+    for path in directory.glob(f'events-*{OPEN_SUFFIX}'):
+        created_at = _segment_created_at(path)
+        if created_at and created_at < limit:
+            try:
+                path.rename(path.with_suffix(CLOSED_SUFFIX))
+            except FileNotFoundError:
+                pass
+
+def closed_segments(directory=None):
+    """Segmentos cerrados pendientes de agregar, del más antiguo al más reciente"""
+    directory = Path(directory or settings.EVENT_LOG_DIR)
+    if not directory.is_dir():
+        return []
+    close_stale_segments(directory)
+    return sorted(directory.glob(f'events-*{CLOSED_SUFFIX}'), key=lambda path: path.name)
+
+def read_segment(path):
+    """Eventos de un segmento; ignora líneas incompletas (p. ej. tras una caída)"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and event.get('type') in EVENT_TYPES and 'ts' in event:
+                yield event
+
+def iter_events(types=None, since=None, directory=None):
+    """Todos los eventos (archivados y pendientes) en orden, opcionalmente filtrados"""
+    directory = Path(directory or settings.EVENT_LOG_DIR)
+    paths = sorted(
+        list((directory / ARCHIVE_DIR).glob(f'events-*{CLOSED_SUFFIX}')) + closed_segments(directory),
+        key=lambda path: path.name,
+    )
+    for path in paths:
+        for event in read_segment(path):
+            if types and event['type'] not in types:
+                continue
+            if since and datetime.fromisoformat(event['ts']) < since:
+                continue
+            yield event
+
+def _merge_counts(model, key_fields, rows, count_fields):
+    """
+    Suma `rows` ({clave: [contadores]}) a la tabla `model`, actualizando las
+    filas existentes y creando las nuevas
+    """
+    if not rows:
+        return
+    filters = {f'{field}__in': {key[i] for key in rows} for i, field in enumerate(key_fields)}
+    existing = {
+        tuple(getattr(obj, field) for field in key_fields): obj
+        for obj in model.objects.filter(**filters)
+    }
+
+    to_update = []
+    to_create = []
+    for key, counts in rows.items():
+        obj = existing.get(key)
+        if obj is None:
+            to_create.append(model(**dict(zip(key_fields, key)), **dict(zip(count_fields, counts))))
+            continue
+        for field, count in zip(count_fields, counts):
+            setattr(obj, field, getattr(obj, field) + count)
+        to_update.append(obj)
+
+    model.objects.bulk_update(to_update, count_fields, batch_size=500)
+    model.objects.bulk_create(to_create, batch_size=500)
+
+def aggregate(events):
+    """Agrupa los eventos por día en los contadores de las tablas diarias"""
+    by_type = {}
+    by_recipe = {}
+    by_term = {}
+    for event in events:
+        day = timezone.localtime(datetime.fromisoformat(event['ts'])).date()
+        event_type = event['type']
+        key = (day, event_type)
+        by_type[key] = [by_type.get(key, [0])[0] + 1]
+
+        recipe_id = event.get('recipe_id')
+        if event_type in ('view', 'like', 'unlike') and recipe_id:
+            counts = by_recipe.setdefault((day, recipe_id), [0, 0, 0])
+            counts[('view', 'like', 'unlike').index(event_type)] += 1
+
+        term = (event.get('term') or '').strip().lower()[:200]
+        if event_type == 'search' and term:
+            key = (day, term)
+            by_term[key] = [by_term.get(key, [0])[0] + 1]
+    return by_type, by_recipe, by_term
+
+def ingest_segment(path, archive=True):
+    """
+    Agrega un segmento cerrado y lo archiva (o lo borra). Devuelve el número de
+    eventos agregados, 0 si el segmento ya se había agregado antes.
+    """
+    path = Path(path)
+    events = list(read_segment(path))
+    by_type, by_recipe, by_term = aggregate(events)
+
+    with transaction.atomic():
+        _, created = IngestedEventSegment.objects.get_or_create(name=path.name, defaults={'events': len(events)})
+        if created:
+            _merge_counts(EventDailyCount, ['day', 'event_type'], by_type, ['count'])
+            _merge_counts(RecipeDailyStat, ['day', 'recipe_id'], by_recipe, ['views', 'likes', 'unlikes'])
+            _merge_counts(SearchTermDailyCount, ['day', 'term'], by_term, ['count'])
+
+    if archive:
+        archive_dir = path.parent / ARCHIVE_DIR
+        archive_dir.mkdir(exist_ok=True)
+        path.rename(archive_dir / path.name)
+    else:
+        path.unlink()
+    return len(events) if created else 0
+
+def ingest_events(directory=None, archive=True, limit=None):
+    """Agrega los segmentos cerrados pendientes. Devuelve (segmentos, eventos)"""
+    segments = closed_segments(directory)[:limit]
+    total = 0
+    for path in segments:
+        total += ingest_segment(path, archive=archive)
+    return len(segments), total
@@ -0,0 +1,95 @@
+"""
+Facetas con conteos para el listado de recetas.
+
+Cada etiqueta y cada dificultad tiene su lista de recetas publicadas guardada
+como un bitmap (un int de Python en el que el bit N indica la receta con id N).
+Filtrar es hacer AND/OR de bitmaps y contar es int.bit_count(), así que todos
+los conteos de facetas del resultado actual salen de una sola pasada en
+memoria, sin una consulta COUNT por faceta.
+
+El índice se construye con dos consultas y se guarda en la caché en el
+namespace de recetas (se invalida con cualquier cambio en recetas o
+etiquetas); mientras se reconstruye tras un cambio se sirve el anterior. Los
+conteos se cachean por combinación de filtros.
+"""
+import hashlib
+
+from . import cache
+from .models import Recipe
+
+INDEX_KEY = 'facets:index'
+
+def _bitmap(ids):
+    bitmap = 0
+    for recipe_id in ids:
+        bitmap |= 1 << recipe_id
+    return bitmap
+
+def build_index():
+    """{'all': bitmap, 'tags': {tag_id: bitmap}, 'difficulty': {valor: bitmap}}"""
+    index = {'all': 0, 'tags': {}, 'difficulty': {}}
+    for recipe_id, difficulty in Recipe.objects.filter(is_published=True).values_list('id', 'difficulty').iterator():
+        bit = 1 << recipe_id
+        index['all'] |= bit
+        index['difficulty'][difficulty] = index['difficulty'].get(difficulty, 0) | bit
+
+    RecipeTag = Recipe.tags.through
+    tag_rows = RecipeTag.objects.filter(recipe__is_published=True).values_list('tag_id', 'recipe_id')
+    for tag_id, recipe_id in tag_rows.iterator():
+        index['tags'][tag_id] = index['tags'].get(tag_id, 0) | (1 << recipe_id)
+    return index
+
+def get_index():
+    return cache.get_or_compute(cache.NS_RECIPES, INDEX_KEY, build_index, stale_timeout=10 * 60)
+
+def _combine(bitmaps, mode):
+    if not bitmaps:
+        return None
+    result = bitmaps[0]
+    for bitmap in bitmaps[1:]:
+        result = result & bitmap if mode == 'all' else result | bitmap
+    return result
+
+def facet_counts(tag_ids=(), tag_mode='any', difficulty=None, search_ids=None):
+    """
+    Devuelve {'total': n, 'tags': {tag_id: n}, 'difficulty': {valor: n}}.
+
+    Cada faceta cuenta lo que daría marcarla con el resto de filtros activos:
+    las dificultades ignoran el filtro de dificultad (se elige una) y, en modo
+    'any', las etiquetas ignoran el filtro de etiquetas (marcar otra amplía el
+    resultado). `search_ids` son los ids que cumplen los filtros que no son
+    facetas (búsqueda de texto, rango de tiempo).
+    """
+    index = get_index()
+    base = index['all']
+    if search_ids is not None:
+        base &= _bitmap(search_ids)
+
+    tags_filter = _combine([index['tags'].get(tag_id, 0) for tag_id in tag_ids], tag_mode)
+    difficulty_filter = index['difficulty'].get(difficulty, 0) if difficulty else None
+
+    with_tags = base if tags_filter is None else base & tags_filter
+    with_difficulty = base if difficulty_filter is None else base & difficulty_filter
+    result = with_tags if difficulty_filter is None else with_tags & difficulty_filter
+
+    tag_base = result if tag_mode == 'all' else with_difficulty
+    return {
+        'total': result.bit_count(),
+        'tags': {tag_id: (tag_base & bitmap).bit_count() for tag_id, bitmap in index['tags'].items()},
+        'difficulty': {value: (with_tags & bitmap).bit_count() for value, bitmap in index['difficulty'].items()},
+    }
+
+def cached_facet_counts(tag_ids=(), tag_mode='any', difficulty=None, search_key=None, search_ids=None):
+    """
+    facet_counts() cacheado por combinación de filtros. `search_key` identifica
+    los filtros que no son facetas y `search_ids` (ids o un queryset, que solo
+    se evalúa si no está en caché) las recetas que los cumplen.
+    """
+    parts = [tag_mode, ','.join(str(tag_id) for tag_id in sorted(tag_ids)), difficulty or '']
+    if search_key:
+        parts.append(hashlib.sha1(search_key.encode()).hexdigest())
+    key = 'facets:counts:' + ':'.join(parts)
+
+    def compute():
+        return facet_counts(tag_ids, tag_mode, difficulty, search_ids)
+    return cache.get_or_compute(cache.NS_RECIPES, key, compute, stale_timeout=10 * 60)
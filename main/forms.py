@@ -170,12 +170,46 @@ class RecipeSearchForm(forms.Form):
         required=False,
         label="Filtrar por etiquetas"
     )
+    tag_mode = forms.ChoiceField(
+        choices=[('any', 'Cualquiera de las etiquetas'), ('all', 'Todas las etiquetas')],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control form-control-sm'}),
+        label="Combinar etiquetas"
+    )
     difficulty = forms.ChoiceField(
         choices=[('', 'Cualquier dificultad')] + Recipe._meta.get_field('difficulty').choices,
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'}),
         label="Dificultad"
     )
+    min_time = forms.IntegerField(
+        min_value=0,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Mín.'}),
+        label="Desde (min)"
+    )
+    max_time = forms.IntegerField(
+        min_value=0,
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Máx.'}),
+        label="Hasta (min)"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        min_time = cleaned_data.get('min_time')
+        max_time = cleaned_data.get('max_time')
+        if min_time is not None and max_time is not None and min_time > max_time:
+            raise forms.ValidationError('El tiempo mínimo no puede ser mayor que el máximo.')
+        return cleaned_data
+
+    def add_facet_counts(self, counts):
+        """Añade a las opciones de dificultad el número de recetas de cada una"""
+        self.facet_counts = counts
+        self.fields['difficulty'].choices = [('', 'Cualquier dificultad')] + [
+            (value, f'{label} ({counts["difficulty"].get(value, 0)})')
+            for value, label in Recipe._meta.get_field('difficulty').choices
+        ]
 
 class IngredientForm(forms.ModelForm):
     """Formulario para crear/editar ingredientes desde el panel de admin"""
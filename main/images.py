@@ -0,0 +1,85 @@
+"""
+Procesado de imágenes de recetas (sin dependencias de Django).
+
+Redimensiona a MAX_SIZE como máximo y recodifica con compresión razonable,
+escribiendo el resultado de forma atómica. Las subidas nuevas no se procesan
+al guardar: la señal post_save de RecipeImage (main/signals.py) encola la
+tarea images.optimize, que ejecuta optimize_image() en el worker de la cola
+(run_worker) si el hash del archivo cambió desde la última vez. El comando
+reprocess_images ejecuta process_file() en un pool de procesos.
+"""
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageOps
+
+MAX_SIZE = 800
+JPEG_QUALITY = 85
+
+def file_hash(path):
+    """SHA-256 del contenido del archivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _encode(img, image_format, quality):
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    elif image_format == 'PNG':
+        img.save(buffer, 'PNG', optimize=True)
+    elif image_format == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=6)
+    else:
+        img.save(buffer, image_format)
+    return buffer.getvalue()
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def optimize_image(path, max_size=MAX_SIZE, quality=JPEG_QUALITY, reencode=True):
+    """
+    Redimensiona la imagen de `path` si supera max_size y, con reencode, la
+    recodifica aunque no haga falta redimensionar (solo se reescribe si el
+    resultado ocupa menos). Devuelve el hash SHA-256 del archivo resultante.
+    """
+    with Image.open(path) as img:
+        image_format = img.format
+        img = ImageOps.exif_transpose(img)
+        resized = img.width > max_size or img.height > max_size
+        if resized:
+            img.thumbnail((max_size, max_size))
+        elif not reencode:
+            return file_hash(path)
+        data = _encode(img, image_format, quality)
+
+    if resized or len(data) < os.path.getsize(path):
+        _write_atomic(path, data)
+        return hashlib.sha256(data).hexdigest()
+    return file_hash(path)
+
+def process_file(task):
+    """
+    Tarea para el pool de procesos: task = (pk, ruta, hash conocido, max_size, calidad).
+    Devuelve (pk, estado, hash, bytes antes, bytes después, error) con estado
+    'processed', 'skipped' (el hash coincide, ya estaba procesada), 'missing' o 'failed'.
+    """
+    pk, path, known_hash, max_size, quality = task
+    try:
+        before = os.path.getsize(path)
+        if known_hash and file_hash(path) == known_hash:
+            return pk, 'skipped', known_hash, before, before, ''
+        new_hash = optimize_image(path, max_size=max_size, quality=quality)
+        return pk, 'processed', new_hash, before, os.path.getsize(path), ''
+    except FileNotFoundError:
+        return pk, 'missing', known_hash, 0, 0, ''
+    except Exception as e:
+        return pk, 'failed', known_hash, 0, 0, str(e)
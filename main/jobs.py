@@ -0,0 +1,311 @@
+"""
+Cola de trabajos en segundo plano sobre la base de datos.
+
+Las vistas encolan trabajo con enqueue() y responden de inmediato; el comando
+run_worker los ejecuta. Las tareas se registran con el decorador @task (ver
+main/tasks.py) y reciben el payload como argumentos con nombre, así que deben
+ser idempotentes: un trabajo puede repetirse si el worker muere a mitad.
+
+Para reclamar trabajos se usa SELECT ... FOR UPDATE SKIP LOCKED donde la base
+lo soporta (PostgreSQL). En SQLite, que serializa las escrituras, cada
+trabajo se reclama con un UPDATE condicional (compare-and-swap sobre el
+estado), de modo que dos workers nunca ejecutan el mismo.
+
+Un trabajo reclamado queda asignado hasta locked_until. Mientras la tarea se
+ejecuta, un hilo de latido lo extiende cada HEARTBEAT_INTERVAL, así que solo
+vuelven a la cola (requeue_stale_jobs) los trabajos cuyo worker dejó de latir,
+por largos que sean.
+
+Las tareas periódicas (PERIODIC_TASKS) las programa el propio worker usando
+unique_key, que garantiza un solo trabajo pendiente por tarea.
+
+Sin worker (JOB_QUEUE_EAGER, el valor por defecto y el de render.yaml) cada
+trabajo listo se ejecuta en un hilo del proceso que lo encoló al confirmarse la
+transacción: la petición no espera y el trabajo ve los mismos archivos que el
+proceso web. Los reintentos, los trabajos programados para más tarde y las
+tareas periódicas los ejecuta eager_maintenance(), que cada proceso web lanza
+al terminar una petición como mucho cada EAGER_MAINTENANCE_INTERVAL segundos.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+from .warmup import in_warmup
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Un trabajo 'running' sin latido durante este tiempo se da por abandonado
+VISIBILITY_TIMEOUT = timedelta(seconds=getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 600))
+# Cada cuánto extiende el worker la reclamación de un trabajo en curso
+HEARTBEAT_INTERVAL = VISIBILITY_TIMEOUT / 3
+# Espera antes de reintentar: RETRY_BASE_DELAY * 2^(intento - 1)
+RETRY_BASE_DELAY = 30
+# Segundos entre dos pasadas de mantenimiento de un proceso web en modo EAGER
+EAGER_MAINTENANCE_INTERVAL = 60
+
+_last_maintenance = None
+_maintenance_lock = threading.Lock()
+# Marca el hilo de mantenimiento, que ejecuta él mismo lo que encola
+_local = threading.local()
+
+_registry = {}
+
+def is_eager():
+    """
+    Si los trabajos se ejecutan en el propio proceso al confirmar la
+    transacción (sin worker). Nunca durante el calentamiento de cachés, que
+    corre en el maestro de gunicorn antes del fork
+    """
+    return getattr(settings, 'JOB_QUEUE_EAGER', True) and not in_warmup()
+
+# Tareas periódicas: nombre -> intervalo en segundos
+PERIODIC_TASKS = {}
+
+def task(name=None, max_attempts=3, every=None):
+    """Registra una función como tarea; con every=segundos se programa periódicamente"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        _registry[task_name] = func
+        if every:
+            PERIODIC_TASKS[task_name] = every
+        return func
+    return decorator
+
+def get_task(name):
+    if name not in _registry:
+        raise LookupError(f'Tarea desconocida: {name}')
+    return _registry[name]
+
+def enqueue(func_or_name, delay=None, run_at=None, priority=0, unique_key=None, **payload):
+    """
+    Encola una tarea. Con unique_key no se crea otra si ya hay una pendiente o
+    en curso con la misma clave (devuelve None en ese caso).
+    """
+    name = func_or_name if isinstance(func_or_name, str) else func_or_name.task_name
+    func = get_task(name)
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta(0))
+
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                task=name, payload=payload, priority=priority, run_at=run_at,
+                unique_key=unique_key, max_attempts=func.max_attempts,
+            )
+    except IntegrityError:
+        if unique_key is None:
+            raise
+        return None
+
+    if is_eager() and run_at <= timezone.now() and not getattr(_local, 'maintaining', False):
+        transaction.on_commit(lambda: _run_now(job.pk))
+    return job
+
+def _in_thread(name, func, *args):
+    def run():
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Error en el hilo %s', name)
+        finally:
+            # Las conexiones son por hilo: se cierran las de este
+            connections.close_all()
+
+    # No es daemon: el proceso espera a que termine antes de salir
+    threading.Thread(target=run, name=name).start()
+
+def _run_claimed(job_id):
+    job = claim_job(job_id, worker_id())
+    if job:
+        run_job(job)
+
+def _run_now(job_id):
+    """Ejecuta el trabajo en un hilo propio (modo EAGER)"""
+    _in_thread(f'job-{job_id}', _run_claimed, job_id)
+
+def _maintain():
+    _local.maintaining = True
+    try:
+        requeue_stale_jobs()
+        schedule_periodic_tasks()
+        while True:
+            claimed = claim_jobs(worker_id())
+            if not claimed:
+                break
+            for job in claimed:
+                run_job(job)
+    finally:
+        _maintenance_lock.release()
+
+def eager_maintenance(**kwargs):
+    """
+    Receptor de request_finished en modo EAGER: hace de worker para los
+    reintentos, los trabajos programados y las tareas periódicas, en un hilo
+    y con una sola pasada a la vez por proceso
+    """
+    global _last_maintenance
+    if not is_eager():
+        return
+    now = time.monotonic()
+    if _last_maintenance is not None and now - _last_maintenance < EAGER_MAINTENANCE_INTERVAL:
+        return
+    if not _maintenance_lock.acquire(blocking=False):
+        return
+    _last_maintenance = now
+    _in_thread('jobs-maintenance', _maintain)
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def claim_job(job_id, worker):
+    """Reclama un trabajo concreto con un UPDATE condicional; devuelve el Job o None"""
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', locked_by=worker, locked_at=now, locked_until=now + VISIBILITY_TIMEOUT,
+        attempts=F('attempts') + 1,
+    )
+    return Job.objects.get(pk=job_id) if claimed else None
+
+def claim_jobs(worker, limit=1):
+    """Reclama hasta `limit` trabajos listos, por prioridad y antigüedad"""
+    now = timezone.now()
+    ready = Job.objects.filter(status='queued', run_at__lte=now).order_by('priority', 'run_at')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Job.objects.filter(pk__in=ids).update(
+                status='running', locked_by=worker, locked_at=now, locked_until=now + VISIBILITY_TIMEOUT,
+                attempts=F('attempts') + 1,
+            )
+        return list(Job.objects.filter(pk__in=ids).order_by('priority', 'run_at'))
+
+    # Sin SKIP LOCKED: varios candidatos por si otro worker se adelanta con alguno
+    jobs = []
+    for job_id in ready.values_list('pk', flat=True)[:limit * 4]:
+        job = claim_job(job_id, worker)
+        if job:
+            jobs.append(job)
+            if len(jobs) >= limit:
+                break
+    return jobs
+
+class Heartbeat:
+    """
+    Hilo que extiende locked_until de un trabajo en curso mientras dura el
+    bloque with; deja de hacerlo si el trabajo ya no es de este worker
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f'heartbeat-{job.pk}', daemon=True)
+
+    def beat(self):
+        return Job.objects.filter(pk=self.job.pk, status='running', locked_by=self.job.locked_by).update(
+            locked_until=timezone.now() + VISIBILITY_TIMEOUT,
+        )
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                try:
+                    if not self.beat():
+                        return
+                except Exception:
+                    logger.exception('No se pudo extender la reclamación de %s', self.job)
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+def run_job(job):
+    """Ejecuta un trabajo ya reclamado y registra el resultado o programa el reintento"""
+    try:
+        with Heartbeat(job):
+            get_task(job.task)(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()[-4000:]
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+            logger.warning('Trabajo %s falló (intento %s), se reintentará', job, job.attempts)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error('Trabajo %s falló definitivamente:\n%s', job, job.last_error)
+    else:
+        job.status = 'done'
+        job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'finished_at'])
+    return job
+
+def requeue_stale_jobs():
+    """Devuelve a la cola los trabajos de workers que murieron (o los marca como fallidos)"""
+    stale = Job.objects.filter(status='running', locked_until__lt=timezone.now())
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', finished_at=timezone.now(), last_error='Worker perdido',
+    )
+    requeued = stale.update(status='queued', locked_by='', run_at=timezone.now())
+    return requeued + failed
+
+def schedule_periodic_tasks():
+    """Asegura un trabajo pendiente por cada tarea periódica"""
+    now = timezone.now()
+    for name, every in PERIODIC_TASKS.items():
+        key = f'periodic:{name}'
+        if Job.objects.filter(unique_key=key, status__in=ACTIVE_STATUSES).exists():
+            continue
+        last_run = Job.objects.filter(unique_key=key).exclude(finished_at=None).order_by('-finished_at').first()
+        run_at = max(now, last_run.finished_at + timedelta(seconds=every)) if last_run else now
+        enqueue(name, run_at=run_at, unique_key=key)
+
+def purge_finished_jobs(older_than_days=7, batch_size=1000):
+    """Borra por lotes los trabajos terminados hace más de `older_than_days` días"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    finished = Job.objects.filter(status__in=('done', 'failed'), finished_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=ids).delete()[0]
+
+def queue_stats():
+    """Profundidad de la cola para el panel de administración"""
+    now = timezone.now()
+    by_status = dict(Job.objects.values('status').annotate(total=Count('pk')).values_list('status', 'total'))
+    ready = Job.objects.filter(status='queued', run_at__lte=now)
+    oldest = ready.aggregate(oldest=Min('run_at'))['oldest']
+    by_task = list(
+        Job.objects.filter(status__in=ACTIVE_STATUSES)
+        .values('task', 'status').annotate(total=Count('pk')).order_by('task', 'status')
+    )
+    return {
+        'by_status': {status: by_status.get(status, 0) for status, label in Job.STATUS_CHOICES},
+        'ready': ready.count(),
+        'scheduled': Job.objects.filter(status='queued', run_at__gt=now).count(),
+        'oldest_wait': (now - oldest) if oldest else None,
+        'by_task': by_task,
+    }
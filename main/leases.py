@@ -0,0 +1,136 @@
+"""
+Reservas atómicas compartidas entre procesos: candados, plazas y marcas que
+caducan solas.
+
+Los candados de cache.get_or_compute, las plazas de admission.Limiter y las
+marcas de visita de view_counts necesitan un "añadir si no existe" atómico
+entre todos los procesos. cache.add() solo lo es con memcached o Redis:
+FileBasedCache (la caché por defecto) comprueba y escribe en dos pasos, así
+que dos procesos pueden obtener la misma clave, y LocMemCache no se comparte
+entre procesos.
+
+Con esos dos backends add() y release() usan cache.add(). Con cualquier otro,
+cada clave es un archivo en LEASE_DIR con su valor y su caducidad, y la
+comprobación y la escritura se hacen con el archivo bloqueado (flock), lo que
+las hace atómicas entre los procesos de la máquina (los mismos que comparten
+FileBasedCache). Los archivos caducados se borran con purge_expired() (tarea
+periódica leases.purge).
+
+Sin fcntl (Windows) el bloqueo es solo entre hilos del proceso, suficiente
+para el servidor de desarrollo.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Backends cuyo cache.add() es atómico y compartido por todos los procesos
+ATOMIC_BACKENDS = ('django.core.cache.backends.memcached', 'django.core.cache.backends.redis')
+
+_process_lock = threading.Lock()
+
+def _cache():
+    return caches[getattr(settings, 'APP_CACHE_ALIAS', 'default')]
+
+def uses_cache():
+    """Si las reservas van a la caché compartida (True) o a archivos en LEASE_DIR"""
+    return type(_cache()).__module__.startswith(ATOMIC_BACKENDS)
+
+def _path(key):
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return Path(settings.LEASE_DIR) / digest[:2] / digest
+
+@contextmanager
+def _locked(path):
+    """Archivo abierto y bloqueado; se reintenta si otro proceso lo borró mientras tanto"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            _process_lock.acquire()
+            break
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+    try:
+        yield fd
+    finally:
+        if fcntl is None:
+            _process_lock.release()
+        os.close(fd)
+
+def _read(fd):
+    """(valor, caducidad) guardados, o (None, 0) si el archivo está vacío o roto"""
+    os.lseek(fd, 0, os.SEEK_SET)
+    data = b''
+    while chunk := os.read(fd, 4096):
+        data += chunk
+    try:
+        lease = json.loads(data)
+        return lease['value'], lease['expires']
+    except (ValueError, KeyError, TypeError):
+        return None, 0
+
+def _write(fd, value, timeout):
+    data = json.dumps({'value': value, 'expires': time.time() + timeout}).encode() if value is not None else b''
+    os.ftruncate(fd, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
+    os.write(fd, data)
+
+def add(key, value, timeout):
+    """Reserva `key` con `value` durante `timeout` segundos; False si ya está reservada"""
+    if uses_cache():
+        return _cache().add(key, value, timeout)
+    with _locked(_path(key)) as fd:
+        current, expires = _read(fd)
+        if current is not None and expires > time.time():
+            return False
+        _write(fd, value, timeout)
+        return True
+
+def release(key, value):
+    """Libera `key` si sigue reservada con `value` (no la de otro tras caducar)"""
+    if uses_cache():
+        cache = _cache()
+        if cache.get(key) == value:
+            cache.delete(key)
+        return
+    path = _path(key)
+    if not path.exists():
+        return
+    with _locked(path) as fd:
+        if _read(fd)[0] == value:
+            _write(fd, None, 0)
+
+def purge_expired():
+    """Borra los archivos de reservas caducadas o liberadas. Devuelve cuántos"""
+    root = Path(settings.LEASE_DIR)
+    if uses_cache() or not root.is_dir():
+        return 0
+    purged = 0
+    now = time.time()
+    for path in root.glob('*/*'):
+        try:
+            with _locked(path) as fd:
+                value, expires = _read(fd)
+                if value is None or expires <= now:
+                    path.unlink()
+                    purged += 1
+        except OSError:
+            continue
+    return purged
@@ -0,0 +1,450 @@
+"""
+Utilidades para pruebas de carga HTTP sin dependencias externas.
+
+Incluye un cliente HTTP/1.1 asíncrono mínimo (conexión persistente, cookies y
+CSRF de Django), un acumulador de latencias por endpoint, ayudas para levantar
+el servidor de la aplicación en un subproceso contra una base de datos de
+prueba y una mezcla de tráfico realista (TRAFFIC_MIX) con los flujos
+principales de la aplicación.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+class HttpClient:
+    """Cliente HTTP/1.1 asíncrono con una conexión persistente y cookies"""
+
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = self._writer = None
+
+    async def _connect(self):
+        if self._writer is None or self._writer.is_closing():
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, data=None, headers=None):
+        """Devuelve (status, headers, body); reconecta una vez si el servidor cerró la conexión"""
+        for attempt in range(2):
+            await self._connect()
+            try:
+                return await asyncio.wait_for(self._send(method, path, data, headers), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _send(self, method, path, data, headers):
+        body = urlencode(data, doseq=True).encode() if data is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        if method != 'GET':
+            lines.append('Content-Type: application/x-www-form-urlencoded')
+            lines.append(f'Content-Length: {len(body)}')
+            if 'csrftoken' in self.cookies:
+                lines.append(f'X-CSRFToken: {self.cookies["csrftoken"]}')
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await self._reader.readuntil(b'\r\n')).decode('latin-1').strip()
+            if not line:
+                break
+            name, value = line.split(':', 1)
+            name = name.strip().lower()
+            if name == 'set-cookie':
+                cookie_name, cookie_value = value.strip().split(';', 1)[0].split('=', 1)
+                self.cookies[cookie_name] = cookie_value
+            response_headers[name] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            response_body = b''.join(chunks)
+        else:
+            response_body = await self._reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, response_body
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, data=None, **kwargs):
+        return await self.request('POST', path, data=data or {}, **kwargs)
+
+    async def get_json(self, path):
+        status, headers, body = await self.get(path)
+        return status, json.loads(body) if status == 200 else None
+
+    async def login(self, username, password):
+        """Inicia sesión con el formulario de login (obtiene antes la cookie CSRF)"""
+        await self.get('/login/')
+        status, headers, body = await self.post('/login/', {
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''),
+        })
+        return status == 302 and 'sessionid' in self.cookies
+
+def percentile(values, q):
+    """Percentil q (0-100) por interpolación lineal"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+class LoadStats:
+    """Latencias y errores por endpoint durante una prueba"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, seconds, ok):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self):
+        """Lista de filas por endpoint más una fila 'TOTAL'"""
+        rows = []
+        names = sorted(self.latencies)
+        for name in names + ['TOTAL']:
+            if name == 'TOTAL':
+                latencies = [value for name in names for value in self.latencies[name]]
+                errors = sum(self.errors.values())
+            else:
+                latencies = self.latencies[name]
+                errors = self.errors[name]
+            rows.append({
+                'endpoint': name,
+                'requests': len(latencies),
+                'rps': len(latencies) / self.elapsed if self.elapsed else 0,
+                'error_rate': errors / len(latencies) if latencies else 0,
+                'p50': percentile(latencies, 50) * 1000,
+                'p95': percentile(latencies, 95) * 1000,
+                'p99': percentile(latencies, 99) * 1000,
+            })
+        return rows
+
+    def format_table(self):
+        lines = [f'{"Endpoint":<28}{"peticiones":>11}{"req/s":>9}{"errores":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}']
+        for row in self.summary():
+            lines.append(
+                f'{row["endpoint"]:<28}{row["requests"]:>11}{row["rps"]:>9.1f}{row["error_rate"]:>9.1%}'
+                f'{row["p50"]:>9.1f}{row["p95"]:>9.1f}{row["p99"]:>9.1f}'
+            )
+        return '\n'.join(lines)
+
+async def run_load(host, port, scenario, concurrency=20, duration=10, setup=None, seed=0):
+    """
+    Ejecuta `concurrency` usuarios virtuales durante `duration` segundos.
+
+    `scenario` es una lista de (nombre, peso, corrutina(client, rng)) que debe
+    devolver el status HTTP, o una función que recibe el índice del usuario
+    virtual y devuelve esa lista. `setup(client, index)` prepara cada usuario
+    (por ejemplo, iniciar sesión) antes de empezar a medir.
+    """
+    stats = LoadStats()
+    clients = [HttpClient(host, port) for _ in range(concurrency)]
+    if setup:
+        await asyncio.gather(*(setup(client, index) for index, client in enumerate(clients)))
+
+    async def virtual_user(index, client, deadline):
+        rng = random.Random(seed + index)
+        actions = scenario(index) if callable(scenario) else scenario
+        names = [name for name, weight, action in actions]
+        weights = [weight for name, weight, action in actions]
+        by_name = {name: action for name, weight, action in actions}
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = await by_name[name](client, rng)
+                    ok = status < 400
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    ok = False
+                    await client.close()
+                stats.record(name, time.perf_counter() - started, ok)
+        finally:
+            await client.close()
+
+    stats.started = time.perf_counter()
+    deadline = stats.started + duration
+    await asyncio.gather(*(virtual_user(index, client, deadline) for index, client in enumerate(clients)))
+    stats.stop()
+    return stats
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(host, port, timeout=30, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'El servidor terminó con código {process.returncode}')
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'El servidor no respondió en {host}:{port} tras {timeout}s')
+
+def manage_py(*args, env=None):
+    """Ejecuta manage.py en un subproceso con el entorno indicado"""
+    subprocess.run([sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), *args],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+
+@contextmanager
+def loadtest_database(users=50, recipes=500, likes=2000, searches=1000):
+    """
+    Crea una base SQLite temporal con datos sintéticos y un usuario admin, y
+    devuelve el entorno (variables) para arrancar servidores contra ella. Todo
+    lo que los servidores escriben en disco (eventos, caché, reservas,
+    instantáneas, perfiles) va al mismo directorio temporal, y los trabajos
+    encolados no se ejecutan: la tarea events.ingest movería segmentos reales a
+    la base temporal y snapshots.export sustituiría las instantáneas reales.
+    """
+    with tempfile.TemporaryDirectory(prefix='loadtest_') as tmpdir:
+        env = dict(os.environ)
+        env.pop('DATABASE_REPLICA_URL', None)
+        env['DATABASE_URL'] = f'sqlite:///{Path(tmpdir) / "loadtest.sqlite3"}'
+        env['SQLITE_PERFORMANCE_PROFILE'] = '1'
+        # Servidores en frío, igual para WSGI y ASGI (ver gunicorn.conf.py)
+        env['WARM_CACHES_ON_START'] = '0'
+        env['JOB_QUEUE_EAGER'] = '0'
+        env['CACHE_BACKEND'] = 'locmem'
+        env.pop('MEMCACHED_LOCATION', None)
+        for name, directory in (('EVENT_LOG_DIR', 'eventlog'), ('FILE_CACHE_DIR', 'cache'), ('LEASE_DIR', 'leases'),
+                                ('SNAPSHOT_ROOT', 'snapshots'), ('PROFILING_DIR', 'profiles'),
+                                ('METRICS_DIR', 'metrics')):
+            env[name] = str(Path(tmpdir) / directory)
+        manage_py('migrate', '--noinput', env=env)
+        manage_py('generate_dataset', f'--users={users}', f'--recipes={recipes}',
+                  f'--likes={likes}', f'--searches={searches}', env=env)
+        manage_py('createadmin', env=env)
+        yield env
+
+@contextmanager
+def app_server(command, port, env):
+    """Arranca `command` (lista) en un subproceso y espera a que escuche en `port`"""
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR,
+                                   stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            try:
+                wait_for_port('127.0.0.1', port, process=process)
+            except RuntimeError as e:
+                log.seek(0)
+                raise RuntimeError(f'{e}\n{log.read().decode(errors="replace")[-2000:]}')
+            yield process
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+def server_commands(port, workers):
+    """Comandos para servir la app en modo síncrono (WSGI) y asíncrono (ASGI)"""
+    return {
+        'wsgi': [sys.executable, '-m', 'gunicorn', 'baseDeProyectos.wsgi:application',
+                 '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning'],
+        'asgi': [sys.executable, '-m', 'uvicorn', 'baseDeProyectos.asgi:application',
+                 '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+                 '--no-access-log', '--log-level', 'warning'],
+    }
+
+# Flujos de la mezcla de tráfico: (nombre, peso, solo para usuarios con sesión)
+TRAFFIC_MIX = [
+    ('browse', 30, False),
+    ('search', 14, False),
+    ('detail', 24, False),
+    ('autocomplete', 10, False),
+    ('ingredient_search', 6, False),
+    ('like', 6, True),
+    ('recommendations', 4, True),
+    ('smart_recommendations', 3, True),
+    ('login', 3, False),
+]
+
+SEARCH_QUERIES = ['pasta', 'pollo', 'arroz', 'postre', 'ensalada', 'sopa', 'prueba', 'receta 1']
+AUTOCOMPLETE_PREFIXES = ['ac', 'ag', 'ha', 'in', 'to', 'po', 'qu', 'ce', 'ar', 'le']
+SORTS = ['', 'likes', 'trending']
+
+RECIPE_LINK = re.compile(rb'/receta/(\d+)/')
+INGREDIENT_CHOICE = re.compile(rb'name="ingredients" value="(\d+)"')
+
+async def discover_targets(host, port, list_pages=5):
+    """
+    Recorre como anónimo las primeras páginas del listado y el formulario de
+    búsqueda por ingredientes y devuelve {'recipes': [ids], 'ingredients': [ids]}
+    (solo recetas publicadas, las que enlaza la web)
+    """
+    client = HttpClient(host, port)
+    recipes = set()
+    try:
+        for page in range(1, list_pages + 1):
+            status, headers, body = await client.get(f'/?page={page}')
+            if status != 200:
+                break
+            recipes.update(int(recipe_id) for recipe_id in RECIPE_LINK.findall(body))
+        status, headers, body = await client.get('/buscar-por-ingredientes/')
+        ingredients = [int(ingredient_id) for ingredient_id in INGREDIENT_CHOICE.findall(body)]
+    finally:
+        await client.close()
+    if not recipes:
+        raise RuntimeError('No se encontraron recetas publicadas en el listado')
+    return {'recipes': sorted(recipes), 'ingredients': ingredients}
+
+def traffic_scenario(targets, usernames, password, anonymous_share=0.3, mix=TRAFFIC_MIX):
+    """
+    Devuelve (scenario, setup) para run_load(): cada usuario virtual es anónimo
+    (la proporción `anonymous_share`) o inicia sesión con uno de `usernames`, y
+    elige flujos de `mix` según su peso. El listado amplía la lista de recetas
+    que luego se visitan, como haría alguien navegando.
+    """
+    recipes = list(targets['recipes'])
+    known_recipes = set(recipes)
+    ingredients = targets['ingredients']
+
+    def is_anonymous(index):
+        return index % 10 < round(anonymous_share * 10)
+
+    async def browse(client, rng):
+        page = rng.choices([1, 2, 3, 4, 5], [50, 20, 15, 10, 5])[0]
+        sort = rng.choice(SORTS)
+        query = f'?page={page}' + (f'&sort={sort}' if sort else '')
+        status, headers, body = await client.get(f'/{query}')
+        for recipe_id in RECIPE_LINK.findall(body):
+            if int(recipe_id) not in known_recipes:
+                known_recipes.add(int(recipe_id))
+                recipes.append(int(recipe_id))
+        return status
+
+    async def search(client, rng):
+        params = {'query': rng.choice(SEARCH_QUERIES)}
+        if rng.random() < 0.3:
+            params['difficulty'] = rng.choice(['facil', 'intermedio', 'dificil'])
+        if rng.random() < 0.3:
+            params['max_time'] = rng.choice([20, 45, 90])
+        status, headers, body = await client.get(f'/?{urlencode(params)}')
+        return status
+
+    async def detail(client, rng):
+        status, headers, body = await client.get(f'/receta/{rng.choice(recipes)}/')
+        return status
+
+    async def autocomplete(client, rng):
+        status, headers, body = await client.get(f'/api/search-ingredients/?q={rng.choice(AUTOCOMPLETE_PREFIXES)}')
+        return status
+
+    async def ingredient_search(client, rng):
+        if not ingredients:
+            status, headers, body = await client.get('/buscar-por-ingredientes/')
+            return status
+        selected = rng.sample(ingredients, min(len(ingredients), rng.randint(1, 4)))
+        status, headers, body = await client.get(f'/buscar-por-ingredientes/?{urlencode({"ingredients": selected}, doseq=True)}')
+        return status
+
+    async def like(client, rng):
+        status, headers, body = await client.post(f'/receta/{rng.choice(recipes)}/like/')
+        return status
+
+    async def recommendations(client, rng):
+        status, headers, body = await client.get('/recomendaciones/')
+        return status
+
+    async def smart_recommendations(client, rng):
+        status, headers, body = await client.get('/recomendaciones-ia/')
+        return status
+
+    async def login(client, rng):
+        # Inicio de sesión completo con una conexión nueva, sin tocar la del usuario virtual
+        visitor = HttpClient(client.host, client.port)
+        try:
+            logged_in = await visitor.login(rng.choice(usernames), password)
+        finally:
+            await visitor.close()
+        return 302 if logged_in else 401
+
+    flows = {
+        'browse': browse,
+        'search': search,
+        'detail': detail,
+        'autocomplete': autocomplete,
+        'ingredient_search': ingredient_search,
+        'like': like,
+        'recommendations': recommendations,
+        'smart_recommendations': smart_recommendations,
+        'login': login,
+    }
+    anonymous_actions = [(name, weight, flows[name]) for name, weight, needs_login in mix if not needs_login]
+    user_actions = [(name, weight, flows[name]) for name, weight, needs_login in mix]
+
+    def scenario(index):
+        return anonymous_actions if is_anonymous(index) else user_actions
+
+    async def setup(client, index):
+        if is_anonymous(index):
+            return
+        # Cada usuario virtual entra con su propia cuenta mientras haya cuentas suficientes
+        username = usernames[index % len(usernames)]
+        if not await client.login(username, password):
+            raise RuntimeError(f'El usuario virtual {index} ({username}) no pudo iniciar sesión')
+
+    return scenario, setup
@@ -0,0 +1,116 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+from main.dataset import generate_dataset
+from main.models import CustomUser, Recipe, RecipeLike, UserSearchHistory
+from main.sqlite import apply_sqlite_profile, retry_on_locked
+
+class Command(BaseCommand):
+    help = 'Compara escrituras concurrentes en SQLite con la configuración por defecto y con el perfil de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Hilos escritores concurrentes')
+        parser.add_argument('--ops', type=int, default=200, help='Operaciones por hilo')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=200)
+
+    def handle(self, *args, **options):
+        tmpdir = Path(tempfile.mkdtemp(prefix='bench_sqlite_'))
+        try:
+            # El perfil se aplica a mano solo a la base "perfil"
+            with override_settings(SQLITE_PERFORMANCE_PROFILE=False):
+                results = [
+                    self.run_scenario('por defecto', tmpdir / 'default.sqlite3', False, options),
+                    self.run_scenario('perfil', tmpdir / 'profile.sqlite3', True, options),
+                ]
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write('')
+        self.stdout.write(f'{"Escenario":<14}{"ops/s":>10}{"ok":>8}{"errores":>10}{"tiempo (s)":>12}')
+        for result in results:
+            self.stdout.write(
+                f'{result["label"]:<14}{result["throughput"]:>10.1f}{result["ok"]:>8}'
+                f'{result["errors"]:>10}{result["elapsed"]:>12.2f}'
+            )
+
+        baseline, tuned = results
+        if baseline['throughput']:
+            gain = tuned['throughput'] / baseline['throughput']
+            self.stdout.write(self.style.SUCCESS(f'Mejora de rendimiento: x{gain:.2f}'))
+
+    def register_alias(self, alias, path, tuned):
+        config = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(path),
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20} if tuned else {},
+        }
+        databases = {'default': settings.DATABASES['default'], alias: config}
+        connections.settings[alias] = connections.configure_settings(databases)[alias]
+
+    def run_scenario(self, label, path, tuned, options):
+        alias = f'bench_{"profile" if tuned else "default"}'
+        self.register_alias(alias, path, tuned)
+        self.stdout.write(f'Preparando escenario "{label}"...')
+        call_command('migrate', database=alias, verbosity=0)
+        if tuned:
+            apply_sqlite_profile(connections[alias])
+        generate_dataset(users=options['users'], recipes=options['recipes'], likes=0, searches=0, using=alias)
+
+        user_ids = list(CustomUser.objects.using(alias).values_list('id', flat=True))
+        recipe_ids = list(Recipe.objects.using(alias).values_list('id', flat=True))
+        connections[alias].close()
+
+        counters = {'ok': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def toggle_like(user_id, recipe_id):
+            with transaction.atomic(using=alias):
+                like, created = RecipeLike.objects.using(alias).get_or_create(user_id=user_id, recipe_id=recipe_id)
+                if not created:
+                    like.delete()
+            UserSearchHistory.objects.using(alias).create(user_id=user_id, search_term='benchmark')
+
+        if tuned:
+            toggle_like = retry_on_locked(toggle_like, using=alias)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            if tuned:
+                apply_sqlite_profile(connections[alias])
+            ok = errors = 0
+            for _ in range(options['ops']):
+                try:
+                    toggle_like(rng.choice(user_ids), rng.choice(recipe_ids))
+                    ok += 1
+                except OperationalError:
+                    errors += 1
+            connections[alias].close()
+            with lock:
+                counters['ok'] += ok
+                counters['errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'label': label,
+            'ok': counters['ok'],
+            'errors': counters['errors'],
+            'elapsed': elapsed,
+            'throughput': counters['ok'] / elapsed if elapsed else 0,
+        }
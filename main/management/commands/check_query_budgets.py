@@ -0,0 +1,245 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from main import cache
+from main.dataset import clear_scratch_caches, generate_dataset, scratch_database
+from main.models import CustomUser, Ingredient, Recipe, Tag
+from main.urls import urlpatterns
+
+@dataclass
+class Route:
+    """Cómo se pide una URL: quién, con qué método y con qué datos"""
+    role: Optional[str] = None          # None (anónimo), 'user' o 'admin'
+    method: str = 'GET'
+    data: Optional[Callable] = None     # fixture -> dict (query string o cuerpo del POST)
+    restore: bool = False               # repetir la petición (sin medir) para deshacer el cambio
+
+# Todas las URL de main/urls.py; una URL nueva sin entrada aquí hace fallar el comando
+ROUTES = {
+    'register': Route(),
+    'login': Route(),
+    'logout': Route('user'),
+    'user_panel': Route('user'),
+    'admin_panel': Route('admin'),
+    'admin_users': Route('admin'),
+    'admin_recipes': Route('admin'),
+    'admin_toggle_user_status': Route('admin', 'POST', restore=True),
+    'admin_toggle_recipe_status': Route('admin', 'POST', restore=True),
+    'admin_delete_user': Route('admin'),
+    'admin_delete_recipe': Route('admin'),
+    'admin_bulk_users': Route('admin', 'POST', lambda f: {'action': 'activate', 'user_ids': f.user_ids}),
+    'admin_bulk_recipes': Route('admin', 'POST', lambda f: {'action': 'publish', 'recipe_ids': f.published_ids}),
+    'admin_deletion_jobs': Route('admin'),
+    'admin_deletion_job_reset': Route('admin', 'POST'),
+    'admin_jobs': Route('admin'),
+    'admin_job_retry': Route('admin', 'POST'),
+    'metrics': Route('admin'),
+    'admin_profiles': Route('admin'),
+    'admin_profile_detail': Route('admin'),
+    'admin_profile_flamegraph': Route('admin'),
+    'admin_ingredients': Route('admin'),
+    'admin_ingredient_create': Route('admin'),
+    'admin_ingredient_edit': Route('admin'),
+    'admin_ingredient_delete': Route('admin'),
+    'admin_tags': Route('admin'),
+    'admin_tag_create': Route('admin'),
+    'admin_tag_edit': Route('admin'),
+    'admin_tag_delete': Route('admin'),
+    'recipe_list': Route(),
+    'recipe_list_alt': Route('user', data=lambda f: {'tags': f.tag_ids, 'sort': 'likes'}),
+    'recipe_detail': Route('user'),
+    'recipe_create': Route('user'),
+    'my_recipes': Route('user'),
+    'recipe_edit': Route('user'),
+    'recipe_delete': Route('user'),
+    'toggle_like': Route('user', 'POST', restore=True),
+    'search_by_ingredients': Route('user', data=lambda f: {'ingredients': f.ingredient_ids}),
+    'recommendations': Route('user'),
+    'update_preferences': Route('user'),
+    'smart_recommendations': Route('user'),
+    'search_ingredients_api': Route(data=lambda f: {'q': 'in'}),
+}
+
+# N+1 ya existentes: máximo de consultas de cada URL con los datos del tamaño
+# grande (con --small y --large por defecto). Una URL cuyas consultas crecen con los datos
+# solo pasa si está aquí y no supera su techo; al corregir un N+1 hay que bajar
+# el techo o quitar la entrada.
+QUERY_CEILINGS = {
+    'user_panel': 24,
+    'admin_panel': 32,
+    'admin_recipes': 64,
+    'recipe_list': 20,
+    'recipe_list_alt': 22,
+    'recipe_detail': 28,
+    'my_recipes': 24,
+    'recipe_edit': 16,
+    'search_by_ingredients': 460,
+    'recommendations': 77,
+    'update_preferences': 141,
+    'smart_recommendations': 1294,
+}
+
+# Consultas que dependen del reloj y no del volumen de datos (bus de invalidación de la caché)
+IGNORED_TABLES = ('main_cachenamespaceversion',)
+
+def query_signature(sql):
+    """SQL sin literales ni listas IN, para agrupar las consultas repetidas"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return ' '.join(sql.split())
+
+@dataclass
+class Fixture:
+    """Objetos con los que se piden las URL en un tamaño de datos"""
+    user: CustomUser
+    admin: CustomUser
+    target_user: CustomUser
+    recipe: Recipe
+    tag_ids: list
+    ingredient_ids: list
+    user_ids: list
+    published_ids: list
+
+    def url_kwargs(self, pattern):
+        values = {
+            'recipe_id': self.recipe.id,
+            'user_id': self.target_user.id,
+            'ingredient_id': self.ingredient_ids[0],
+            'tag_id': self.tag_ids[0],
+            'job_id': 0,
+            'profile_id': '00000000-000000-000000-000000',
+        }
+        return {name: values[name] for name in pattern.pattern.converters}
+
+def build_fixture(admin, largest):
+    """
+    Elige el usuario (con recetas publicadas) y la receta con menos filas
+    relacionadas en el tamaño pequeño y con más en el grande, para que cada
+    vista vea crecer el volumen que recorre
+    """
+    order = '-' if largest else ''
+    recipe = Recipe.objects.filter(is_published=True, author__role='user').annotate(
+        related=Count('likes', distinct=True) + Count('tags', distinct=True) + Count('ingredients', distinct=True)
+    ).order_by(f'{order}related', 'id').select_related('author').first()
+    if recipe is None:
+        raise CommandError('El conjunto de datos no tiene recetas publicadas')
+    user = recipe.author
+    target_user = CustomUser.objects.filter(role='user').exclude(id=user.id).order_by('id').first()
+    return Fixture(
+        user=user,
+        admin=admin,
+        target_user=target_user,
+        recipe=recipe,
+        tag_ids=list(recipe.tags.values_list('id', flat=True)) or list(Tag.objects.values_list('id', flat=True)[:1]),
+        ingredient_ids=list(recipe.ingredients.values_list('id', flat=True)) or
+        list(Ingredient.objects.values_list('id', flat=True)[:1]),
+        user_ids=list(CustomUser.objects.filter(role='user', is_active=True).values_list('id', flat=True)),
+        published_ids=list(Recipe.objects.filter(is_published=True).values_list('id', flat=True)),
+    )
+
+def measure(name, pattern, route, fixture):
+    """(status, [firmas de las consultas]) de una petición con las cachés vacías"""
+    client = Client()
+    if route.role:
+        client.force_login(fixture.admin if route.role == 'admin' else fixture.user)
+    path = reverse(name, kwargs=fixture.url_kwargs(pattern))
+    data = route.data(fixture) if route.data else None
+    send = client.post if route.method == 'POST' else client.get
+
+    clear_scratch_caches()
+    cache.sync_versions(force=True)
+    with CaptureQueriesContext(connection) as queries:
+        response = send(path, data)
+    signatures = [query_signature(query['sql']) for query in queries.captured_queries]
+    if route.restore:
+        send(path, data)
+    return response.status_code, [sql for sql in signatures if not any(table in sql for table in IGNORED_TABLES)]
+
+class Command(BaseCommand):
+    help = ('Pide cada URL de main/urls.py con datos de dos tamaños en una base temporal y falla si '
+            'el número de consultas crece con el volumen (N+1), mostrando las consultas repetidas')
+    DEFAULT_SMALL = 6
+    DEFAULT_LARGE = 300
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=self.DEFAULT_SMALL, help='Recetas del tamaño pequeño')
+        parser.add_argument('--large', type=int, default=self.DEFAULT_LARGE,
+                            help='Recetas que se añaden para el tamaño grande (los techos de '
+                                 'QUERY_CEILINGS solo se aplican con los tamaños por defecto)')
+        parser.add_argument('--only', nargs='*', default=[], help='Comprobar solo estas URL (por nombre)')
+
+    def handle(self, *args, **options):
+        patterns = {pattern.name: pattern for pattern in urlpatterns if isinstance(pattern, URLPattern)}
+        missing = sorted(set(patterns) - set(ROUTES))
+        if missing:
+            raise CommandError(f'URL sin entrada en ROUTES: {", ".join(missing)}')
+        names = options['only'] or list(patterns)
+
+        runtime = override_settings(EVENT_LOG_ENABLED=False, SNAPSHOT_FALLBACK_ENABLED=False,
+                                    VIEW_COUNT_FLUSH_SECONDS=3600)
+        with scratch_database(), runtime:
+            admin = CustomUser.objects.create_user('budget-admin', password='budget-admin', role='admin')
+
+            self.stdout.write('Generando datos de prueba (pequeño)...')
+            small = options['small']
+            generate_dataset(users=4, recipes=small, likes=small * 2, searches=small,
+                             tags=4, ingredients=10, seed=1)
+            results = {'small': {}, 'large': {}}
+            fixture = build_fixture(admin, largest=False)
+            for name in names:
+                results['small'][name] = measure(name, patterns[name], ROUTES[name], fixture)
+
+            self.stdout.write('Generando datos de prueba (grande)...')
+            large = options['large']
+            generate_dataset(users=large // 5, recipes=large, likes=large * 8, searches=large * 2,
+                             tags=16, ingredients=120, seed=2)
+            fixture = build_fixture(admin, largest=True)
+            for name in names:
+                results['large'][name] = measure(name, patterns[name], ROUTES[name], fixture)
+
+        # Los techos se midieron con los tamaños por defecto
+        ceiling_applies = (options['small'], options['large']) == (self.DEFAULT_SMALL, self.DEFAULT_LARGE)
+        failures = []
+        known = []
+        for name in names:
+            small_status, small_queries = results['small'][name]
+            large_status, large_queries = results['large'][name]
+            counts = f'{len(small_queries)} → {len(large_queries)} consultas (HTTP {small_status}/{large_status})'
+            if max(small_status, large_status) >= 500:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'✗ {name}: error del servidor, {counts}'))
+                continue
+            before = Counter(small_queries)
+            grown = [(signature, before[signature], count) for signature, count in Counter(large_queries).most_common()
+                     if count > before[signature]]
+            if len(large_queries) <= len(small_queries) or not grown:
+                self.stdout.write(self.style.SUCCESS(f'✓ {name}: {counts}'))
+                continue
+
+            ceiling = QUERY_CEILINGS.get(name)
+            if ceiling is None:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'✗ {name}: {counts}'))
+            elif ceiling_applies and len(large_queries) > ceiling:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'✗ {name}: {counts}, por encima del techo de {ceiling}'))
+            else:
+                known.append(name)
+                self.stdout.write(self.style.WARNING(f'! {name}: {counts} (N+1 conocido, techo {ceiling})'))
+            for signature, small_count, large_count in grown:
+                self.stdout.write(f'    {small_count} → {large_count}x  {signature[:300]}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} URL con consultas que crecen con los datos: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(names) - len(known)} URL con número de consultas constante, {len(known)} con N+1 conocidos'
+        ))
@@ -0,0 +1,85 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from main.dataset import generate_dataset, scratch_database
+from main.models import Recipe, RecipeLike, UserSearchHistory
+
+# Planes que indican un recorrido secuencial de tabla
+SEQUENTIAL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(?!CONSTANT ROW)\S+\s*$', re.MULTILINE),
+    'postgresql': re.compile(r'\bSeq Scan on\b'),
+}
+
+def hot_querysets(user_id, recipe_id):
+    """Consultas más frecuentes de la aplicación (nombre, queryset)"""
+    now = timezone.now()
+    return [
+        ('Recetas publicadas recientes (recipe_list)',
+         Recipe.objects.filter(is_published=True).order_by('-created_at')[:12]),
+        ('Recetas publicadas en tendencia (recipe_list?sort=trending)',
+         Recipe.objects.filter(is_published=True).order_by('-trending_score', '-created_at')[:12]),
+        ('Recetas ocultas (admin_recipes?status=unpublished)',
+         Recipe.objects.filter(is_published=False).order_by('-created_at')[:20]),
+        ('Todas las recetas recientes (admin_recipes, admin_panel)',
+         Recipe.objects.order_by('-created_at')[:20]),
+        ('Recetas de un autor (my_recipes, user_panel)',
+         Recipe.objects.filter(author_id=user_id).order_by('-created_at')[:10]),
+        ('Me gusta de una receta (likes_count)',
+         RecipeLike.objects.filter(recipe_id=recipe_id).values('recipe').annotate(n=Count('id'))),
+        ('Me gusta de un usuario (recomendaciones)',
+         RecipeLike.objects.filter(user_id=user_id).values('user').annotate(n=Count('id'))),
+        ('Me gusta de un usuario a una receta (recipe_detail)',
+         RecipeLike.objects.filter(user_id=user_id, recipe_id=recipe_id)),
+        ('Últimas búsquedas de un usuario (recommendations)',
+         UserSearchHistory.objects.filter(user_id=user_id).order_by('-created_at')[:10]),
+        ('Búsquedas de los últimos 30 días (analyze_user_profile)',
+         UserSearchHistory.objects.filter(
+             user_id=user_id, created_at__gte=now - timedelta(days=30)
+         ).order_by('-created_at')[:20]),
+    ]
+
+class Command(BaseCommand):
+    help = ('Genera un conjunto de datos en una base temporal, ejecuta EXPLAIN sobre las consultas '
+            'más frecuentes y falla si alguna hace un recorrido secuencial')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--searches', type=int, default=50000)
+        parser.add_argument('--verbose-plans', action='store_true', help='Mostrar el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            pattern = SEQUENTIAL_SCAN_PATTERNS.get(connection.vendor)
+            if pattern is None:
+                raise CommandError(f'Motor de base de datos no soportado: {connection.vendor}')
+
+            self.stdout.write('Generando datos de prueba...')
+            generate_dataset(users=options['users'], recipes=options['recipes'],
+                             likes=options['likes'], searches=options['searches'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            user_id = RecipeLike.objects.values_list('user_id', flat=True).first()
+            recipe_id = RecipeLike.objects.values_list('recipe_id', flat=True).first()
+
+            failures = []
+            for name, queryset in hot_querysets(user_id, recipe_id):
+                plan = queryset.explain()
+                if pattern.search(plan):
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'✗ {name}'))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'✓ {name}'))
+                    if options['verbose_plans']:
+                        self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)} consulta(s) con recorrido secuencial: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Ninguna consulta frecuente hace un recorrido secuencial'))
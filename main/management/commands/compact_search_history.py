@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.search_history import DEFAULT_BATCH_SIZE, DEFAULT_RETENTION_DAYS, compact_search_history
+
+class Command(BaseCommand):
+    help = 'Acumula el historial de búsquedas antiguo en agregados por usuario y lo borra por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=DEFAULT_RETENTION_DAYS,
+                            help=f'Días de historial sin compactar que se conservan (por defecto {DEFAULT_RETENTION_DAYS})')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Filas por lote (por defecto {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo contar las filas que se compactarían')
+
+    def handle(self, *args, **options):
+        try:
+            compacted = compact_search_history(
+                retention_days=options['retention_days'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Se compactarían {compacted} búsquedas'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Búsquedas compactadas: {compacted}'))
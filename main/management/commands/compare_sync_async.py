@@ -0,0 +1,101 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from main.dataset import DATASET_PASSWORD
+from main.loadtest import app_server, free_port, loadtest_database, run_load, server_commands
+
+SEARCH_PREFIXES = ['ac', 'ag', 'ha', 'in', 'to', 'po', 'qu', 'ce', 'ar', 'le']
+
+# Usuarios extra que los administradores virtuales activan y desactivan
+MODERATION_TARGETS = 10
+
+# (clave, descripción, servidor, variables de entorno). ASGI con las vistas
+# síncronas separa el coste del servidor del de la implementación
+CONFIGURATIONS = [
+    ('wsgi', 'WSGI, vistas síncronas', 'wsgi', {'ASYNC_VIEWS': '0'}),
+    ('asgi-sync', 'ASGI, vistas síncronas', 'asgi', {'ASYNC_VIEWS': '0'}),
+    ('asgi-async', 'ASGI, vistas asíncronas', 'asgi', {'ASYNC_VIEWS': '1'}),
+]
+
+class Command(BaseCommand):
+    help = ('Compara peticiones por segundo y latencias de las implementaciones síncrona (main/views.py) '
+            'y asíncrona (main/async_views.py) de los endpoints JSON: WSGI con las vistas síncronas y '
+            'ASGI con cada una de las dos, en la misma máquina')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Procesos de cada servidor')
+        parser.add_argument('--concurrency', type=int, default=50, help='Usuarios virtuales simultáneos')
+        parser.add_argument('--duration', type=int, default=15, help='Segundos de carga por servidor')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = options['users']
+        recipes = options['recipes']
+
+        async def search(client, rng):
+            status, headers, body = await client.get(f'/api/search-ingredients/?q={rng.choice(SEARCH_PREFIXES)}')
+            return status
+
+        async def like(client, rng):
+            status, headers, body = await client.post(f'/receta/{rng.randint(1, recipes)}/like/')
+            return status
+
+        async def toggle_recipe(client, rng):
+            status, headers, body = await client.post(f'/admin-panel/receta/{rng.randint(1, recipes)}/toggle-status/')
+            return status
+
+        async def toggle_user(client, rng):
+            # Solo se moderan los usuarios de reserva, nunca los que usan los usuarios virtuales
+            user_id = rng.randint(users + 1, users + MODERATION_TARGETS)
+            status, headers, body = await client.post(f'/admin-panel/usuario/{user_id}/toggle-status/')
+            return status
+
+        def scenario(index):
+            # Uno de cada diez usuarios virtuales es administrador
+            if index % 10 == 0:
+                return [('admin_toggle_recipe_status', 1, toggle_recipe),
+                        ('admin_toggle_user_status', 1, toggle_user)]
+            return [('search_ingredients_api', 3, search), ('toggle_like', 1, like)]
+
+        async def setup(client, index):
+            if index % 10 == 0:
+                logged_in = await client.login('admin', 'admin')
+            else:
+                logged_in = await client.login(f'bench-{index % users}', DATASET_PASSWORD)
+            if not logged_in:
+                raise CommandError(f'El usuario virtual {index} no pudo iniciar sesión')
+
+        results = {}
+        for key, label, server, extra_env in CONFIGURATIONS:
+            # Cada configuración parte de una base de datos idéntica y recién generada
+            self.stdout.write(f'Preparando base de datos de prueba para {label}...')
+            with loadtest_database(users=users + MODERATION_TARGETS, recipes=recipes) as env:
+                port = free_port()
+                self.stdout.write(f'Cargando {label} durante {options["duration"]}s...')
+                with app_server(server_commands(port, options['workers'])[server], port, {**env, **extra_env}):
+                    results[key] = asyncio.run(run_load(
+                        '127.0.0.1', port, scenario,
+                        concurrency=options['concurrency'],
+                        duration=options['duration'],
+                        setup=setup,
+                    ))
+
+        for key, label, server, extra_env in CONFIGURATIONS:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label} ({options["workers"]} procesos)'))
+            self.stdout.write(results[key].format_table())
+
+        totals = {key: stats.summary()[-1] for key, stats in results.items()}
+
+        def compare(title, key, baseline):
+            if not totals[baseline]['rps']:
+                return
+            self.stdout.write(self.style.SUCCESS(
+                f'{title}: x{totals[key]["rps"] / totals[baseline]["rps"]:.2f} req/s, '
+                f'p99 {totals[key]["p99"]:.1f} ms frente a {totals[baseline]["p99"]:.1f} ms'
+            ))
+
+        self.stdout.write('')
+        compare('Vistas asíncronas frente a síncronas (ambas con ASGI)', 'asgi-async', 'asgi-sync')
+        compare('Despliegue ASGI asíncrono frente al WSGI actual', 'asgi-async', 'wsgi')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from main.snapshots import export_snapshots, snapshot_root
+
+class Command(BaseCommand):
+    help = ('Genera instantáneas HTML estáticas de las recetas más vistas y de las primeras páginas '
+            'del listado, que se sirven a los anónimos cuando la base de datos está saturada')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100, help='Recetas más vistas (por defecto 100)')
+        parser.add_argument('--list-pages', type=int, default=3, help='Páginas del listado (por defecto 3)')
+        parser.add_argument('--list', action='store_true', dest='list_routes',
+                            help='Mostrar cada ruta generada')
+
+    def handle(self, *args, **options):
+        def progress(route, relative):
+            if options['list_routes']:
+                self.stdout.write(f'  {route} -> {relative}')
+
+        generated, errors = export_snapshots(options['recipes'], options['list_pages'], progress=progress)
+        for error in errors:
+            self.stderr.write(self.style.ERROR(f'  {error}'))
+        message = f'{generated} instantáneas en {snapshot_root()}'
+        self.stdout.write(self.style.WARNING(f'{message} ({len(errors)} con error)') if errors
+                          else self.style.SUCCESS(message))
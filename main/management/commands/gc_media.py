@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.media import DEFAULT_BATCH_SIZE, DEFAULT_MIN_AGE_HOURS, collect_orphans
+
+class Command(BaseCommand):
+    help = 'Borra los archivos de imagen (y sus derivados) que ya no usa ninguna receta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='recipes',
+                            help='Subdirectorio de MEDIA_ROOT a revisar (por defecto recipes)')
+        parser.add_argument('--min-age-hours', type=float, default=DEFAULT_MIN_AGE_HOURS,
+                            help=f'Ignorar archivos modificados hace menos de N horas (por defecto {DEFAULT_MIN_AGE_HOURS})')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Archivos comprobados por consulta (por defecto {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Hilos que borran cada lote en paralelo')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo listar los huérfanos sin borrarlos')
+
+    def handle(self, *args, **options):
+        try:
+            report = collect_orphans(
+                directory=options['directory'],
+                min_age_hours=options['min_age_hours'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for name in report.sample:
+            self.stdout.write(f'  {name}')
+        if report.orphans > len(report.sample):
+            self.stdout.write(f'  ... y {report.orphans - len(report.sample)} más')
+
+        summary = (f'{report.scanned} archivos revisados, {report.orphans} huérfanos '
+                   f'({report.derivatives} derivados, {report.bytes / 1024 / 1024:.1f} MB), '
+                   f'{report.too_recent} demasiado recientes')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Simulación: {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{summary}; {report.deleted} borrados'))
+        if report.failed:
+            self.stderr.write(self.style.ERROR(f'{report.failed} archivos no se pudieron borrar'))
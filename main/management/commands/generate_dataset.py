@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from main.dataset import DATASET_PASSWORD, generate_dataset
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos (usuarios, recetas, me gusta y búsquedas) para pruebas de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--likes', type=int, default=2000)
+        parser.add_argument('--searches', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=90, help='Días hacia atrás en los que repartir las fechas')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='bench', help='Prefijo de los nombres de usuario')
+
+    def handle(self, *args, **options):
+        created = generate_dataset(
+            users=options['users'],
+            recipes=options['recipes'],
+            likes=options['likes'],
+            searches=options['searches'],
+            days=options['days'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos generados: {created["users"]} usuarios, {created["recipes"]} recetas, '
+            f'{created["likes"]} me gusta, {created["searches"]} búsquedas\n'
+            f'Contraseña de los usuarios "{options["prefix"]}-N": {DATASET_PASSWORD}'
+        ))
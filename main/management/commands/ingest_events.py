@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from main.events import closed_segments, ingest_events
+
+class Command(BaseCommand):
+    help = ('Agrega los segmentos cerrados del registro de eventos a las tablas diarias '
+            '(eventos por tipo, estadísticas de recetas y búsquedas) y los archiva')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Directorio del registro (por defecto EVENT_LOG_DIR)')
+        parser.add_argument('--limit', type=int, help='Máximo de segmentos a agregar')
+        parser.add_argument('--delete', action='store_true',
+                            help='Borrar los segmentos agregados en lugar de moverlos a archive/')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo listar los segmentos pendientes')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            segments = closed_segments(options['dir'])
+            for path in segments:
+                self.stdout.write(f'  {path.name} ({path.stat().st_size} bytes)')
+            self.stdout.write(self.style.WARNING(f'Segmentos pendientes: {len(segments)}'))
+            return
+
+        segments, events = ingest_events(options['dir'], archive=not options['delete'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Segmentos agregados: {segments} ({events} eventos)'))
@@ -0,0 +1,96 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from main.images import JPEG_QUALITY, MAX_SIZE, process_file
+from main.models import RecipeImage
+
+DEFAULT_CHECKPOINT = Path(settings.BASE_DIR) / '.cache' / 'reprocess_images.json'
+
+class Command(BaseCommand):
+    help = ('Redimensiona y recomprime en paralelo todas las imágenes de recetas ya subidas, '
+            'saltando las ya procesadas y guardando un punto de control para poder reanudar')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Procesos del pool (por defecto, uno por núcleo)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Imágenes por lote (se guarda en la base y en el punto de control tras cada lote)')
+        parser.add_argument('--max-size', type=int, default=MAX_SIZE,
+                            help=f'Lado máximo en píxeles (por defecto {MAX_SIZE})')
+        parser.add_argument('--quality', type=int, default=JPEG_QUALITY,
+                            help=f'Calidad JPEG/WebP (por defecto {JPEG_QUALITY})')
+        parser.add_argument('--checkpoint', default=str(DEFAULT_CHECKPOINT),
+                            help='Archivo del punto de control')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignorar el punto de control y empezar desde la primera imagen')
+
+    def load_checkpoint(self, path, restart):
+        if restart or not path.exists():
+            return 0
+        return json.loads(path.read_text()).get('last_pk', 0)
+
+    def save_checkpoint(self, path, last_pk):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'last_pk': last_pk}))
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options['checkpoint'])
+        last_pk = self.load_checkpoint(checkpoint, options['restart'])
+        pending = RecipeImage.objects.filter(pk__gt=last_pk).exclude(image='')
+        total = pending.count()
+        if last_pk:
+            self.stdout.write(f'Reanudando desde la imagen {last_pk}')
+        self.stdout.write(f'{total} imágenes por revisar con {options["workers"]} procesos')
+
+        counts = {'processed': 0, 'skipped': 0, 'missing': 0, 'failed': 0}
+        bytes_before = bytes_after = 0
+        started = time.monotonic()
+
+        # Los procesos hijos no usan la base de datos; no deben heredar conexiones abiertas
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                rows = list(pending.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'image', 'content_hash'
+                )[:options['chunk_size']])
+                if not rows:
+                    break
+
+                tasks = [(pk, os.path.join(settings.MEDIA_ROOT, name), content_hash,
+                          options['max_size'], options['quality'])
+                         for pk, name, content_hash in rows]
+                chunksize = max(1, len(tasks) // (options['workers'] * 4))
+                changed = []
+                for pk, status, new_hash, before, after, error in executor.map(process_file, tasks, chunksize=chunksize):
+                    counts[status] += 1
+                    if status == 'processed':
+                        bytes_before += before
+                        bytes_after += after
+                        changed.append(RecipeImage(pk=pk, content_hash=new_hash))
+                    elif status == 'failed':
+                        self.stderr.write(f'Imagen {pk}: {error}')
+
+                RecipeImage.objects.bulk_update(changed, ['content_hash'], batch_size=500)
+                last_pk = rows[-1][0]
+                self.save_checkpoint(checkpoint, last_pk)
+
+                done = sum(counts.values())
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'  {done}/{total} ({done / elapsed:.1f} imágenes/s)')
+
+        elapsed = time.monotonic() - started
+        done = sum(counts.values())
+        saved = (bytes_before - bytes_after) / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts["processed"]} procesadas, {counts["skipped"]} ya procesadas, '
+            f'{counts["missing"]} sin archivo, {counts["failed"]} con error en {elapsed:.1f}s '
+            f'({done / elapsed if elapsed else 0:.1f} imágenes/s, {saved:.1f} MB ahorrados)'
+        ))
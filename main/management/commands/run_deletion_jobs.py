@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from main.deletion import CHUNK_SIZE, claim_next_job, retry_failed_jobs, run_deletion_job
+
+class Command(BaseCommand):
+    help = 'Ejecuta los borrados de usuarios y recetas encolados desde el panel de administración'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Filas borradas por transacción')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Volver a encolar los trabajos fallidos antes de empezar')
+        parser.add_argument('--loop', type=int, default=0, metavar='SEGUNDOS',
+                            help='Seguir esperando trabajos nuevos cada N segundos')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f'Trabajos fallidos reencolados: {retry_failed_jobs()}')
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['loop'])
+                continue
+
+            started = time.monotonic()
+            try:
+                run_deletion_job(job, chunk_size=options['chunk_size'])
+            except Exception:
+                # El error queda anotado en el trabajo ('failed'); se sigue con el siguiente
+                pass
+            elapsed = time.monotonic() - started
+            if job.status == 'done':
+                self.stdout.write(self.style.SUCCESS(
+                    f'{job}: {job.deleted_rows} filas borradas en {elapsed:.2f}s'
+                ))
+            else:
+                self.stderr.write(self.style.ERROR(f'{job}: {job.error}'))
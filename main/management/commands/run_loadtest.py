@@ -0,0 +1,74 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from main.dataset import DATASET_PASSWORD
+from main.loadtest import (app_server, discover_targets, free_port, loadtest_database, run_load,
+                           server_commands, traffic_scenario)
+
+class Command(BaseCommand):
+    help = ('Levanta la aplicación en local (gunicorn o uvicorn) sobre un conjunto de datos generado, '
+            'reproduce una mezcla ponderada de flujos reales (listado, búsqueda, detalle, me gusta, '
+            'autocompletado, ingredientes, recomendaciones e inicio de sesión) y muestra peticiones '
+            'por segundo, tasa de errores y percentiles de latencia por endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='Servidor: gunicorn (WSGI) o uvicorn (ASGI)')
+        parser.add_argument('--workers', type=int, default=2, help='Procesos del servidor')
+        parser.add_argument('--concurrency', type=int, default=30, help='Usuarios virtuales simultáneos')
+        parser.add_argument('--duration', type=int, default=30, help='Segundos de carga medidos')
+        parser.add_argument('--anonymous', type=float, default=0.3,
+                            help='Proporción de usuarios virtuales sin sesión (0-1)')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--likes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de la elección de flujos')
+        parser.add_argument('--json', help='Guarda el resumen en este archivo para comparar ejecuciones')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['anonymous'] <= 1:
+            raise CommandError('--anonymous debe estar entre 0 y 1')
+        usernames = [f'bench-{i}' for i in range(options['users'])]
+
+        self.stdout.write('Preparando base de datos de prueba...')
+        with loadtest_database(users=options['users'], recipes=options['recipes'], likes=options['likes']) as env:
+            port = free_port()
+            command = server_commands(port, options['workers'])[options['mode']]
+            with app_server(command, port, env):
+                targets = asyncio.run(discover_targets('127.0.0.1', port))
+                self.stdout.write(
+                    f'{len(targets["recipes"])} recetas y {len(targets["ingredients"])} ingredientes descubiertos; '
+                    f'cargando {options["mode"].upper()} ({options["workers"]} procesos, '
+                    f'{options["concurrency"]} usuarios virtuales) durante {options["duration"]}s...'
+                )
+                scenario, setup = traffic_scenario(targets, usernames, DATASET_PASSWORD, options['anonymous'])
+                try:
+                    stats = asyncio.run(run_load(
+                        '127.0.0.1', port, scenario,
+                        concurrency=options['concurrency'],
+                        duration=options['duration'],
+                        setup=setup,
+                        seed=options['seed'],
+                    ))
+                except RuntimeError as e:
+                    raise CommandError(str(e))
+
+        self.stdout.write('')
+        self.stdout.write(stats.format_table())
+        total = stats.summary()[-1]
+        self.stdout.write('')
+        message = (f'{total["rps"]:.1f} req/s, {total["error_rate"]:.1%} errores, '
+                   f'p95 {total["p95"]:.1f} ms, p99 {total["p99"]:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(message) if total['error_rate'] < 0.01 else self.style.WARNING(message))
+
+        if options['json']:
+            config = {name: options[name] for name in
+                      ('mode', 'workers', 'concurrency', 'duration', 'anonymous', 'users', 'recipes', 'likes', 'seed')}
+            Path(options['json']).write_text(json.dumps({
+                'config': config,
+                'elapsed': stats.elapsed,
+                'endpoints': stats.summary(),
+            }, indent=2))
+            self.stdout.write(f'Resumen guardado en {options["json"]}')
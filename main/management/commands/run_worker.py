@@ -0,0 +1,80 @@
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from main import jobs, metrics
+
+# Cada cuántos segundos se programan las tareas periódicas y se recuperan trabajos abandonados
+MAINTENANCE_INTERVAL = 10
+
+class Command(BaseCommand):
+    help = 'Ejecuta los trabajos de la cola en segundo plano (main/jobs.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Trabajos ejecutados a la vez (hilos)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--once', action='store_true',
+                            help='Terminar cuando no queden trabajos listos')
+        parser.add_argument('--no-periodic', action='store_true',
+                            help='No programar las tareas periódicas')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker = jobs.worker_id()
+        stopping = threading.Event()
+        last_maintenance = 0
+
+        def stop(signum, frame):
+            self.stdout.write('Deteniendo el worker tras los trabajos en curso...')
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        def execute(job):
+            try:
+                started = time.monotonic()
+                job = jobs.run_job(job)
+                self.stdout.write(f'{job} en {time.monotonic() - started:.2f}s')
+            finally:
+                # Cada hilo tiene su propia conexión; se cierra si caducó o quedó rota
+                close_old_connections()
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} con {concurrency} hilos'))
+        if settings.JOB_QUEUE_EAGER:
+            self.stdout.write(self.style.WARNING(
+                'JOB_QUEUE_EAGER está activo: si los procesos web también lo tienen, ejecutarán ellos '
+                'los trabajos que encolen. Con un worker hay que definir JOB_QUEUE_EAGER=0'
+            ))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = set()
+            while not stopping.is_set():
+                if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                    recovered = jobs.requeue_stale_jobs()
+                    if recovered:
+                        self.stdout.write(self.style.WARNING(f'{recovered} trabajos abandonados recuperados'))
+                    if not options['no_periodic']:
+                        jobs.schedule_periodic_tasks()
+                    metrics.dump()
+                    last_maintenance = time.monotonic()
+
+                futures = {future for future in futures if not future.done()}
+                free = concurrency - len(futures)
+                claimed = jobs.claim_jobs(worker, limit=free) if free else []
+                for job in claimed:
+                    futures.add(executor.submit(execute, job))
+
+                if not claimed:
+                    if options['once'] and not futures:
+                        break
+                    if free:
+                        stopping.wait(options['poll_interval'])
+                    else:
+                        wait(futures, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+        connections.close_all()
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from main.trending import update_trending_scores
+
+class Command(BaseCommand):
+    help = ('Actualiza la puntuación de tendencia de las recetas (incremental); run_worker además '
+            'la recalcula desde cero cada día')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recalcular todas las puntuaciones desde cero')
+        parser.add_argument('--loop', type=int, default=0, metavar='SEGUNDOS',
+                            help='Repetir cada N segundos en lugar de ejecutar una sola vez')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            started = time.monotonic()
+            processed = update_trending_scores(full=full)
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Tendencias actualizadas: {processed} me gusta procesados en {elapsed:.2f}s'
+            ))
+
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['loop'])
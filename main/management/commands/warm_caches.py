@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from main.warmup import warm, warmup_targets
+
+class Command(BaseCommand):
+    help = ('Calienta las cachés tras un despliegue: portada, primeras páginas del listado '
+            'y recomendaciones de los usuarios más activos')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list-pages', type=int, default=3, help='Páginas del listado (por defecto 3)')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Usuarios más activos cuyas recomendaciones se precalculan (por defecto 20)')
+        parser.add_argument('--workers', type=int, default=4, help='Hilos en paralelo (por defecto 4)')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers debe ser al menos 1')
+
+        started = time.perf_counter()
+        targets = warmup_targets(options['list_pages'], options['users'])
+        self.stdout.write(f'Calentando {len(targets)} entradas con {options["workers"]} hilos...')
+
+        def progress(result):
+            if result.ok:
+                self.stdout.write(f'  {result.seconds * 1000:8.1f} ms  {result.label}')
+            else:
+                self.stderr.write(self.style.ERROR(f'  {result.seconds * 1000:8.1f} ms  {result.label}: {result.detail}'))
+
+        results = warm(targets, workers=options['workers'], progress=progress)
+        failed = [result for result in results if not result.ok]
+        slowest = max(results, key=lambda result: result.seconds, default=None)
+        elapsed = time.perf_counter() - started
+
+        summary = f'{len(results) - len(failed)}/{len(results)} entradas calentadas en {elapsed:.1f}s'
+        if slowest:
+            summary += f' (la más lenta: {slowest.label}, {slowest.seconds:.2f}s)'
+        self.stdout.write(self.style.WARNING(summary) if failed else self.style.SUCCESS(summary))
@@ -0,0 +1,140 @@
+"""
+Archivos de imagen de las recetas y recolección de huérfanos.
+
+Los RecipeImage desaparecen por borrados de recetas, cascadas de usuarios y
+formularios de edición, pero sus archivos se quedan en media/. collect_orphans()
+recorre el directorio en streaming y comprueba los archivos por lotes contra
+la base de datos, así que la memoria no depende del número de archivos.
+
+Convención de derivados: una versión generada de una imagen (miniatura,
+formato alternativo...) se guarda como "<original>__<variante>.<ext>", por
+ejemplo "recipes/pasta.jpg__w400.webp". Un derivado es huérfano cuando su
+original ya no está referenciado.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage, default_storage
+
+from .models import RecipeImage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_SEPARATOR = '__'
+DEFAULT_BATCH_SIZE = 1000
+# Los archivos recién subidos pueden existir antes de que se confirme su fila
+DEFAULT_MIN_AGE_HOURS = 24
+
+def derivative_name(name, variant, ext=None):
+    """Nombre del derivado `variant` de la imagen `name` (ext sin punto)"""
+    ext = ext or PurePosixPath(name).suffix.lstrip('.')
+    return f'{name}{DERIVATIVE_SEPARATOR}{variant}.{ext}'
+
+def source_name(name):
+    """Original del que deriva `name`, o None si no sigue la convención de derivados"""
+    head, sep, tail = name.rpartition(DERIVATIVE_SEPARATOR)
+    if not sep or '/' in tail or not PurePosixPath(head).suffix:
+        return None
+    return head
+
+def iter_files(root, relative_to):
+    """
+    Recorre `root` en streaming y devuelve (nombre relativo, tamaño, mtime).
+    A diferencia de os.walk no carga el listado completo de cada directorio.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        name = os.path.relpath(entry.path, relative_to).replace(os.sep, '/')
+                        yield name, stat.st_size, stat.st_mtime
+        except FileNotFoundError:
+            continue
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def referenced(names):
+    """Subconjunto de `names` que alguna RecipeImage usa"""
+    return set(RecipeImage.objects.filter(image__in=names).values_list('image', flat=True))
+
+@dataclass
+class OrphanReport:
+    scanned: int = 0
+    orphans: int = 0
+    derivatives: int = 0
+    too_recent: int = 0
+    deleted: int = 0
+    failed: int = 0
+    bytes: int = 0
+    sample: list = field(default_factory=list)
+
+def _delete(storage, name):
+    try:
+        storage.delete(name)
+        return True
+    except OSError:
+        logger.warning('No se pudo borrar %s', name)
+        return False
+
+def collect_orphans(directory='recipes', min_age_hours=DEFAULT_MIN_AGE_HOURS,
+                    batch_size=DEFAULT_BATCH_SIZE, workers=4, dry_run=False, sample_size=20):
+    """
+    Busca (y salvo dry_run borra) los archivos de `directory` dentro de
+    MEDIA_ROOT que ninguna RecipeImage referencia, incluidos los derivados
+    cuyo original ya no existe. Cada lote se comprueba con una consulta y se
+    borra en paralelo antes de leer el siguiente.
+    """
+    storage = default_storage
+    if not isinstance(storage, FileSystemStorage):
+        raise ValueError('La recolección de huérfanos solo funciona con almacenamiento en disco local')
+
+    report = OrphanReport()
+    cutoff = time.time() - min_age_hours * 3600
+    root = storage.path(directory)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in _batches(iter_files(root, storage.location), batch_size):
+            report.scanned += len(batch)
+            sources = {name: source_name(name) for name, size, mtime in batch}
+            in_use = referenced([name for name, size, mtime in batch] + [s for s in sources.values() if s])
+
+            to_delete = []
+            for name, size, mtime in batch:
+                if name in in_use or (sources[name] and sources[name] in in_use):
+                    continue
+                if mtime > cutoff:
+                    report.too_recent += 1
+                    continue
+                report.orphans += 1
+                report.bytes += size
+                if sources[name]:
+                    report.derivatives += 1
+                if len(report.sample) < sample_size:
+                    report.sample.append(name)
+                to_delete.append(name)
+
+            if to_delete and not dry_run:
+                for ok in executor.map(lambda name: _delete(storage, name), to_delete):
+                    if ok:
+                        report.deleted += 1
+                    else:
+                        report.failed += 1
+    return report
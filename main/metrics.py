@@ -0,0 +1,313 @@
+"""
+Métricas en memoria del proceso e instrumentación por etapas.
+
+Los contadores e histogramas (con cubetas fijas, al estilo de Prometheus) se
+exponen en formato de texto en /metrics/ (ver metrics_view). Cada proceso los
+acumula en memoria y vuelca una copia en METRICS_DIR (un JSON por proceso) al
+terminar una petición, como mucho cada METRICS_DUMP_SECONDS, y al salir.
+/metrics/ suma los archivos de todos los procesos, así que responda el worker
+que responda los contadores no retroceden; los de otros procesos pueden ir
+hasta METRICS_DUMP_SECONDS por detrás. Los archivos de procesos terminados se
+conservan METRICS_RETENTION_SECONDS (al borrarlos, Prometheus lo ve como un
+reinicio del contador).
+
+Trace mide etapas de un proceso (tiempo y consultas SQL de cada una):
+
+    trace = Trace('smart_recommendations')
+    with trace.span('profile'):
+        ...
+    trace.finish()
+
+finish() añade cada etapa a los histogramas `<nombre>_stage_seconds` y
+`<nombre>_stage_queries` y, si el total supera el presupuesto configurado en
+PIPELINE_BUDGETS_MS, escribe una línea JSON en el log `main.metrics`.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from .db_router import execute_wrapper_all
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+class Histogram:
+    """Histograma acumulativo con etiquetas; seguro entre hilos"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        """{etiquetas: {'counts': [...], 'sum': s, 'count': n}} (copia)"""
+        with self._lock:
+            return {key: {'counts': list(series['counts']), 'sum': series['sum'], 'count': series['count']}
+                    for key, series in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def dump(self):
+        return {'type': 'histogram', 'help': self.help_text, 'buckets': list(self.buckets),
+                'series': [[list(key), series] for key, series in self.snapshot().items()]}
+
+    def render(self):
+        return _render_histogram(self.name, self.help_text, self.buckets, self.snapshot())
+
+class Counter:
+    """Contador creciente con etiquetas; seguro entre hilos"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def dump(self):
+        return {'type': 'counter', 'help': self.help_text,
+                'series': [[list(key), value] for key, value in self.snapshot().items()]}
+
+    def render(self):
+        return _render_counter(self.name, self.help_text, self.snapshot())
+
+def _render_histogram(name, help_text, buckets, series_by_key):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, series in sorted(series_by_key.items()):
+        cumulative = 0
+        for bound, count in zip(tuple(buckets) + ('+Inf',), series['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(key + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_sum{_labels(key)} {series["sum"]}')
+        lines.append(f'{name}_count{_labels(key)} {series["count"]}')
+    return '\n'.join(lines)
+
+def _render_counter(name, help_text, values):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{_labels(key)} {value}')
+    return '\n'.join(lines)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def histogram(name, help_text='', buckets=SECONDS_BUCKETS):
+    """Devuelve el histograma `name`, creándolo la primera vez"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, help_text, buckets)
+        return _registry[name]
+
+def counter(name, help_text=''):
+    """Devuelve el contador `name`, creándolo la primera vez"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, help_text)
+        return _registry[name]
+
+def reset():
+    """Vacía las métricas del proceso (p. ej. las medidas sobre una base temporal)"""
+    with _registry_lock:
+        collectors = list(_registry.values())
+    for collector in collectors:
+        collector.reset()
+
+def _reset_after_fork():
+    # Con preload_app los workers heredan lo que midió el maestro, que ya cuenta en su archivo
+    global _process_id, _last_dump
+    _process_id = _new_process_id()
+    _last_dump = None
+    reset()
+
+def _new_process_id():
+    return f'{socket.gethostname()}-{os.getpid()}-{time.time_ns()}'
+
+_process_id = _new_process_id()
+_last_dump = None
+_dump_lock = threading.Lock()
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+def dump():
+    """Escribe las métricas del proceso en METRICS_DIR (sustituye su archivo)"""
+    global _last_dump
+    directory = metrics_dir()
+    if directory is None:
+        return
+    with _registry_lock:
+        collectors = dict(_registry)
+    data = {name: collector.dump() for name, collector in collectors.items()}
+    if not any(metric['series'] for metric in data.values()):
+        # Nada medido (p. ej. un comando de manage.py): no se crea archivo
+        _last_dump = time.monotonic()
+        return
+    with _dump_lock:
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'{_process_id}.json'
+            tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+            tmp.write_text(json.dumps(data))
+            tmp.replace(path)
+        except OSError:
+            logger.exception('No se pudieron guardar las métricas en %s', directory)
+        _last_dump = time.monotonic()
+
+def dump_if_due(**kwargs):
+    """Receptor de request_finished: dump() como mucho cada METRICS_DUMP_SECONDS"""
+    if _last_dump is None or time.monotonic() - _last_dump >= getattr(settings, 'METRICS_DUMP_SECONDS', 5):
+        dump()
+
+def _merged():
+    """Suma de los archivos de todos los procesos: {nombre: dump con series por clave}"""
+    merged = {}
+    cutoff = time.time() - getattr(settings, 'METRICS_RETENTION_SECONDS', 7 * 24 * 3600)
+    for path in metrics_dir().glob('*.json'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                continue
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, metric in data.items():
+            target = merged.setdefault(name, {**metric, 'series': {}})
+            for key, value in metric['series']:
+                key = tuple(tuple(pair) for pair in key)
+                if metric['type'] == 'counter':
+                    target['series'][key] = target['series'].get(key, 0) + value
+                    continue
+                series = target['series'].setdefault(key, {'counts': [0] * len(value['counts']), 'sum': 0.0, 'count': 0})
+                series['counts'] = [a + b for a, b in zip(series['counts'], value['counts'])]
+                series['sum'] += value['sum']
+                series['count'] += value['count']
+    return merged
+
+def render_all():
+    """Todas las métricas (de todos los procesos si hay METRICS_DIR) en formato de texto de Prometheus"""
+    if metrics_dir() is None:
+        with _registry_lock:
+            collectors = list(_registry.values())
+        return '\n'.join(collector.render() for collector in collectors) + '\n'
+    dump()
+    blocks = []
+    for name, metric in sorted(_merged().items()):
+        if metric['type'] == 'counter':
+            blocks.append(_render_counter(name, metric['help'], metric['series']))
+        else:
+            blocks.append(_render_histogram(name, metric['help'], metric['buckets'], metric['series']))
+    return '\n'.join(blocks) + '\n'
+
+atexit.register(dump)
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class Trace:
+    """Etapas medidas de una ejecución (tiempo y consultas de cada una)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.finished = False
+
+    @contextmanager
+    def span(self, stage):
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        try:
+            with execute_wrapper_all(counter):
+                yield
+        finally:
+            self.spans.append({
+                'stage': stage,
+                'ms': (time.perf_counter() - started) * 1000,
+                'queries': counter.count,
+            })
+
+    @property
+    def total_ms(self):
+        return sum(span['ms'] for span in self.spans)
+
+    @property
+    def total_queries(self):
+        return sum(span['queries'] for span in self.spans)
+
+    def finish(self, **context):
+        """Registra las etapas en los histogramas y avisa si se superó el presupuesto"""
+        if self.finished or not self.spans:
+            return
+        self.finished = True
+        seconds = histogram(f'{self.name}_stage_seconds', f'Duración de cada etapa de {self.name}')
+        queries = histogram(f'{self.name}_stage_queries', f'Consultas SQL de cada etapa de {self.name}',
+                            buckets=QUERIES_BUCKETS)
+        for span in self.spans:
+            seconds.observe(span['ms'] / 1000, stage=span['stage'])
+            queries.observe(span['queries'], stage=span['stage'])
+        seconds.observe(self.total_ms / 1000, stage='total')
+        queries.observe(self.total_queries, stage='total')
+
+        budget = getattr(settings, 'PIPELINE_BUDGETS_MS', {}).get(self.name)
+        if budget is not None and self.total_ms > budget:
+            logger.warning(json.dumps({
+                'event': 'pipeline_over_budget',
+                'pipeline': self.name,
+                'budget_ms': budget,
+                'total_ms': round(self.total_ms, 1),
+                'total_queries': self.total_queries,
+                'stages': [{**span, 'ms': round(span['ms'], 1)} for span in self.spans],
+                **context,
+            }, default=str))
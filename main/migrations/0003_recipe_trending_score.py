@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_ingredient_tag_recipe_recipeimage_recipeingredient_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_like_id', models.BigIntegerField(default=0, verbose_name='Último me gusta procesado')),
+                ('computed_at', models.DateTimeField(blank=True, null=True, verbose_name='Último cálculo')),
+            ],
+            options={
+                'verbose_name': 'Estado de tendencias',
+                'verbose_name_plural': 'Estado de tendencias',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0, verbose_name='Puntuación de tendencia'),
+        ),
+    ]
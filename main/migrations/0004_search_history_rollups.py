@@ -0,0 +1,97 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIngredientStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Veces buscado')),
+                ('last_searched_at', models.DateTimeField(verbose_name='Última búsqueda')),
+            ],
+            options={
+                'verbose_name': 'Frecuencia de ingrediente buscado',
+                'verbose_name_plural': 'Frecuencias de ingredientes buscados',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTagStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Veces buscada')),
+                ('last_searched_at', models.DateTimeField(verbose_name='Última búsqueda')),
+            ],
+            options={
+                'verbose_name': 'Frecuencia de etiqueta buscada',
+                'verbose_name_plural': 'Frecuencias de etiquetas buscadas',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTermStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=200, verbose_name='Término de búsqueda')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Veces buscado')),
+                ('last_searched_at', models.DateTimeField(verbose_name='Última búsqueda')),
+            ],
+            options={
+                'verbose_name': 'Frecuencia de término buscado',
+                'verbose_name_plural': 'Frecuencias de términos buscados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='usersearchhistory',
+            index=models.Index(fields=['user', '-created_at'], name='search_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersearchhistory',
+            index=models.Index(fields=['created_at'], name='search_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='searchingredientstat',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.ingredient'),
+        ),
+        migrations.AddField(
+            model_name='searchingredientstat',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_ingredient_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='searchtagstat',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.tag'),
+        ),
+        migrations.AddField(
+            model_name='searchtagstat',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tag_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='searchtermstat',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_term_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchingredientstat',
+            unique_together={('user', 'ingredient')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchtagstat',
+            unique_together={('user', 'tag')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchtermstat',
+            unique_together={('user', 'term')},
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_search_history_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at'], name='recipe_published_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-trending_score', '-created_at'], name='recipe_published_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', False)), fields=['-created_at'], name='recipe_unpublished_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at'], name='recipe_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at'], name='recipe_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipelike',
+            index=models.Index(fields=['recipe', 'created_at'], name='like_recipe_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheNamespaceVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=50, unique=True, verbose_name='Namespace')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Versión')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última invalidación')),
+            ],
+            options={
+                'verbose_name': 'Versión de caché',
+                'verbose_name_plural': 'Versiones de caché',
+            },
+        ),
+    ]
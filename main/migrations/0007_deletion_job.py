@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_cache_namespace_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('user', 'Usuario'), ('recipe', 'Receta')], max_length=10, verbose_name='Tipo')),
+                ('target_id', models.PositiveIntegerField(verbose_name='ID del objeto')),
+                ('target_label', models.CharField(max_length=200, verbose_name='Objeto')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En curso'), ('done', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=10, verbose_name='Estado')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Filas a borrar')),
+                ('deleted_rows', models.PositiveIntegerField(default=0, verbose_name='Filas borradas')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Borrado en segundo plano',
+                'verbose_name_plural': 'Borrados en segundo plano',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='deletionjob_status_idx')],
+            },
+        ),
+    ]
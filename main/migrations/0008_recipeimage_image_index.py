@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_deletion_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipeimage',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='recipes/', verbose_name='Imagen'),
+        ),
+    ]
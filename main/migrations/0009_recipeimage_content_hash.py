@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_recipeimage_image_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimage',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Hash del contenido'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_recipeimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Argumentos')),
+                ('status', models.CharField(choices=[('queued', 'En cola'), ('running', 'En curso'), ('done', 'Completado'), ('failed', 'Fallido')], default='queued', max_length=10, verbose_name='Estado')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Prioridad')),
+                ('run_at', models.DateTimeField(verbose_name='Ejecutar a partir de')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Intentos máximos')),
+                ('unique_key', models.CharField(blank=True, max_length=150, null=True, verbose_name='Clave única')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo en segundo plano',
+                'verbose_name_plural': 'Trabajos en segundo plano',
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['priority', 'run_at'], name='job_ready_idx'), models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('unique_key',), name='job_unique_active_key')],
+            },
+        ),
+    ]
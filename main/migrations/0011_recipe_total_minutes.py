@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:18
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='time_bucket',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(django.db.models.lookups.LessThanOrEqual(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('prep_time', 0), '+', django.db.models.functions.comparison.Coalesce('cook_time', 0)), 30), then=models.Value('rapida')), models.When(django.db.models.lookups.LessThanOrEqual(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('prep_time', 0), '+', django.db.models.functions.comparison.Coalesce('cook_time', 0)), 60), then=models.Value('media')), default=models.Value('larga')), output_field=models.CharField(choices=[('rapida', 'Rápida (hasta 30 min)'), ('media', 'Media (31-60 min)'), ('larga', 'Larga (más de 60 min)')], max_length=10), verbose_name='Duración'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_minutes',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('prep_time', 0), '+', django.db.models.functions.comparison.Coalesce('cook_time', 0)), output_field=models.PositiveIntegerField(), verbose_name='Tiempo total (minutos)'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['total_minutes'], name='recipe_published_time_idx'),
+        ),
+    ]
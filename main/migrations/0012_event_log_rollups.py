@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_recipe_total_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedEventSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, verbose_name='Segmento')),
+                ('events', models.PositiveIntegerField(default=0, verbose_name='Eventos')),
+                ('ingested_at', models.DateTimeField(auto_now_add=True, verbose_name='Agregado el')),
+            ],
+            options={
+                'verbose_name': 'Segmento de eventos agregado',
+                'verbose_name_plural': 'Segmentos de eventos agregados',
+                'ordering': ['-ingested_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EventDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('event_type', models.CharField(max_length=20, verbose_name='Tipo de evento')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Eventos')),
+            ],
+            options={
+                'verbose_name': 'Eventos por día',
+                'verbose_name_plural': 'Eventos por día',
+                'ordering': ['-day', 'event_type'],
+                'unique_together': {('day', 'event_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('recipe_id', models.PositiveIntegerField(verbose_name='ID de la receta')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Visitas')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='Me gusta')),
+                ('unlikes', models.PositiveIntegerField(default=0, verbose_name='Me gusta retirados')),
+            ],
+            options={
+                'verbose_name': 'Estadística diaria de receta',
+                'verbose_name_plural': 'Estadísticas diarias de recetas',
+                'indexes': [models.Index(fields=['recipe_id', 'day'], name='recipedailystat_recipe_idx')],
+                'unique_together': {('day', 'recipe_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTermDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('term', models.CharField(max_length=200, verbose_name='Término de búsqueda')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Búsquedas')),
+            ],
+            options={
+                'verbose_name': 'Búsquedas por día',
+                'verbose_name_plural': 'Búsquedas por día',
+                'ordering': ['-day', '-count'],
+                'unique_together': {('day', 'term')},
+            },
+        ),
+    ]
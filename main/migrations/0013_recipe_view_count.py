@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_event_log_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Visitas'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-view_count'], name='recipe_view_count_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_recipe_view_count'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='trendingstate',
+            name='last_like_id',
+        ),
+        migrations.AddField(
+            model_name='trendingstate',
+            name='settled_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Me gusta agregados hasta'),
+        ),
+        migrations.AddField(
+            model_name='trendingstate',
+            name='window_scores',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Aporte de la ventana de solapamiento'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, verbose_name='Puntuación de tendencia'),
+        ),
+    ]
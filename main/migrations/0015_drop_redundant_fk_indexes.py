@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_trending_time_watermark'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Autor'),
+        ),
+        migrations.AlterField(
+            model_name='recipelike',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='main.recipe'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_locked_until(apps, schema_editor):
+    # Los trabajos en curso conservan el plazo que tenían con locked_at
+    Job = apps.get_model('main', 'Job')
+    timeout = timedelta(seconds=getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 600))
+    for job in Job.objects.filter(status='running').exclude(locked_at=None):
+        Job.objects.filter(pk=job.pk).update(locked_until=job.locked_at + timeout)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_deletionjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Reclamado hasta'),
+        ),
+        migrations.RunPython(set_locked_until, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def fail_duplicate_jobs(apps, schema_editor):
+    # Se conserva el trabajo activo más antiguo de cada objeto; los repetidos se dan por fallidos
+    DeletionJob = apps.get_model('main', 'DeletionJob')
+    seen = set()
+    active = DeletionJob.objects.filter(status__in=['pending', 'running']).order_by('created_at', 'pk')
+    for job in active:
+        target = (job.target_type, job.target_id)
+        if target in seen:
+            DeletionJob.objects.filter(pk=job.pk).update(status='failed', error='Duplicado de otro borrado activo')
+        seen.add(target)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_job_locked_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='deletionjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('target_type', 'target_id'), name='deletionjob_unique_active_target'),
+        ),
+    ]
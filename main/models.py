@@ -1,7 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThanOrEqual
 from django.core.validators import MinValueValidator, MaxValueValidator
-from PIL import Image
+from django.utils import timezone
+from datetime import timedelta
 import os
 
 class CustomUser(AbstractUser):
@@ -38,6 +41,16 @@ class Ingredient(models.Model):
     def __str__(self):
         return self.name
 
+# Tiempo total de una receta, calculado por la base de datos (ver Recipe.total_minutes)
+TOTAL_MINUTES = Coalesce('prep_time', 0) + Coalesce('cook_time', 0)
+
+# Tramos de tiempo total usados por las recomendaciones (ver Recipe.time_bucket)
+TIME_BUCKETS = [
+    ('rapida', 'Rápida (hasta 30 min)'),
+    ('media', 'Media (31-60 min)'),
+    ('larga', 'Larga (más de 60 min)'),
+]
+
 class Recipe(models.Model):
     """Modelo principal para las recetas"""
     title = models.CharField(max_length=200, verbose_name="Título")
@@ -47,6 +60,24 @@ class Recipe(models.Model):
     # Información adicional
     prep_time = models.PositiveIntegerField(verbose_name="Tiempo de preparación (minutos)", null=True, blank=True)
     cook_time = models.PositiveIntegerField(verbose_name="Tiempo de cocción (minutos)", null=True, blank=True)
+    # Columnas generadas por la base de datos a partir de prep_time y cook_time
+    total_minutes = models.GeneratedField(
+        expression=TOTAL_MINUTES,
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+        verbose_name="Tiempo total (minutos)",
+    )
+    time_bucket = models.GeneratedField(
+        expression=models.Case(
+            # Postgres no permite que una columna generada use otra: se repite la suma
+            models.When(LessThanOrEqual(TOTAL_MINUTES, 30), then=models.Value('rapida')),
+            models.When(LessThanOrEqual(TOTAL_MINUTES, 60), then=models.Value('media')),
+            default=models.Value('larga'),
+        ),
+        output_field=models.CharField(max_length=10, choices=TIME_BUCKETS),
+        db_persist=True,
+        verbose_name="Duración",
+    )
     servings = models.PositiveIntegerField(verbose_name="Porciones", default=1)
     difficulty = models.CharField(
         max_length=20,
@@ -60,7 +91,8 @@ class Recipe(models.Model):
     )
     
     # Relaciones
-    author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="Autor")
+    # Sin índice propio: recipe_author_created_idx empieza por author y lo sustituye
+    author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False, verbose_name="Autor")
     tags = models.ManyToManyField(Tag, blank=True, verbose_name="Etiquetas")
     ingredients = models.ManyToManyField(Ingredient, through='RecipeIngredient', verbose_name="Ingredientes")
     
@@ -69,10 +101,35 @@ class Recipe(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
     is_published = models.BooleanField(default=True, verbose_name="Publicada")
     
+    # Tendencias (ver main/trending.py)
+    trending_score = models.FloatField(default=0, verbose_name="Puntuación de tendencia")
+    
+    # Visitas (ver main/view_counts.py)
+    view_count = models.PositiveIntegerField(default=0, verbose_name="Visitas")
+    
     class Meta:
         verbose_name = "Receta"
         verbose_name_plural = "Recetas"
         ordering = ['-created_at']
+        indexes = [
+            # Listado principal: publicadas, más recientes primero
+            models.Index(fields=['-created_at'], condition=models.Q(is_published=True),
+                         name='recipe_published_recent_idx'),
+            # Listado principal ordenado por tendencia
+            models.Index(fields=['-trending_score', '-created_at'], condition=models.Q(is_published=True),
+                         name='recipe_published_trending_idx'),
+            # Panel de administración: recetas ocultas y listado completo por fecha
+            models.Index(fields=['-created_at'], condition=models.Q(is_published=False),
+                         name='recipe_unpublished_recent_idx'),
+            models.Index(fields=['-created_at'], name='recipe_created_idx'),
+            # Informe de recetas más vistas
+            models.Index(fields=['-view_count'], name='recipe_view_count_idx'),
+            # Filtro por tiempo total en el listado
+            models.Index(fields=['total_minutes'], condition=models.Q(is_published=True),
+                         name='recipe_published_time_idx'),
+            # "Mis recetas" y panel de usuario
+            models.Index(fields=['author', '-created_at'], name='recipe_author_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -106,38 +163,48 @@ class RecipeIngredient(models.Model):
 class RecipeImage(models.Model):
     """Imágenes de las recetas"""
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="images")
-    image = models.ImageField(upload_to='recipes/', verbose_name="Imagen")
+    image = models.ImageField(upload_to='recipes/', db_index=True, verbose_name="Imagen")
     is_main = models.BooleanField(default=False, verbose_name="Imagen principal")
     caption = models.CharField(max_length=200, blank=True, verbose_name="Descripción")
+    # SHA-256 del archivo ya optimizado (vacío si aún no se ha procesado)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Hash del contenido")
     
     class Meta:
         verbose_name = "Imagen de receta"
         verbose_name_plural = "Imágenes de receta"
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Redimensionar imagen si es muy grande
-        if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 800 or img.width > 800:
-                img.thumbnail((800, 800))
-                img.save(self.image.path)
 
 class RecipeLike(models.Model):
     """Sistema de me gusta para recetas"""
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
-    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="likes")
+    # Sin índice propio: like_recipe_created_idx empieza por recipe y lo sustituye
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, db_index=False, related_name="likes")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ['user', 'recipe']  # Un usuario solo puede dar un like por receta
         verbose_name = "Me gusta"
         verbose_name_plural = "Me gusta"
+        indexes = [
+            # Conteos por receta (el índice único ya cubre los conteos por usuario)
+            models.Index(fields=['recipe', 'created_at'], name='like_recipe_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} likes {self.recipe.title}"
 
+class TrendingState(models.Model):
+    """Estado del cálculo incremental de tendencias (una sola fila)"""
+    settled_until = models.DateTimeField(null=True, blank=True, verbose_name="Me gusta agregados hasta")
+    window_scores = models.JSONField(default=dict, blank=True, verbose_name="Aporte de la ventana de solapamiento")
+    computed_at = models.DateTimeField(null=True, blank=True, verbose_name="Último cálculo")
+    
+    class Meta:
+        verbose_name = "Estado de tendencias"
+        verbose_name_plural = "Estado de tendencias"
+    
+    def __str__(self):
+        return f"Tendencias calculadas el {self.computed_at}"
+
 class UserSearchHistory(models.Model):
     """Historial de búsquedas para recomendaciones personalizadas"""
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -150,6 +217,55 @@ class UserSearchHistory(models.Model):
         verbose_name = "Historial de búsqueda"
         verbose_name_plural = "Historial de búsquedas"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='search_user_created_idx'),
+            models.Index(fields=['created_at'], name='search_created_idx'),
+        ]
+
+class SearchTermStat(models.Model):
+    """Frecuencia de términos de búsqueda por usuario (historial compactado)"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="search_term_stats")
+    term = models.CharField(max_length=200, verbose_name="Término de búsqueda")
+    count = models.PositiveIntegerField(default=0, verbose_name="Veces buscado")
+    last_searched_at = models.DateTimeField(verbose_name="Última búsqueda")
+    
+    class Meta:
+        unique_together = ['user', 'term']
+        verbose_name = "Frecuencia de término buscado"
+        verbose_name_plural = "Frecuencias de términos buscados"
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.term} ({self.count})"
+
+class SearchIngredientStat(models.Model):
+    """Frecuencia de ingredientes buscados por usuario (historial compactado)"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="search_ingredient_stats")
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0, verbose_name="Veces buscado")
+    last_searched_at = models.DateTimeField(verbose_name="Última búsqueda")
+    
+    class Meta:
+        unique_together = ['user', 'ingredient']
+        verbose_name = "Frecuencia de ingrediente buscado"
+        verbose_name_plural = "Frecuencias de ingredientes buscados"
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.ingredient.name} ({self.count})"
+
+class SearchTagStat(models.Model):
+    """Frecuencia de etiquetas buscadas por usuario (historial compactado)"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="search_tag_stats")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0, verbose_name="Veces buscada")
+    last_searched_at = models.DateTimeField(verbose_name="Última búsqueda")
+    
+    class Meta:
+        unique_together = ['user', 'tag']
+        verbose_name = "Frecuencia de etiqueta buscada"
+        verbose_name_plural = "Frecuencias de etiquetas buscadas"
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.tag.name} ({self.count})"
 
 class UserPreference(models.Model):
     """Preferencias del usuario para recomendaciones"""
@@ -163,3 +279,184 @@ class UserPreference(models.Model):
     
     def __str__(self):
         return f"Preferencias de {self.user.username}"
+
+class CacheNamespaceVersion(models.Model):
+    """Versión de cada namespace de caché (bus de invalidación entre procesos, ver main/cache.py)"""
+    namespace = models.CharField(max_length=50, unique=True, verbose_name="Namespace")
+    version = models.BigIntegerField(default=0, verbose_name="Versión")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última invalidación")
+    
+    class Meta:
+        verbose_name = "Versión de caché"
+        verbose_name_plural = "Versiones de caché"
+    
+    def __str__(self):
+        return f"{self.namespace} v{self.version}"
+
+class DeletionJob(models.Model):
+    """Borrado en segundo plano de un usuario o una receta con todo su contenido (ver main/deletion.py)"""
+    TARGET_CHOICES = [
+        ('user', 'Usuario'),
+        ('recipe', 'Receta'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En curso'),
+        ('done', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    target_type = models.CharField(max_length=10, choices=TARGET_CHOICES, verbose_name="Tipo")
+    target_id = models.PositiveIntegerField(verbose_name="ID del objeto")
+    target_label = models.CharField(max_length=200, verbose_name="Objeto")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    total_rows = models.PositiveIntegerField(default=0, verbose_name="Filas a borrar")
+    deleted_rows = models.PositiveIntegerField(default=0, verbose_name="Filas borradas")
+    error = models.TextField(blank=True, verbose_name="Error")
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name="+", verbose_name="Solicitado por")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Se actualiza tras cada lote: un trabajo 'running' sin latido reciente se da por abandonado
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Último progreso")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    STALE_AFTER = timedelta(minutes=5)
+    
+    class Meta:
+        verbose_name = "Borrado en segundo plano"
+        verbose_name_plural = "Borrados en segundo plano"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='deletionjob_status_idx'),
+        ]
+        constraints = [
+            # Como mucho un borrado pendiente o en curso por objeto
+            models.UniqueConstraint(fields=['target_type', 'target_id'],
+                                    condition=models.Q(status__in=['pending', 'running']),
+                                    name='deletionjob_unique_active_target'),
+        ]
+    
+    def __str__(self):
+        return f"Borrar {self.get_target_type_display().lower()} {self.target_label} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Porcentaje completado (0-100)"""
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.deleted_rows * 100 / self.total_rows))
+    
+    @property
+    def is_stale(self):
+        """En curso pero sin progreso desde hace STALE_AFTER (el worker murió)"""
+        last_seen = self.heartbeat_at or self.started_at or self.created_at
+        return self.status == 'running' and last_seen < timezone.now() - self.STALE_AFTER
+
+class Job(models.Model):
+    """Trabajo en la cola de tareas en segundo plano (ver main/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'En cola'),
+        ('running', 'En curso'),
+        ('done', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    task = models.CharField(max_length=100, verbose_name="Tarea")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Argumentos")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="Estado")
+    priority = models.SmallIntegerField(default=0, verbose_name="Prioridad")  # menor = antes
+    run_at = models.DateTimeField(verbose_name="Ejecutar a partir de")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Intentos")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="Intentos máximos")
+    unique_key = models.CharField(max_length=150, null=True, blank=True, verbose_name="Clave única")
+    last_error = models.TextField(blank=True, verbose_name="Último error")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    # Lo extiende el latido del worker mientras la tarea sigue en marcha
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Reclamado hasta")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Trabajo en segundo plano"
+        verbose_name_plural = "Trabajos en segundo plano"
+        indexes = [
+            # Cola de trabajos listos para ejecutarse
+            models.Index(fields=['priority', 'run_at'], condition=models.Q(status='queued'), name='job_ready_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+        constraints = [
+            # Como mucho un trabajo pendiente o en curso por clave (tareas periódicas, deduplicación)
+            models.UniqueConstraint(fields=['unique_key'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='job_unique_active_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
+
+class EventDailyCount(models.Model):
+    """Eventos de actividad por día y tipo (agregados desde el registro de eventos, ver main/events.py)"""
+    day = models.DateField(verbose_name="Día")
+    event_type = models.CharField(max_length=20, verbose_name="Tipo de evento")
+    count = models.PositiveIntegerField(default=0, verbose_name="Eventos")
+    
+    class Meta:
+        unique_together = ['day', 'event_type']
+        verbose_name = "Eventos por día"
+        verbose_name_plural = "Eventos por día"
+        ordering = ['-day', 'event_type']
+    
+    def __str__(self):
+        return f"{self.day} {self.event_type}: {self.count}"
+
+class RecipeDailyStat(models.Model):
+    """Visitas y me gusta de cada receta por día (agregados desde el registro de eventos)"""
+    day = models.DateField(verbose_name="Día")
+    # Sin clave foránea: el registro puede contener recetas ya borradas
+    recipe_id = models.PositiveIntegerField(verbose_name="ID de la receta")
+    views = models.PositiveIntegerField(default=0, verbose_name="Visitas")
+    likes = models.PositiveIntegerField(default=0, verbose_name="Me gusta")
+    unlikes = models.PositiveIntegerField(default=0, verbose_name="Me gusta retirados")
+    
+    class Meta:
+        unique_together = ['day', 'recipe_id']
+        verbose_name = "Estadística diaria de receta"
+        verbose_name_plural = "Estadísticas diarias de recetas"
+        indexes = [
+            models.Index(fields=['recipe_id', 'day'], name='recipedailystat_recipe_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} receta #{self.recipe_id}: {self.views} visitas, {self.likes} me gusta"
+
+class SearchTermDailyCount(models.Model):
+    """Términos buscados por día en toda la plataforma (agregados desde el registro de eventos)"""
+    day = models.DateField(verbose_name="Día")
+    term = models.CharField(max_length=200, verbose_name="Término de búsqueda")
+    count = models.PositiveIntegerField(default=0, verbose_name="Búsquedas")
+    
+    class Meta:
+        unique_together = ['day', 'term']
+        verbose_name = "Búsquedas por día"
+        verbose_name_plural = "Búsquedas por día"
+        ordering = ['-day', '-count']
+    
+    def __str__(self):
+        return f"{self.day} {self.term}: {self.count}"
+
+class IngestedEventSegment(models.Model):
+    """Segmentos del registro de eventos ya agregados (para no contarlos dos veces)"""
+    name = models.CharField(max_length=200, unique=True, verbose_name="Segmento")
+    events = models.PositiveIntegerField(default=0, verbose_name="Eventos")
+    ingested_at = models.DateTimeField(auto_now_add=True, verbose_name="Agregado el")
+    
+    class Meta:
+        verbose_name = "Segmento de eventos agregado"
+        verbose_name_plural = "Segmentos de eventos agregados"
+        ordering = ['-ingested_at']
+    
+    def __str__(self):
+        return self.name
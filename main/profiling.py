@@ -0,0 +1,321 @@
+"""
+Perfilado por muestreo de peticiones.
+
+ProfilingMiddleware ejecuta con cProfile una fracción de las peticiones
+(PROFILING_SAMPLE_RATE) y, además, las de los administradores que lo pidan con
+?_profile=1 o la cabecera "X-Profile: 1". De cada petición perfilada guarda
+las estadísticas de llamadas, las consultas SQL con su duración y el tiempo de
+renderizado de cada plantilla (incluidas sus subplantillas).
+
+Los perfiles se guardan en PROFILING_DIR, un búfer circular en disco: cada
+perfil es un JSON comprimido más un resumen pequeño para el listado, y al
+pasar de PROFILING_MAX_PROFILES se borran los más antiguos. Las páginas
+admin_profiles los muestran y exportan como pilas colapsadas ("a;b;c µs"),
+el formato de entrada de flamegraph.pl y speedscope. Las pilas se reconstruyen
+a partir del grafo llamador→llamado de cProfile, así que son aproximadas.
+
+cProfile solo ve el hilo en el que se activa: de las vistas asíncronas se
+registran las consultas y plantillas, pero no sus llamadas.
+"""
+import contextvars
+import cProfile
+import gzip
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+
+from .db_router import execute_wrapper_all
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID = re.compile(r'^\d{8}-\d{6}-\d{6}-[0-9a-f]{6}$')
+
+MAX_QUERIES = 1000          # Consultas guardadas por perfil (se cuentan todas)
+TOP_FUNCTIONS = 60          # Funciones con más tiempo acumulado en el resumen
+MAX_STACK_DEPTH = 80
+MIN_STACK_SECONDS = 0.00001 # Ramas con menos tiempo no se exploran al reconstruir pilas
+
+_capture = contextvars.ContextVar('profiling_capture', default=None)
+# Peticiones perfiladas en curso que miden las plantillas (ver template_timing)
+_template_timing_users = 0
+_template_timing_lock = threading.Lock()
+_original_render = None
+
+class Capture:
+    """Consultas (execute_wrapper) y plantillas de una petición perfilada"""
+
+    def __init__(self):
+        self.queries = []
+        self.query_count = 0
+        self.query_ms = 0.0
+        self.templates = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            self.query_count += 1
+            self.query_ms += ms
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({'sql': sql, 'ms': round(ms, 3)})
+
+def _timed_render(original):
+    @wraps(original)
+    def render(self, context):
+        capture = _capture.get()
+        if capture is None:
+            return original(self, context)
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            capture.templates.append({
+                'name': self.origin.template_name or self.name or '<string>',
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+    return render
+
+@contextmanager
+def template_timing():
+    """
+    Mide Template.render mientras dura el bloque. El método se sustituye solo
+    mientras haya alguna petición perfilada en curso en el proceso (y se
+    restaura al terminar la última); las demás peticiones que coincidan con
+    ella pasan por la envoltura sin medir nada.
+    """
+    global _template_timing_users, _original_render
+    from django.template.base import Template
+
+    with _template_timing_lock:
+        if _template_timing_users == 0:
+            _original_render = Template.render
+            Template.render = _timed_render(_original_render)
+        _template_timing_users += 1
+    try:
+        yield
+    finally:
+        with _template_timing_lock:
+            _template_timing_users -= 1
+            if _template_timing_users == 0:
+                Template.render = _original_render
+                _original_render = None
+
+def sampling_reason(request):
+    """'admin' si un administrador lo pidió, 'sample' si toca por muestreo, o None"""
+    requested = request.GET.get(PROFILE_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1'
+    if requested and request.user.is_authenticated and request.user.role == 'admin':
+        return 'admin'
+    rate = settings.PROFILING_SAMPLE_RATE
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+def _path_prefixes():
+    paths = {str(settings.BASE_DIR), *(path for path in sys.path if path)}
+    return sorted((path.rstrip(os.sep) + os.sep for path in paths), key=len, reverse=True)
+
+def function_label(func, prefixes):
+    """'ruta/relativa.py:línea(función)' de una clave de pstats"""
+    filename, lineno, name = func
+    if filename == '~':
+        return name.replace(';', ',')
+    for prefix in prefixes:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    return f'{filename}:{lineno}({name})'.replace(';', ',')
+
+def collapsed_stacks(stats, prefixes):
+    """
+    [(pila, microsegundos propios)] a partir de las estadísticas de pstats. El
+    tiempo de una función se reparte entre sus llamadores en proporción al
+    tiempo acumulado de cada llamada; las llamadas recursivas se pliegan en la
+    primera aparición de la función en la pila.
+    """
+    if not stats:
+        return []
+    children = defaultdict(list)
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            children[caller].append((func, edge[3]))
+    # La raíz es la llamada con más tiempo acumulado (get_response del middleware);
+    # no se busca una función sin llamadores porque la cadena de middlewares es recursiva
+    root = max(stats, key=lambda func: stats[func][3])
+
+    labels = {func: function_label(func, prefixes) for func in stats}
+    stacks = defaultdict(float)
+
+    def walk(func, path, share):
+        path = path + (func,)
+        stacks[';'.join(labels[f] for f in path)] += stats[func][2] * share
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for child, edge_seconds in children[func]:
+            child_seconds = stats[child][3]
+            if child in path or child_seconds <= 0:
+                continue
+            child_share = share * min(edge_seconds / child_seconds, 1)
+            if child_seconds * child_share >= MIN_STACK_SECONDS:
+                walk(child, path, child_share)
+
+    walk(root, (), 1.0)
+    return sorted(((stack, round(seconds * 1_000_000)) for stack, seconds in stacks.items()
+                   if seconds >= 0.000001), key=lambda row: -row[1])
+
+def function_table(stats, prefixes):
+    """Funciones con más tiempo acumulado"""
+    rows = sorted(stats.items(), key=lambda item: -item[1][3])[:TOP_FUNCTIONS]
+    return [{
+        'function': function_label(func, prefixes),
+        'calls': nc,
+        'primitive_calls': cc,
+        'own_ms': round(tt * 1000, 3),
+        'cumulative_ms': round(ct * 1000, 3),
+    } for func, (cc, nc, tt, ct, callers) in rows]
+
+class ProfileStore:
+    """Búfer circular de perfiles en un directorio"""
+
+    def __init__(self, directory, max_profiles):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def _paths(self, profile_id):
+        return self.directory / f'{profile_id}.json.gz', self.directory / f'{profile_id}.meta.json'
+
+    def save(self, profile, summary):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(profile['id'])
+        tmp = data_path.with_suffix('.tmp')
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(profile, f)
+        tmp.replace(data_path)
+        tmp = meta_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(summary))
+        tmp.replace(meta_path)
+        self.prune()
+
+    def prune(self):
+        # Los identificadores empiezan por la fecha: orden alfabético = orden cronológico
+        metas = sorted(self.directory.glob('*.meta.json'))
+        for meta_path in metas[:max(len(metas) - self.max_profiles, 0)]:
+            for path in self._paths(meta_path.name[:-len('.meta.json')]):
+                path.unlink(missing_ok=True)
+
+    def list(self):
+        """Resúmenes de los perfiles guardados, del más reciente al más antiguo"""
+        summaries = []
+        for meta_path in sorted(self.directory.glob('*.meta.json'), reverse=True):
+            try:
+                summaries.append(json.loads(meta_path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def load(self, profile_id):
+        """El perfil completo, o None si no existe"""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with gzip.open(self._paths(profile_id)[0], 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+def get_store():
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_PROFILES)
+
+def build_profile(request, response, reason, started_at, total_ms, capture, profiler):
+    """(perfil completo, resumen) de una petición perfilada"""
+    profile_id = f'{started_at:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}'
+    summary = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': getattr(request.resolver_match, 'view_name', None),
+        'status': response.status_code,
+        'user': request.user.get_username() if request.user.is_authenticated else None,
+        'reason': reason,
+        'started_at': started_at.isoformat(),
+        'total_ms': round(total_ms, 1),
+        'query_count': capture.query_count,
+        'query_ms': round(capture.query_ms, 1),
+        'template_count': len(capture.templates),
+    }
+    functions, stacks = [], []
+    if profiler is not None:
+        stats = pstats.Stats(profiler).stats
+        prefixes = _path_prefixes()
+        functions = function_table(stats, prefixes)
+        stacks = collapsed_stacks(stats, prefixes)
+    profile = {
+        **summary,
+        'queries': capture.queries,
+        'templates': capture.templates,
+        'functions': functions,
+        'stacks': stacks,
+    }
+    return profile, summary
+
+def collapsed_text(profile):
+    """Perfil en formato de pilas colapsadas, una pila por línea"""
+    return ''.join(f'{stack} {microseconds}\n' for stack, microseconds in profile['stacks'])
+
+class ProfilingMiddleware:
+    """Perfila las peticiones muestreadas o pedidas por un administrador"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = sampling_reason(request)
+        if reason is None:
+            return self.get_response(request)
+
+        capture = Capture()
+        profiler = cProfile.Profile()
+        token = _capture.set(capture)
+        started_at = datetime.now(dt_timezone.utc)
+        started = time.perf_counter()
+        try:
+            with execute_wrapper_all(capture), template_timing():
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Ya hay otro perfilador activo: se guardan solo consultas y plantillas
+                    profiler = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _capture.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            profile, summary = build_profile(request, response, reason, started_at, total_ms, capture, profiler)
+            get_store().save(profile, summary)
+        except Exception:
+            logger.exception('No se pudo guardar el perfil de %s', request.path)
+            return response
+        response['X-Profile-Id'] = summary['id']
+        return response
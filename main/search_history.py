@@ -0,0 +1,113 @@
+"""
+Compactación del historial de búsquedas.
+
+Las filas de UserSearchHistory más antiguas que la ventana de retención se
+acumulan en SearchTermStat, SearchIngredientStat y SearchTagStat (frecuencia y
+fecha de la última búsqueda por usuario) y después se borran por lotes.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import SearchIngredientStat, SearchTagStat, SearchTermStat, UserSearchHistory
+
+# analyze_user_profile lee los últimos 30 días del historial sin compactar
+MIN_RETENTION_DAYS = 30
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_BATCH_SIZE = 1000
+
+def _merge_stats(model, key_field, rows):
+    """
+    Suma `rows` ({(user_id, clave): (veces, última_fecha)}) a la tabla de
+    agregados `model`, actualizando las filas existentes y creando las nuevas.
+    """
+    if not rows:
+        return
+
+    user_ids = {user_id for user_id, key in rows}
+    keys = {key for user_id, key in rows}
+    existing = {
+        (stat.user_id, getattr(stat, key_field)): stat
+        for stat in model.objects.filter(user_id__in=user_ids, **{f'{key_field}__in': keys})
+    }
+
+    to_update = []
+    to_create = []
+    for (user_id, key), (count, last_searched_at) in rows.items():
+        stat = existing.get((user_id, key))
+        if stat:
+            stat.count += count
+            stat.last_searched_at = max(stat.last_searched_at, last_searched_at)
+            to_update.append(stat)
+        else:
+            to_create.append(model(
+                user_id=user_id,
+                count=count,
+                last_searched_at=last_searched_at,
+                **{key_field: key}
+            ))
+
+    model.objects.bulk_update(to_update, ['count', 'last_searched_at'])
+    model.objects.bulk_create(to_create)
+
+def _normalize_term(term):
+    return term.strip().lower()[:200]
+
+def _compact_batch(ids):
+    """Acumula y borra un lote de filas del historial"""
+    history = UserSearchHistory.objects.filter(id__in=ids)
+
+    terms = {}
+    for row in history.values('user_id', 'search_term').annotate(n=Count('id'), last=Max('created_at')).order_by():
+        key = (row['user_id'], _normalize_term(row['search_term']))
+        if not key[1]:
+            continue
+        count, last = terms.get(key, (0, row['last']))
+        terms[key] = (count + row['n'], max(last, row['last']))
+    _merge_stats(SearchTermStat, 'term', terms)
+
+    for through, field, model, key_field in (
+        (UserSearchHistory.ingredients_searched.through, 'ingredient_id', SearchIngredientStat, 'ingredient_id'),
+        (UserSearchHistory.tags_searched.through, 'tag_id', SearchTagStat, 'tag_id'),
+    ):
+        rows = through.objects.filter(
+            usersearchhistory_id__in=ids
+        ).values(
+            'usersearchhistory__user_id', field
+        ).annotate(
+            n=Count('id'), last=Max('usersearchhistory__created_at')
+        ).order_by()
+        _merge_stats(model, key_field, {
+            (row['usersearchhistory__user_id'], row[field]): (row['n'], row['last'])
+            for row in rows
+        })
+
+    # Las filas M2M se borran en cascada con el historial
+    history.delete()
+
+def compact_search_history(retention_days=DEFAULT_RETENTION_DAYS, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Compacta el historial anterior a `retention_days` días.
+    Devuelve el número de filas compactadas (o que se compactarían con dry_run).
+    """
+    if retention_days < MIN_RETENTION_DAYS:
+        raise ValueError(f'La retención debe ser de al menos {MIN_RETENTION_DAYS} días')
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    old_history = UserSearchHistory.objects.filter(created_at__lt=cutoff)
+
+    if dry_run:
+        return old_history.count()
+
+    compacted = 0
+    while True:
+        ids = list(old_history.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            _compact_batch(ids)
+        compacted += len(ids)
+
+    return compacted
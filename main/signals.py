@@ -0,0 +1,94 @@
+"""
+Señales que publican invalidaciones de caché en el bus (main/cache.py) y
+encolan el procesado de las imágenes subidas (main/tasks.py). También retiran
+las instantáneas estáticas (main/snapshots.py) de las recetas que se ocultan o
+se borran.
+
+Los me gusta no tocan el bus: solo cambian la versión del ámbito de su usuario
+(cache.bump_scopes), que invalida sus recomendaciones y no las de los demás.
+
+Las actualizaciones masivas con QuerySet.update() no disparan señales; quien
+las haga debe llamar a cache.invalidate() con los namespaces afectados (y a
+snapshots.discard_recipe_snapshots() si oculta recetas). Los
+borrados grandes (que envían una señal por fila) deben ir dentro de
+batched_invalidation() para publicar una sola invalidación por namespace.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from . import cache, jobs, snapshots
+from .models import Ingredient, Recipe, RecipeImage, RecipeIngredient, RecipeLike, Tag
+
+# Modelo -> namespaces que hay que invalidar cuando cambia
+INVALIDATED_NAMESPACES = {
+    Recipe: (cache.NS_RECIPES, cache.NS_LIKES),
+    RecipeImage: (cache.NS_RECIPES,),
+    RecipeIngredient: (cache.NS_RECIPES,),
+    Tag: (cache.NS_CATALOG, cache.NS_RECIPES),
+    Ingredient: (cache.NS_CATALOG, cache.NS_RECIPES),
+}
+
+# Namespaces y ámbitos acumulados dentro de batched_invalidation() (None fuera de él)
+_pending = ContextVar('pending_invalidations', default=None)
+
+def _invalidate(*namespaces):
+    pending = _pending.get()
+    if pending is None:
+        cache.invalidate(*namespaces)
+    else:
+        pending['namespaces'].update(namespaces)
+
+def _bump_scopes(*scopes):
+    pending = _pending.get()
+    if pending is None:
+        cache.bump_scopes(*scopes)
+    else:
+        pending['scopes'].update(scopes)
+
+@contextmanager
+def batched_invalidation():
+    """Agrupa las invalidaciones de las señales y las publica una vez al salir"""
+    pending = {'namespaces': set(), 'scopes': set()}
+    token = _pending.set(pending)
+    try:
+        yield pending
+    finally:
+        _pending.reset(token)
+        if pending['namespaces']:
+            cache.invalidate(*sorted(pending['namespaces']))
+        cache.bump_scopes(*sorted(pending['scopes']))
+
+def invalidate_model_cache(sender, **kwargs):
+    _invalidate(*INVALIDATED_NAMESPACES[sender])
+
+def invalidate_user_likes(sender, instance, **kwargs):
+    _bump_scopes(cache.user_scope(instance.user_id))
+
+def invalidate_recipe_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate(cache.NS_RECIPES)
+
+def enqueue_image_optimization(sender, instance, **kwargs):
+    """El redimensionado de las imágenes subidas se hace en la cola, no en la petición"""
+    if instance.image:
+        jobs.enqueue('images.optimize', unique_key=f'images.optimize:{instance.pk}', image_id=instance.pk)
+
+def discard_recipe_snapshot(sender, instance, **kwargs):
+    """Una receta oculta o borrada no debe seguir sirviéndose como instantánea"""
+    if kwargs.get('signal') is post_delete or not instance.is_published:
+        recipe_id = instance.pk
+        transaction.on_commit(lambda: snapshots.discard_recipe_snapshots([recipe_id]))
+
+def connect_signals():
+    for model in INVALIDATED_NAMESPACES:
+        post_save.connect(invalidate_model_cache, sender=model, dispatch_uid=f'cache_bus_save_{model.__name__}')
+        post_delete.connect(invalidate_model_cache, sender=model, dispatch_uid=f'cache_bus_delete_{model.__name__}')
+    post_save.connect(invalidate_user_likes, sender=RecipeLike, dispatch_uid='cache_scope_like_save')
+    post_delete.connect(invalidate_user_likes, sender=RecipeLike, dispatch_uid='cache_scope_like_delete')
+    m2m_changed.connect(invalidate_recipe_tags, sender=Recipe.tags.through, dispatch_uid='cache_bus_recipe_tags')
+    post_save.connect(discard_recipe_snapshot, sender=Recipe, dispatch_uid='snapshots_recipe_save')
+    post_delete.connect(discard_recipe_snapshot, sender=Recipe, dispatch_uid='snapshots_recipe_delete')
+    post_save.connect(enqueue_image_optimization, sender=RecipeImage, dispatch_uid='jobs_optimize_image')
@@ -0,0 +1,242 @@
+"""
+Instantáneas HTML estáticas para cuando la base de datos está saturada.
+
+export_snapshots() renderiza (como visitante anónimo) las recetas más vistas y
+las primeras páginas del listado y las guarda en SNAPSHOT_ROOT con el
+hash del contenido en el nombre, junto a un manifest.json que asocia cada ruta
+con su archivo. WhiteNoise las sirve en /static/snapshots/ con cabeceras de
+caché de larga duración (ver WHITENOISE_IMMUTABLE_FILE_TEST en settings).
+La tarea periódica snapshots.export las regenera cada SNAPSHOT_REFRESH_SECONDS,
+y discard_recipe_snapshots() retira al momento las de las recetas que se
+ocultan o se borran (desde las señales o tras un QuerySet.update()).
+
+SnapshotFallbackMiddleware mide la latencia media de las consultas de cada
+petición. Si la mediana de las peticiones de los últimos
+SNAPSHOT_FALLBACK_WINDOW segundos del proceso supera
+SNAPSHOT_FALLBACK_LATENCY_MS (con al menos SNAPSHOT_FALLBACK_MIN_SAMPLES
+peticiones en la ventana, para que una consulta lenta aislada no cuente), o una
+petición falla por un error de la base de datos, durante SNAPSHOT_FALLBACK_COOLDOWN segundos las peticiones GET anónimas
+a rutas con instantánea se responden con ella sin tocar la base de datos.
+Pasado ese tiempo se vuelve a probar la base de datos.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from statistics import median
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.test import Client
+from django.urls import reverse
+
+from .db_router import execute_wrapper_all
+from .models import Recipe
+from .warmup import warmup_context
+
+MANIFEST_NAME = 'manifest.json'
+# Peticiones recientes que se guardan como mucho para calcular la mediana
+MAX_LATENCY_SAMPLES = 500
+
+def snapshot_root():
+    return Path(settings.SNAPSHOT_ROOT)
+
+def _route(path, page=None):
+    return f'{path}?page={page}' if page else path
+
+def _render(path):
+    with warmup_context():
+        response = Client().get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'{path}: HTTP {response.status_code}')
+    return response.content
+
+def _write_snapshot(root, kind, name, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    relative = f'{kind}/{name}.{digest}.html'
+    target = root / relative
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix('.tmp')
+        tmp.write_bytes(content)
+        tmp.replace(target)
+    return relative
+
+def export_snapshots(recipes=100, list_pages=3, progress=None):
+    """
+    Genera las instantáneas y el manifiesto y borra las que ya no se usan.
+    Devuelve (generadas, errores).
+    """
+    root = snapshot_root()
+    home = reverse('recipe_list')
+    routes = [(home, 'listado', 'page-1', home)]
+    for page in range(2, list_pages + 1):
+        routes.append((_route(home, page), 'listado', f'page-{page}', _route(home, page)))
+    top_recipes = Recipe.objects.filter(is_published=True).order_by(
+        '-view_count', '-trending_score'
+    ).values_list('id', flat=True)[:recipes]
+    for recipe_id in top_recipes:
+        path = reverse('recipe_detail', args=[recipe_id])
+        routes.append((path, 'receta', str(recipe_id), path))
+
+    manifest = {}
+    errors = []
+    for route, kind, name, path in routes:
+        try:
+            manifest[route] = _write_snapshot(root, kind, name, _render(path))
+        except Exception as e:
+            errors.append(f'{route}: {type(e).__name__}: {e}')
+            continue
+        if progress:
+            progress(route, manifest[route])
+    if f'{home}?page=1' not in manifest and home in manifest:
+        manifest[_route(home, 1)] = manifest[home]
+
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f'{MANIFEST_NAME}.{os.getpid()}.tmp'
+    tmp.write_text(json.dumps({'generated_at': time.time(), 'routes': manifest}, indent=2))
+    tmp.replace(root / MANIFEST_NAME)
+
+    used = set(manifest.values())
+    for path in root.glob('*/*.html'):
+        if path.relative_to(root).as_posix() not in used:
+            path.unlink()
+    return len(used), errors
+
+def discard_recipe_snapshots(recipe_ids):
+    """Quita del manifiesto y del disco las instantáneas de estas recetas"""
+    manifest = load_manifest()
+    routes = [route for route in (reverse('recipe_detail', args=[recipe_id]) for recipe_id in recipe_ids)
+              if route in manifest]
+    if not routes:
+        return 0
+    root = snapshot_root()
+    path = root / MANIFEST_NAME
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return 0
+    removed = [data['routes'].pop(route) for route in routes if route in data['routes']]
+    tmp = root / f'{MANIFEST_NAME}.{os.getpid()}.tmp'
+    tmp.write_text(json.dumps(data, indent=2))
+    tmp.replace(path)
+    for relative in removed:
+        (root / relative).unlink(missing_ok=True)
+    return len(removed)
+
+_manifest = {'mtime': None, 'routes': {}}
+_manifest_lock = threading.Lock()
+
+def load_manifest():
+    """Rutas con instantánea ({ruta: archivo}); se relee si el manifiesto cambió"""
+    path = snapshot_root() / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    with _manifest_lock:
+        if _manifest['mtime'] != mtime:
+            try:
+                _manifest['routes'] = json.loads(path.read_text())['routes']
+            except (OSError, ValueError, KeyError):
+                _manifest['routes'] = {}
+            _manifest['mtime'] = mtime
+        return _manifest['routes']
+
+class DatabaseHealth:
+    """Latencia de las consultas de las peticiones recientes del proceso y estado de saturación"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=MAX_LATENCY_SAMPLES)  # (instante, ms por consulta)
+        self.overloaded_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, query_ms):
+        now = time.monotonic()
+        with self._lock:
+            self.samples.append((now, query_ms))
+            window_start = now - settings.SNAPSHOT_FALLBACK_WINDOW
+            while self.samples and self.samples[0][0] < window_start:
+                self.samples.popleft()
+            if (len(self.samples) >= settings.SNAPSHOT_FALLBACK_MIN_SAMPLES
+                    and self.latency_ms() > settings.SNAPSHOT_FALLBACK_LATENCY_MS):
+                self.trip()
+                self.samples.clear()
+
+    def latency_ms(self):
+        """Mediana de la ventana: una consulta lenta aislada no la mueve"""
+        return median(ms for _, ms in self.samples) if self.samples else 0.0
+
+    def trip(self):
+        self.overloaded_until = time.monotonic() + settings.SNAPSHOT_FALLBACK_COOLDOWN
+
+    @property
+    def overloaded(self):
+        return time.monotonic() < self.overloaded_until
+
+health = DatabaseHealth()
+
+class QueryTimer:
+    """execute_wrapper que acumula el tiempo de las consultas de una petición"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+def snapshot_response(request):
+    """La instantánea de la petición, o None si no hay o no procede"""
+    if request.method not in ('GET', 'HEAD') or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return None
+    query = request.GET.dict()
+    if set(query) - {'page'}:
+        return None
+    relative = load_manifest().get(_route(request.path, query.get('page')))
+    if relative is None:
+        return None
+    try:
+        content = (snapshot_root() / relative).read_bytes()
+    except OSError:
+        return None
+    response = HttpResponse(content)
+    response['Cache-Control'] = f'public, max-age={settings.SNAPSHOT_FALLBACK_COOLDOWN}'
+    response['X-Snapshot'] = relative
+    return response
+
+class SnapshotFallbackMiddleware:
+    """Sirve instantáneas a los anónimos mientras la base de datos está saturada"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SNAPSHOT_FALLBACK_ENABLED:
+            return self.get_response(request)
+        if health.overloaded:
+            response = snapshot_response(request)
+            if response is not None:
+                return response
+
+        timer = QueryTimer()
+        with execute_wrapper_all(timer):
+            response = self.get_response(request)
+        if timer.count:
+            health.record(timer.seconds * 1000 / timer.count)
+        return response
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, DatabaseError) and settings.SNAPSHOT_FALLBACK_ENABLED:
+            health.trip()
+            return snapshot_response(request)
+        return None
@@ -0,0 +1,83 @@
+"""
+Perfil de rendimiento opcional para SQLite.
+
+Con SQLITE_PERFORMANCE_PROFILE=1 cada conexión SQLite nueva activa WAL
+(lectores y escritor concurrentes), synchronous=NORMAL, mmap, una caché de
+páginas mayor y busy_timeout, y settings.py abre las transacciones en modo
+IMMEDIATE para que el bloqueo de escritura se pida al empezar y no a mitad.
+retry_on_locked reintenta con espera exponencial las vistas que escriben
+cuando aun así la base está bloqueada.
+"""
+import asyncio
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64000),  # Negativo = KiB (64 MB)
+    ('busy_timeout', 5000),
+    ('temp_store', 'MEMORY'),
+)
+
+def apply_sqlite_profile(conn):
+    """Aplica los PRAGMA del perfil a una conexión de Django"""
+    with conn.cursor() as cursor:
+        for name, value in PRAGMAS:
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+def on_connection_created(sender, connection, **kwargs):
+    """Receptor de connection_created (registrado en MainConfig.ready)"""
+    if connection.vendor == 'sqlite' and getattr(settings, 'SQLITE_PERFORMANCE_PROFILE', False):
+        apply_sqlite_profile(connection)
+
+def is_locked_error(error):
+    return 'locked' in str(error).lower() or 'busy' in str(error).lower()
+
+def retry_on_locked(func=None, attempts=5, base_delay=0.05, using=DEFAULT_DB_ALIAS):
+    """
+    Reintenta la función si SQLite responde "database is locked".
+    Las escrituras de la función deben ir en transaction.atomic() para que un
+    intento fallido no deje cambios a medias.
+    """
+    def should_retry(error, attempt):
+        # Dentro de una transacción externa reintentar no sirve
+        return (is_locked_error(error) and attempt < attempts - 1
+                and not connections[using].in_atomic_block)
+
+    def delay(attempt):
+        return base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for attempt in range(attempts):
+                    try:
+                        return await func(*args, **kwargs)
+                    except OperationalError as e:
+                        if not should_retry(e, attempt):
+                            raise
+                        await asyncio.sleep(delay(attempt))
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if not should_retry(e, attempt):
+                        raise
+                    time.sleep(delay(attempt))
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
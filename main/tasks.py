@@ -0,0 +1,70 @@
+"""
+Tareas de la cola de trabajos (main/jobs.py).
+
+Se importan desde MainConfig.ready() para que el registro esté completo tanto
+en los servidores web (que encolan) como en run_worker (que ejecuta).
+"""
+from django.conf import settings
+
+from . import deletion, events, jobs, leases, snapshots
+from .images import file_hash, optimize_image
+from .models import RecipeImage
+from .search_history import compact_search_history
+from .trending import update_trending_scores
+
+@jobs.task(name='images.optimize')
+def optimize_recipe_image(image_id):
+    """Redimensiona y comprime una imagen subida (si cambió desde la última vez)"""
+    image = RecipeImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return
+    if file_hash(image.image.path) != image.content_hash:
+        RecipeImage.objects.filter(pk=image_id).update(content_hash=optimize_image(image.image.path))
+
+@jobs.task(name='deletion.run')
+def run_deletion(deletion_job_id):
+    """
+    Ejecuta o reanuda un borrado encolado desde el panel (DeletionJob). Si
+    falla, la excepción llega a la cola, que lo reintenta: el reintento
+    reanuda el trabajo fallido donde se quedó
+    """
+    job = deletion.claim_job(deletion_job_id, include_failed=True)
+    if job:
+        deletion.run_deletion_job(job)
+
+@jobs.task(name='deletion.resume_stale', every=600)
+def resume_stale_deletions():
+    deletion.resume_stale_jobs()
+
+@jobs.task(name='trending.update', every=300)
+def update_trending():
+    update_trending_scores()
+
+@jobs.task(name='trending.full_recompute', every=24 * 3600)
+def recompute_trending():
+    """Recalcula las tendencias desde cero para descontar los me gusta retirados"""
+    update_trending_scores(full=True)
+
+@jobs.task(name='events.ingest', every=300)
+def ingest_events():
+    events.ingest_events()
+
+@jobs.task(name='snapshots.export', every=settings.SNAPSHOT_REFRESH_SECONDS)
+def export_snapshots():
+    """Regenera las instantáneas de respaldo con las recetas más vistas del momento"""
+    generated, errors = snapshots.export_snapshots()
+    if errors and not generated:
+        raise RuntimeError(f'No se pudo generar ninguna instantánea: {errors[0]}')
+
+@jobs.task(name='search_history.compact', every=24 * 3600)
+def compact_history():
+    compact_search_history()
+
+@jobs.task(name='leases.purge', every=3600)
+def purge_leases():
+    """Borra los archivos de reservas caducadas (marcas de visita, candados)"""
+    leases.purge_expired()
+
+@jobs.task(name='jobs.purge', every=24 * 3600)
+def purge_jobs():
+    jobs.purge_finished_jobs()
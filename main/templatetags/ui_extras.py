@@ -21,3 +21,11 @@ def contrast_color(hex_color: str):
     r, g, b = _hex_to_rgb(hex_color)
     y = (0.2126*(r/255)**2.2 + 0.7152*(g/255)**2.2 + 0.0722*(b/255)**2.2)
     return "#000" if y > 0.5 else "#fff"
+
+
+@register.filter
+def facet_count(counts, key):
+    """Número de recetas de una faceta: {{ form.facet_counts.tags|facet_count:choice.data.value }}"""
+    if not counts:
+        return ""
+    return counts.get(getattr(key, "value", key), 0)
@@ -0,0 +1,118 @@
+"""
+Puntuación de tendencia con decaimiento exponencial.
+
+Cada me gusta aporta 1 punto en el momento en que se da y ese aporte se reduce
+a la mitad cada TRENDING_HALF_LIFE_HOURS. La puntuación se guarda en
+Recipe.trending_score y se actualiza de forma incremental: en cada ejecución se
+decae lo acumulado con un solo UPDATE y solo se suman los me gusta nuevos desde
+la ejecución anterior.
+
+El punto de corte es temporal y no un id: en PostgreSQL los ids se asignan
+antes del COMMIT, así que un me gusta puede aparecer después de otro con id
+mayor. Los me gusta de los últimos TRENDING_OVERLAP_MINUTES se vuelven a
+agregar en cada ejecución (se resta lo que aportaron en la anterior, guardado en
+TrendingState.window_scores), de modo que los que se confirman tarde y los que
+se retiran dentro de esa ventana quedan bien contados. Los me gusta retirados
+después solo decaen: la tarea trending.full_recompute recalcula todo cada día.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from . import cache
+from .models import Recipe, RecipeLike, TrendingState
+
+HALF_LIFE_HOURS = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48)
+
+# Ventana que se vuelve a agregar en cada ejecución; debe superar la duración
+# de la transacción más larga que cree me gusta
+OVERLAP = timedelta(minutes=getattr(settings, 'TRENDING_OVERLAP_MINUTES', 10))
+
+# Puntuaciones por debajo de este valor se consideran cero
+MIN_SCORE = 1e-4
+
+# Tamaño de lote para leer me gusta y escribir puntuaciones
+BATCH_SIZE = 500
+
+def decay_factor(elapsed_seconds):
+    """Factor de decaimiento tras `elapsed_seconds` segundos"""
+    half_life_seconds = HALF_LIFE_HOURS * 3600
+    return 0.5 ** (max(elapsed_seconds, 0) / half_life_seconds)
+
+def _apply_increments(increments):
+    """Suma los incrementos {recipe_id: puntos} con un UPDATE por lote"""
+    recipe_ids = list(increments)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        chunk = recipe_ids[start:start + BATCH_SIZE]
+        Recipe.objects.filter(id__in=chunk).update(
+            trending_score=F('trending_score') + Case(
+                *[When(id=recipe_id, then=Value(increments[recipe_id])) for recipe_id in chunk],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+
+def _contributions(likes, now):
+    """({recipe_id: puntos}, me gusta leídos) de los me gusta decaídos hasta `now`"""
+    points = defaultdict(float)
+    count = 0
+    for recipe_id, created_at in likes.values_list('recipe_id', 'created_at').iterator(chunk_size=BATCH_SIZE):
+        points[recipe_id] += decay_factor((now - created_at).total_seconds())
+        count += 1
+    return points, count
+
+def update_trending_scores(full=False, now=None):
+    """
+    Actualiza Recipe.trending_score procesando solo los me gusta nuevos y los
+    de la ventana de solapamiento.
+
+    Con full=True se recalcula todo desde cero (necesario de vez en cuando, ya
+    que el modo incremental solo deja que decaigan los me gusta retirados fuera
+    de la ventana). Devuelve el número de me gusta procesados.
+    """
+    now = now or timezone.now()
+    settled_until = now - OVERLAP
+
+    with transaction.atomic():
+        state, created = TrendingState.objects.select_for_update().get_or_create(pk=1)
+
+        factor = 1.0
+        # Sin corte anterior (primera ejecución) no hay forma de saber qué se sumó ya
+        if full or state.settled_until is None:
+            Recipe.objects.exclude(trending_score=0).update(trending_score=0)
+            state.settled_until = None
+            state.window_scores = {}
+        elif state.computed_at:
+            # Decaer lo acumulado hasta ahora
+            factor = decay_factor((now - state.computed_at).total_seconds())
+            if factor < 1:
+                Recipe.objects.filter(trending_score__gt=0).update(
+                    trending_score=F('trending_score') * factor
+                )
+
+        # Volver a agregar todo lo posterior al corte anterior, restando lo que
+        # la ventana anterior ya había sumado (decaído hasta ahora)
+        likes = RecipeLike.objects.filter(created_at__lte=now)
+        if state.settled_until:
+            likes = likes.filter(created_at__gte=state.settled_until)
+        increments, processed = _contributions(likes, now)
+        for recipe_id, previous in state.window_scores.items():
+            increments[int(recipe_id)] -= previous * factor
+        _apply_increments({k: v for k, v in increments.items() if abs(v) >= MIN_SCORE})
+        # Incluye los restos negativos por redondeo al restar la ventana anterior
+        Recipe.objects.filter(trending_score__lt=MIN_SCORE).exclude(trending_score=0).update(trending_score=0)
+
+        window, _ = _contributions(likes.filter(created_at__gte=settled_until), now)
+        state.window_scores = {str(k): v for k, v in window.items()}
+        state.settled_until = settled_until
+        state.computed_at = now
+        state.save()
+
+        # Los UPDATE masivos no disparan señales
+        cache.invalidate(cache.NS_LIKES)
+
+    return processed
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Endpoints JSON con variante asíncrona: solo bajo ASGI (ver baseDeProyectos/asgi.py)
+json_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     # Autenticación
@@ -14,10 +18,20 @@ urlpatterns = [
     # H11 - Panel de administración
     path('admin-panel/usuarios/', views.admin_users, name='admin_users'),
     path('admin-panel/recetas/', views.admin_recipes, name='admin_recipes'),
-    path('admin-panel/usuario/<int:user_id>/toggle-status/', views.admin_toggle_user_status, name='admin_toggle_user_status'),
-    path('admin-panel/receta/<int:recipe_id>/toggle-status/', views.admin_toggle_recipe_status, name='admin_toggle_recipe_status'),
+    path('admin-panel/usuario/<int:user_id>/toggle-status/', json_views.admin_toggle_user_status, name='admin_toggle_user_status'),
+    path('admin-panel/receta/<int:recipe_id>/toggle-status/', json_views.admin_toggle_recipe_status, name='admin_toggle_recipe_status'),
     path('admin-panel/usuario/<int:user_id>/eliminar/', views.admin_delete_user, name='admin_delete_user'),
     path('admin-panel/receta/<int:recipe_id>/eliminar/', views.admin_delete_recipe, name='admin_delete_recipe'),
+    path('admin-panel/usuarios/acciones/', views.admin_bulk_users, name='admin_bulk_users'),
+    path('admin-panel/recetas/acciones/', views.admin_bulk_recipes, name='admin_bulk_recipes'),
+    path('admin-panel/borrados/', views.admin_deletion_jobs, name='admin_deletion_jobs'),
+    path('admin-panel/borrados/<int:job_id>/reiniciar/', views.admin_deletion_job_reset, name='admin_deletion_job_reset'),
+    path('admin-panel/trabajos/', views.admin_jobs, name='admin_jobs'),
+    path('admin-panel/trabajos/<int:job_id>/reintentar/', views.admin_job_retry, name='admin_job_retry'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('admin-panel/perfiles/', views.admin_profiles, name='admin_profiles'),
+    path('admin-panel/perfiles/<str:profile_id>/', views.admin_profile_detail, name='admin_profile_detail'),
+    path('admin-panel/perfiles/<str:profile_id>/flamegraph.folded', views.admin_profile_flamegraph, name='admin_profile_flamegraph'),
     
     # Gestión de ingredientes y etiquetas
     path('admin-panel/ingredientes/', views.admin_ingredients, name='admin_ingredients'),
@@ -43,7 +57,7 @@ urlpatterns = [
     path('receta/<int:recipe_id>/eliminar/', views.recipe_delete, name='recipe_delete'),
     
     # H04 - Me gusta
-    path('receta/<int:recipe_id>/like/', views.toggle_like, name='toggle_like'),
+    path('receta/<int:recipe_id>/like/', json_views.toggle_like, name='toggle_like'),
     
     # H06 - Búsqueda por ingredientes
     path('buscar-por-ingredientes/', views.search_by_ingredients, name='search_by_ingredients'),
@@ -56,5 +70,5 @@ urlpatterns = [
     path('recomendaciones-ia/', views.smart_recommendations, name='smart_recommendations'),
     
     # API endpoints
-    path('api/search-ingredients/', views.search_ingredients_api, name='search_ingredients_api'),
+    path('api/search-ingredients/', json_views.search_ingredients_api, name='search_ingredients_api'),
 ]
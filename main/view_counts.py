@@ -0,0 +1,127 @@
+"""
+Contador de visitas de recetas con escritura diferida.
+
+Cada visita suma 1 en un contador en memoria del proceso y, como mucho cada
+VIEW_COUNT_FLUSH_SECONDS, los incrementos acumulados se vuelcan con un UPDATE
+por cada valor distinto (`view_count = view_count + n`), en lugar de un UPDATE
+por visita. Lo vuelca la siguiente visita o, si no llega ninguna, un
+temporizador en segundo plano pasado ese tiempo; al terminar el proceso se
+vuelca lo pendiente.
+
+Las visitas repetidas de un mismo visitante (sesión, usuario o IP + navegador)
+a una receta dentro de VIEW_DEDUP_SECONDS solo cuentan una vez; la marca se
+guarda como reserva atómica (main/leases.py), sin escribir en la sesión.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+from . import leases
+from .models import Recipe
+from .sqlite import retry_on_locked
+from .warmup import in_warmup
+
+logger = logging.getLogger(__name__)
+
+_pending = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_timer = None
+
+def _visitor_key(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    if request.session.session_key:
+        return f's{request.session.session_key}'
+    client = f'{request.META.get("REMOTE_ADDR", "")}|{request.META.get("HTTP_USER_AGENT", "")}'
+    return 'a' + hashlib.sha1(client.encode()).hexdigest()
+
+def record_view(request, recipe_id):
+    """Cuenta una visita (si no es repetida) y vuelca los contadores si toca"""
+    key = f'recipe-view:{recipe_id}:{_visitor_key(request)}'
+    if not leases.add(key, 1, settings.VIEW_DEDUP_SECONDS):
+        return False
+    global _timer
+    with _lock:
+        _pending[recipe_id] += 1
+        due = time.monotonic() - _last_flush >= settings.VIEW_COUNT_FLUSH_SECONDS
+        # Sin hilos durante el calentamiento: corre en el maestro de gunicorn antes del fork
+        if not due and _timer is None and not in_warmup():
+            _timer = threading.Timer(settings.VIEW_COUNT_FLUSH_SECONDS, _flush_on_timer)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        flush()
+    return True
+
+def _flush_on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush()
+    finally:
+        # Las conexiones son por hilo: se cierran las de este
+        connections.close_all()
+
+def _cancel_timer():
+    global _timer
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+
+@retry_on_locked
+def _apply(increments):
+    by_amount = defaultdict(list)
+    for recipe_id, amount in increments.items():
+        by_amount[amount].append(recipe_id)
+    for amount, recipe_ids in by_amount.items():
+        Recipe.objects.filter(id__in=recipe_ids).update(view_count=F('view_count') + amount)
+
+def flush():
+    """Escribe los incrementos pendientes. Devuelve el número de visitas volcadas"""
+    global _last_flush
+    with _lock:
+        increments = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+        _cancel_timer()
+    if not increments:
+        return 0
+    try:
+        _apply(increments)
+    except Exception:
+        # Se conservan para el siguiente volcado
+        logger.exception('No se pudieron guardar %s visitas', sum(increments.values()))
+        with _lock:
+            _pending.update(increments)
+        return 0
+    return sum(increments.values())
+
+def discard_pending():
+    """Descarta los incrementos pendientes sin escribirlos (los de una base ya destruida)"""
+    with _lock:
+        _pending.clear()
+        _cancel_timer()
+
+def pending_views():
+    with _lock:
+        return sum(_pending.values())
+
+def _reset_after_fork():
+    # Lo pendiente lo vuelca el padre; el temporizador no sobrevive al fork
+    global _lock, _timer
+    _lock = threading.Lock()
+    _timer = None
+    _pending.clear()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush)
@@ -2,18 +2,29 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
 from django.db.models import Q, Count, Avg, F
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.db import transaction
 from datetime import datetime, timedelta
 import random
 from collections import defaultdict
 from .forms import (RegisterForm, LoginForm, RecipeForm, RecipeIngredientFormSet, 
                    RecipeImageFormSet, RecipeSearchForm, IngredientSearchForm,
                    IngredientForm, TagForm)
-from .models import CustomUser, Recipe, RecipeLike, Tag, Ingredient, UserSearchHistory, UserPreference
+from . import cache, events, facets, jobs, metrics, profiling, snapshots, view_counts
+from .db_router import use_replica
+from .deletion import queue_recipe_deletion, queue_user_deletion, reset_job as reset_deletion_job
+from .sqlite import retry_on_locked
+from .warmup import in_warmup
+from .admission import admission_control
+from .models import (CustomUser, Recipe, RecipeLike, Tag, Ingredient, UserSearchHistory, UserPreference,
+                     SearchIngredientStat, SearchTagStat, DeletionJob, Job)
 
 def register_view(request):
     if request.method == 'POST':
@@ -62,10 +73,10 @@ def user_panel(request):
     # Obtener las recetas del usuario
     user_recipes = Recipe.objects.filter(author=request.user).order_by('-created_at')[:5]
     
-    # Obtener recetas con más likes para mostrar
-    popular_recipes = Recipe.objects.annotate(
-        total_likes=Count('likes')
-    ).order_by('-total_likes')[:5]
+    # Obtener recetas en tendencia para mostrar
+    popular_recipes = Recipe.objects.filter(
+        is_published=True
+    ).order_by('-trending_score', '-created_at')[:5]
     
     context = {
         'user_recipes': user_recipes,
@@ -78,32 +89,33 @@ def admin_panel(request):
     if request.user.role != 'admin':
         return redirect('user_panel')
     
-    # Estadísticas para el admin
-    total_users = CustomUser.objects.filter(role='user').count()
-    total_recipes = Recipe.objects.count()
-    total_likes = RecipeLike.objects.count()
     recent_recipes = Recipe.objects.order_by('-created_at')[:10]
     recent_users = CustomUser.objects.filter(role='user').order_by('-date_joined')[:10]
-    
-    # Estadísticas adicionales
-    published_recipes = Recipe.objects.filter(is_published=True).count()
-    unpublished_recipes = Recipe.objects.filter(is_published=False).count()
-    total_tags = Tag.objects.count()
-    total_ingredients = Ingredient.objects.count()
+    most_viewed_recipes = Recipe.objects.filter(view_count__gt=0).select_related('author').annotate(
+        total_likes=Count('likes')
+    ).order_by('-view_count')[:10]
     
     context = {
-        'total_users': total_users,
-        'total_recipes': total_recipes,
-        'total_likes': total_likes,
+        **get_admin_stats(),
         'recent_recipes': recent_recipes,
         'recent_users': recent_users,
-        'published_recipes': published_recipes,
-        'unpublished_recipes': unpublished_recipes,
-        'total_tags': total_tags,
-        'total_ingredients': total_ingredients,
+        'most_viewed_recipes': most_viewed_recipes,
     }
     return render(request, 'admin_panel.html', context)
 
+@cache.single_flight(cache.NS_RECIPES, 'admin-stats', timeout=60, stale_timeout=10 * 60)
+def get_admin_stats():
+    """Conteos del panel de admin (un minuto en caché, calculados una sola vez a la vez)"""
+    return {
+        'total_users': CustomUser.objects.filter(role='user').count(),
+        'total_recipes': Recipe.objects.count(),
+        'total_likes': RecipeLike.objects.count(),
+        'published_recipes': Recipe.objects.filter(is_published=True).count(),
+        'unpublished_recipes': Recipe.objects.filter(is_published=False).count(),
+        'total_tags': Tag.objects.count(),
+        'total_ingredients': Ingredient.objects.count(),
+    }
+
 @login_required
 def admin_users(request):
     """Vista para gestionar usuarios desde el panel de admin"""
@@ -178,7 +190,7 @@ def admin_toggle_user_status(request, user_id):
     
     user = get_object_or_404(CustomUser, id=user_id, role='user')
     user.is_active = not user.is_active
-    user.save()
+    user.save(update_fields=['is_active'])
     
     return JsonResponse({
         'success': True,
@@ -195,7 +207,8 @@ def admin_toggle_recipe_status(request, recipe_id):
     
     recipe = get_object_or_404(Recipe, id=recipe_id)
     recipe.is_published = not recipe.is_published
-    recipe.save()
+    recipe.save(update_fields=['is_published'])
+    events.emit('publish' if recipe.is_published else 'unpublish', recipe_id=recipe.id, user_id=request.user.id)
     
     return JsonResponse({
         'success': True,
@@ -203,18 +216,196 @@ def admin_toggle_recipe_status(request, recipe_id):
         'message': f'Receta {"publicada" if recipe.is_published else "ocultada"} correctamente'
     })
 
+def _selected_ids(request, field):
+    """IDs marcados en un formulario de acciones en bloque"""
+    return [int(value) for value in request.POST.getlist(field) if value.isdigit()]
+
+def _redirect_back(request, default):
+    """Vuelve a la página del listado (con sus filtros) si es de este sitio"""
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect(default)
+
+@login_required
+@require_POST
+def admin_bulk_users(request):
+    """Activar, desactivar o eliminar varios usuarios a la vez"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    action = request.POST.get('action')
+    users = CustomUser.objects.filter(id__in=_selected_ids(request, 'user_ids'), role='user')
+    
+    if action in ('activate', 'deactivate'):
+        updated = users.update(is_active=(action == 'activate'))
+        messages.success(request, f'{updated} usuarios {"activados" if action == "activate" else "desactivados"}')
+    elif action == 'delete':
+        queued = 0
+        for user in users.only('id', 'username'):
+            queue_user_deletion(user, requested_by=request.user)
+            queued += 1
+        messages.success(request, f'{queued} usuarios desactivados y en cola para eliminarse')
+    else:
+        messages.error(request, 'Acción no válida')
+    return _redirect_back(request, 'admin_users')
+
+@login_required
+@require_POST
+def admin_bulk_recipes(request):
+    """Publicar, ocultar o eliminar varias recetas a la vez"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    action = request.POST.get('action')
+    recipes = Recipe.objects.filter(id__in=_selected_ids(request, 'recipe_ids'))
+    
+    if action in ('publish', 'unpublish'):
+        with transaction.atomic():
+            recipe_ids = list(recipes.values_list('id', flat=True))
+            updated = recipes.update(is_published=(action == 'publish'))
+            cache.invalidate(cache.NS_RECIPES, cache.NS_LIKES)
+            if action == 'unpublish':
+                transaction.on_commit(lambda: snapshots.discard_recipe_snapshots(recipe_ids))
+            for recipe_id in recipe_ids:
+                events.emit(action, recipe_id=recipe_id, user_id=request.user.id)
+        messages.success(request, f'{updated} recetas {"publicadas" if action == "publish" else "ocultadas"}')
+    elif action == 'delete':
+        queued = 0
+        for recipe in recipes.only('id', 'title'):
+            queue_recipe_deletion(recipe, requested_by=request.user)
+            queued += 1
+        messages.success(request, f'{queued} recetas ocultadas y en cola para eliminarse')
+    else:
+        messages.error(request, 'Acción no válida')
+    return _redirect_back(request, 'admin_recipes')
+
+@login_required
+def admin_deletion_jobs(request):
+    """Progreso de los borrados en segundo plano"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    jobs = DeletionJob.objects.select_related('requested_by')[:50]
+    context = {
+        'jobs': jobs,
+        'has_active_jobs': any(job.status in ('pending', 'running') for job in jobs),
+    }
+    return render(request, 'admin_deletion_jobs.html', context)
+
+@login_required
+@require_POST
+def admin_deletion_job_reset(request, job_id):
+    """Volver a encolar un borrado fallido o abandonado (los lotes ya borrados no se repiten)"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    if reset_deletion_job(job_id):
+        messages.success(request, f'Borrado #{job_id} reencolado')
+    else:
+        messages.error(request, f'El borrado #{job_id} no está fallido ni abandonado')
+    return redirect('admin_deletion_jobs')
+
+@login_required
+def admin_jobs(request):
+    """Estado de la cola de trabajos en segundo plano"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    context = {
+        'stats': jobs.queue_stats(),
+        'failed_jobs': Job.objects.filter(status='failed').order_by('-finished_at')[:20],
+        'recent_jobs': Job.objects.exclude(status='queued').order_by('-locked_at')[:30],
+    }
+    return render(request, 'admin_jobs.html', context)
+
+@login_required
+@require_POST
+def admin_job_retry(request, job_id):
+    """Volver a encolar un trabajo fallido"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    updated = Job.objects.filter(pk=job_id, status='failed').update(
+        status='queued', attempts=0, run_at=timezone.now(), finished_at=None
+    )
+    if updated:
+        messages.success(request, f'Trabajo #{job_id} reencolado')
+    else:
+        messages.error(request, f'El trabajo #{job_id} no está fallido')
+    return redirect('admin_jobs')
+
+@login_required
+def admin_profiles(request):
+    """Perfiles de peticiones guardados por el perfilado por muestreo"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    profiles = profiling.get_store().list()
+    for profile in profiles:
+        profile['started'] = datetime.fromisoformat(profile['started_at'])
+    context = {
+        'profiles': profiles,
+        'sample_percent': settings.PROFILING_SAMPLE_RATE * 100,
+        'max_profiles': settings.PROFILING_MAX_PROFILES,
+        'profile_param': profiling.PROFILE_PARAM,
+    }
+    return render(request, 'admin_profiles.html', context)
+
+def _load_profile(profile_id):
+    profile = profiling.get_store().load(profile_id)
+    if profile is None:
+        raise Http404('Perfil no encontrado')
+    return profile
+
+@login_required
+def admin_profile_detail(request, profile_id):
+    """Funciones, consultas y plantillas de un perfil"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    profile = _load_profile(profile_id)
+    context = {
+        'profile': profile,
+        'slowest_templates': sorted(profile['templates'], key=lambda t: -t['ms'])[:30],
+        'stored_queries': len(profile['queries']),
+    }
+    return render(request, 'admin_profile_detail.html', context)
+
+@login_required
+def admin_profile_flamegraph(request, profile_id):
+    """Perfil en formato de pilas colapsadas (flamegraph.pl, speedscope)"""
+    if request.user.role != 'admin':
+        return redirect('user_panel')
+    
+    profile = _load_profile(profile_id)
+    response = HttpResponse(profiling.collapsed_text(profile), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="perfil-{profile_id}.folded"'
+    return response
+
+def metrics_view(request):
+    """Métricas de todos los procesos en formato Prometheus (administradores o METRICS_TOKEN)"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = (
+        (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'))
+        or (request.user.is_authenticated and request.user.role == 'admin')
+    )
+    if not authorized:
+        return HttpResponse('No autorizado', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render_all(), content_type='text/plain; version=0.0.4')
+
 @login_required
 def admin_delete_user(request, user_id):
-    """Eliminar un usuario (solo admins)"""
+    """Eliminar un usuario (solo admins); el borrado se hace en segundo plano"""
     if request.user.role != 'admin':
         return redirect('user_panel')
     
     user = get_object_or_404(CustomUser, id=user_id, role='user')
     
     if request.method == 'POST':
-        username = user.username
-        user.delete()
-        return redirect('admin_users')
+        queue_user_deletion(user, requested_by=request.user)
+        messages.success(request, f'El usuario {user.username} se ha desactivado y se eliminará en segundo plano')
+        return redirect('admin_deletion_jobs')
     
     context = {
         'user_to_delete': user,
@@ -230,9 +421,9 @@ def admin_delete_recipe(request, recipe_id):
     recipe = get_object_or_404(Recipe, id=recipe_id)
     
     if request.method == 'POST':
-        title = recipe.title
-        recipe.delete()
-        return redirect('admin_recipes')
+        queue_recipe_deletion(recipe, requested_by=request.user)
+        messages.success(request, f'La receta "{recipe.title}" se ha ocultado y se eliminará en segundo plano')
+        return redirect('admin_deletion_jobs')
     
     context = {
         'recipe_to_delete': recipe,
@@ -245,6 +436,7 @@ def logout_view(request):
     return redirect('/login/?logout=1')
 
 # H03 - Explorar recetas
+@use_replica
 def recipe_list(request):
     """Vista principal para explorar todas las recetas"""
     recipes = Recipe.objects.filter(is_published=True).select_related('author').prefetch_related('tags', 'images')
@@ -255,9 +447,13 @@ def recipe_list(request):
         query = form.cleaned_data.get('query')
         tags = form.cleaned_data.get('tags')
         difficulty = form.cleaned_data.get('difficulty')
+        min_time = form.cleaned_data.get('min_time')
+        max_time = form.cleaned_data.get('max_time')
         
+        # Filtros que no son facetas: texto y rango de tiempo total (columna indexada)
+        search = Q()
         if query:
-            recipes = recipes.filter(
+            search &= (
                 Q(title__icontains=query) | 
                 Q(description__icontains=query) |
                 Q(instructions__icontains=query)
@@ -269,35 +465,113 @@ def recipe_list(request):
                     user=request.user,
                     search_term=query
                 )
+            events.emit('search', term=query, user_id=request.user.id, source='recipe_list')
+        
+        if min_time is not None:
+            search &= Q(total_minutes__gte=min_time)
+        if max_time is not None:
+            search &= Q(total_minutes__lte=max_time)
+        recipes = recipes.filter(search)
         
         if tags:
-            recipes = recipes.filter(tags__in=tags).distinct()
+            if form.cleaned_data.get('tag_mode') == 'all':
+                for tag in tags:
+                    recipes = recipes.filter(tags=tag)
+            else:
+                recipes = recipes.filter(tags__in=tags).distinct()
         
         if difficulty:
             recipes = recipes.filter(difficulty=difficulty)
+        
+        # Conteos por etiqueta y dificultad para el resultado actual (bitmaps en caché)
+        form.add_facet_counts(facets.cached_facet_counts(
+            tag_ids=[tag.id for tag in tags],
+            tag_mode=form.cleaned_data.get('tag_mode') or 'any',
+            difficulty=difficulty,
+            search_key=f'{query}|{min_time}|{max_time}' if search else None,
+            search_ids=Recipe.objects.filter(search).values_list('id', flat=True) if search else None,
+        ))
     
     # Ordenar por likes o fecha
     sort_by = request.GET.get('sort', '-created_at')
     if sort_by == 'likes':
         recipes = recipes.annotate(total_likes=Count('likes')).order_by('-total_likes', '-created_at')
+    elif sort_by == 'trending':
+        recipes = recipes.order_by('-trending_score', '-created_at')
     else:
         recipes = recipes.order_by('-created_at')
     
-    # Paginación
-    paginator = Paginator(recipes, 12)  # 12 recetas por página
+    # Paginación (las primeras páginas sin filtros salen de la caché)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = None
+    if not set(request.GET) - {'sort', 'page'}:
+        page_obj = get_listing_page(recipes, sort_by if sort_by in ('likes', 'trending') else 'recent', page_number)
+    if page_obj is None:
+        paginator = Paginator(recipes, 12)  # 12 recetas por página
+        page_obj = paginator.get_page(page_number)
+    
+    # Filtros actuales para conservarlos en los enlaces de paginación
+    filters = request.GET.copy()
+    filters.pop('page', None)
     
     context = {
         'page_obj': page_obj,
         'form': form,
         'sort_by': sort_by,
+        'filters_querystring': filters.urlencode(),
     }
     return render(request, 'recipe_list.html', context)
 
+# Páginas del listado sin filtros que se cachean (las más visitadas)
+LISTING_CACHED_PAGES = 10
+
+class CachedListing:
+    """Lista para Paginator con el total y las recetas de una sola página ya resueltos"""
+
+    def __init__(self, total, recipes):
+        self.total = total
+        self.recipes = recipes
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        return self.recipes
+
+@cache.single_flight(cache.NS_RECIPES, 'recipe-list:{sort}:{page}', timeout=60, stale_timeout=10 * 60)
+def get_listing_page_ids(recipes, sort, page):
+    """{'total', 'number', 'ids'} de una página del listado sin filtros"""
+    paginator = Paginator(recipes.values_list('id', flat=True), 12)
+    page_obj = paginator.get_page(page)
+    return {'total': paginator.count, 'number': page_obj.number, 'ids': list(page_obj)}
+
+def get_listing_page(recipes, sort, page_number):
+    """
+    Página del listado sin filtros con el total y los ids en caché (calculados
+    una sola vez a la vez); las recetas se cargan por id. None si la página no
+    se cachea.
+    """
+    try:
+        page = int(page_number or 1)
+    except ValueError:
+        return None
+    if not 1 <= page <= LISTING_CACHED_PAGES:
+        return None
+    listing = get_listing_page_ids(recipes, sort, page)
+    by_id = recipes.filter(id__in=listing['ids']).in_bulk()
+    page_recipes = [by_id[recipe_id] for recipe_id in listing['ids'] if recipe_id in by_id]
+    return Paginator(CachedListing(listing['total'], page_recipes), 12).get_page(listing['number'])
+
+@use_replica
 def recipe_detail(request, recipe_id):
     """Vista detallada de una receta"""
     recipe = get_object_or_404(Recipe, id=recipe_id, is_published=True)
+    if not in_warmup():
+        events.emit('view', recipe_id=recipe.id, user_id=request.user.id)
+        view_counts.record_view(request, recipe.id)
     
     # Verificar si el usuario ya dio like
     user_liked = False
@@ -318,6 +592,30 @@ def recipe_detail(request, recipe_id):
     return render(request, 'recipe_detail.html', context)
 
 # H02 - Crear y publicar recetas
+@retry_on_locked
+def _save_new_recipe(form, ingredient_formset, images, author):
+    """
+    Escrituras de recipe_create. Solo este bloque se reintenta si SQLite está
+    bloqueado: los archivos de las imágenes ya están guardados y no se repiten.
+    """
+    with transaction.atomic():
+        recipe = form.save(commit=False)
+        # Un intento revertido pudo asignar ids que SQLite reutiliza: se insertan de nuevo
+        for obj in [recipe, *images, *(ingredient_form.instance for ingredient_form in ingredient_formset.forms)]:
+            obj.pk = None
+        recipe.author = author
+        recipe.save()
+        form.save_m2m()
+
+        # Ingredientes
+        ingredient_formset.instance = recipe
+        ingredient_formset.save()
+
+        for img in images:
+            img.recipe = recipe
+            img.save()
+    return recipe
+
 @login_required
 def recipe_create(request):
     if request.user.role != 'user':
@@ -330,24 +628,18 @@ def recipe_create(request):
         image_formset      = RecipeImageFormSet(request.POST, request.FILES, prefix='image_set')
         
         if form.is_valid() and ingredient_formset.is_valid() and image_formset.is_valid():
-            recipe = form.save(commit=False)
-            recipe.author = request.user
-            recipe.save()
-            form.save_m2m()
-
-            # Ingredientes
-            ingredient_formset.instance = recipe
-            ingredient_formset.save()
-
-            # Imágenes (solo si se subió archivo)
-            image_formset.instance = recipe
-            images = image_formset.save(commit=False)
+            # Imágenes (solo si se subió archivo): se guardan en disco una vez, antes
+            # de la transacción, y se borran si la receta no llega a crearse
+            images = [img for img in image_formset.save(commit=False) if getattr(img, 'image', None)]
             for img in images:
-                if getattr(img, 'image', None):
-                    img.recipe = recipe
-                    img.save()
-            for obj in image_formset.deleted_objects:
-                obj.delete()
+                img.image.save(img.image.name, img.image.file, save=False)
+            try:
+                recipe = _save_new_recipe(form, ingredient_formset, images, request.user)
+            except Exception:
+                for img in images:
+                    img.image.delete(save=False)
+                raise
+            events.emit('publish', recipe_id=recipe.id, user_id=request.user.id)
 
             return redirect('recipe_detail', recipe_id=recipe.id)
     else:
@@ -432,8 +724,25 @@ def my_recipes(request):
     return render(request, 'my_recipes.html', {'page_obj': page_obj})
 
 # H04 - Dar "me gusta" a recetas
+def _toggle_like(user, recipe):
+    """Da o quita el like en una transacción; devuelve si queda con like"""
+    with transaction.atomic():
+        like, created = RecipeLike.objects.get_or_create(
+            user=user,
+            recipe=recipe
+        )
+        
+        if not created:
+            # Si ya existía, lo eliminamos (quitar like)
+            like.delete()
+            events.emit('unlike', recipe_id=recipe.id, user_id=user.id)
+            return False
+        events.emit('like', recipe_id=recipe.id, user_id=user.id)
+        return True
+
 @login_required
 @require_POST
+@retry_on_locked
 def toggle_like(request, recipe_id):
     """Vista AJAX para dar/quitar like a una receta - Solo usuarios normales"""
     if request.user.role != 'user':
@@ -444,18 +753,7 @@ def toggle_like(request, recipe_id):
         }, status=403)
         
     recipe = get_object_or_404(Recipe, id=recipe_id)
-    
-    like, created = RecipeLike.objects.get_or_create(
-        user=request.user,
-        recipe=recipe
-    )
-    
-    if not created:
-        # Si ya existía, lo eliminamos (quitar like)
-        like.delete()
-        liked = False
-    else:
-        liked = True
+    liked = _toggle_like(request.user, recipe)
     
     return JsonResponse({
         'liked': liked,
@@ -463,6 +761,7 @@ def toggle_like(request, recipe_id):
     })
 
 # H06 - Búsqueda por ingredientes
+@use_replica
 def search_by_ingredients(request):
     """Vista para buscar recetas por ingredientes disponibles"""
     form = IngredientSearchForm(request.GET)
@@ -486,6 +785,8 @@ def search_by_ingredients(request):
                 search_term=f"Búsqueda por ingredientes: {', '.join([i.name for i in selected_ingredients])}"
             )
             search_history.ingredients_searched.set(selected_ingredients)
+        events.emit('search', user_id=request.user.id, source='ingredients',
+                    ingredient_ids=[ingredient.id for ingredient in selected_ingredients])
     
     context = {
         'form': form,
@@ -494,7 +795,30 @@ def search_by_ingredients(request):
     return render(request, 'search_by_ingredients.html', context)
 
 # H05 - Recomendaciones personalizadas
+def get_popular_fallback(limit=12):
+    """
+    Recetas en tendencia (puntuación precalculada por update_trending) para las
+    respuestas degradadas: una consulta cacheada en lugar del algoritmo
+    """
+    recipe_ids = cache.get_or_compute(cache.NS_LIKES, f'popular-fallback:{limit}', lambda: list(
+        Recipe.objects.filter(is_published=True).order_by('-trending_score', '-created_at')
+        .values_list('id', flat=True)[:limit]
+    ))
+    recipes = Recipe.objects.filter(id__in=recipe_ids).select_related('author').prefetch_related('tags', 'images').in_bulk()
+    return [recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes]
+
+def recommendations_fallback(request):
+    """Versión degradada de recommendations cuando está saturada"""
+    if request.user.role != 'user':
+        return redirect('admin_panel')
+    return render(request, 'recommendations.html', {
+        'recommended_recipes': get_popular_fallback(),
+        'degraded': True,
+    })
+
 @login_required
+@use_replica
+@admission_control('recommendations', fallback=recommendations_fallback)
 def recommendations(request):
     """Vista para mostrar recomendaciones personalizadas - Solo usuarios normales"""
     if request.user.role != 'user':
@@ -502,11 +826,39 @@ def recommendations(request):
         return redirect('admin_panel')
         
     user = request.user
-    recommended_recipes = []
     
     # Obtener preferencias del usuario (crear si no existen)
     preferences, created = UserPreference.objects.get_or_create(user=user)
     
+    unique_recommendations = get_basic_recommendations(user, preferences)
+    liked_recipes = Recipe.objects.filter(likes__user=user, is_published=True)
+    search_history = UserSearchHistory.objects.filter(user=user).order_by('-created_at')[:10]
+    
+    # Estadísticas para mostrar al usuario
+    stats = {
+        'total_likes': liked_recipes.count(),
+        'total_searches': search_history.count(),
+        'favorite_tags': preferences.favorite_tags.count(),
+        'favorite_ingredients': preferences.favorite_ingredients.count(),
+    }
+    
+    context = {
+        'recommended_recipes': unique_recommendations,
+        'stats': stats,
+        'preferences': preferences,
+    }
+    return render(request, 'recommendations.html', context)
+
+def get_basic_recommendations(user, preferences=None, limit=12):
+    """
+    Recomendaciones basadas en reglas: etiquetas de recetas con me gusta,
+    historial de búsquedas, preferencias y, para completar, tendencias
+    """
+    recommended_recipes = []
+    
+    if preferences is None:
+        preferences, created = UserPreference.objects.get_or_create(user=user)
+    
     # 1. Recomendaciones basadas en recetas que le han gustado
     liked_recipes = Recipe.objects.filter(
         likes__user=user,
@@ -543,7 +895,17 @@ def recommendations(request):
         searched_tags = Tag.objects.filter(
             usersearchhistory__in=search_history
         ).distinct()
+    else:
+        # Historial ya compactado: usar los más buscados de los agregados
+        searched_ingredients = Ingredient.objects.filter(
+            id__in=list(SearchIngredientStat.objects.filter(user=user).order_by('-count').values_list('ingredient_id', flat=True)[:10])
+        )
         
+        searched_tags = Tag.objects.filter(
+            id__in=list(SearchTagStat.objects.filter(user=user).order_by('-count').values_list('tag_id', flat=True)[:10])
+        )
+    
+    if searched_ingredients.exists() or searched_tags.exists():
         # Recomendar recetas con ingredientes o etiquetas búsquedas
         search_based_recommendations = Recipe.objects.filter(
             Q(ingredients__in=searched_ingredients) | Q(tags__in=searched_tags),
@@ -580,8 +942,8 @@ def recommendations(request):
         
         recommended_recipes.extend(preference_recommendations)
     
-    # 4. Si no hay suficientes recomendaciones, agregar recetas populares
-    if len(recommended_recipes) < 12:
+    # 4. Si no hay suficientes recomendaciones, agregar recetas en tendencia
+    if len(recommended_recipes) < limit:
         popular_recipes = Recipe.objects.filter(
             is_published=True
         ).exclude(
@@ -590,36 +952,22 @@ def recommendations(request):
             author=user
         ).exclude(
             likes__user=user
-        ).annotate(
-            total_likes=Count('likes')
-        ).order_by('-total_likes', '-created_at')[:12 - len(recommended_recipes)]
+        ).order_by('-trending_score', '-created_at')[:limit - len(recommended_recipes)]
         
         recommended_recipes.extend(popular_recipes)
     
-    # Eliminar duplicados y limitar a 12 recetas
+    # Eliminar duplicados y limitar a `limit` recetas
     seen_ids = set()
     unique_recommendations = []
     for recipe in recommended_recipes:
         if recipe.id not in seen_ids:
             unique_recommendations.append(recipe)
             seen_ids.add(recipe.id)
-        if len(unique_recommendations) >= 12:
+        if len(unique_recommendations) >= limit:
             break
     
-    # Estadísticas para mostrar al usuario
-    stats = {
-        'total_likes': liked_recipes.count(),
-        'total_searches': search_history.count(),
-        'favorite_tags': preferences.favorite_tags.count(),
-        'favorite_ingredients': preferences.favorite_ingredients.count(),
-    }
+    return unique_recommendations
     
-    context = {
-        'recommended_recipes': unique_recommendations,
-        'stats': stats,
-        'preferences': preferences,
-    }
-    return render(request, 'recommendations.html', context)
 
 @login_required
 def update_preferences(request):
@@ -655,25 +1003,69 @@ def update_preferences(request):
     return render(request, 'update_preferences.html', context)
 
 # H10 - Recomendaciones inteligentes (IA)
+def smart_recommendations_fallback(request):
+    """Versión degradada de smart_recommendations cuando está saturada"""
+    return render(request, 'smart_recommendations.html', {
+        'recommended_recipes': get_popular_fallback(),
+        'algorithm_info': {'version': '2.0', 'last_updated': timezone.now()},
+        'degraded': True,
+    })
+
 @login_required
+@use_replica
+@admission_control('smart_recommendations', fallback=smart_recommendations_fallback)
 def smart_recommendations(request):
     """Vista para recomendaciones inteligentes que mejoran con el tiempo"""
     user = request.user
     
-    # Algoritmo de recomendaciones inteligente
-    recommendations = get_smart_recommendations(user)
+    # Algoritmo de recomendaciones inteligente (resultado cacheado por usuario)
+    trace = metrics.Trace('smart_recommendations')
+    recommendations = get_cached_smart_recommendations(user, trace=trace)
     
     context = {
-        'recommended_recipes': recommendations[:12],  # Limitar a 12 recetas
+        'recommended_recipes': recommendations,
         'algorithm_info': {
             'version': '2.0',
             'last_updated': timezone.now(),
             'total_analyzed': Recipe.objects.filter(is_published=True).count(),
-        }
+        },
+        # Desglose por etapas solo para administradores
+        'pipeline_trace': trace if user.role == 'admin' else None,
     }
     return render(request, 'smart_recommendations.html', context)
 
-def get_smart_recommendations(user):
+def _smart_recommendations_key(user, limit=12, trace=None):
+    # La versión del usuario cambia con cada me gusta suyo (ver main/signals.py)
+    return f'smart-recommendations:{user.id}:{limit}:{cache.scope_version(cache.user_scope(user.id))}'
+
+@cache.single_flight(cache.NS_RECOMMENDATIONS, _smart_recommendations_key, timeout=15 * 60, stale_timeout=60 * 60)
+def get_smart_recommendation_entries(user, limit=12, trace=None):
+    """[(id, puntuación)] de las recomendaciones inteligentes, calculadas una sola vez a la vez"""
+    return [(recipe.id, recipe.ai_score) for recipe in get_smart_recommendations(user, trace)[:limit]]
+
+def get_cached_smart_recommendations(user, limit=12, trace=None):
+    """
+    Recomendaciones inteligentes guardadas en caché como (id, puntuación) por
+    usuario; se invalidan con los me gusta del propio usuario y los de los demás
+    se notan al caducar (15 minutos). Mientras otra petición las recalcula se
+    sirven las anteriores. Las precalcula
+    warm_caches para los usuarios más activos. `trace` solo recibe etapas si
+    hubo que calcularlas.
+    """
+    entries = get_smart_recommendation_entries(user, limit, trace)
+    recipes = Recipe.objects.filter(
+        id__in=[recipe_id for recipe_id, score in entries], is_published=True
+    ).select_related('author').prefetch_related('tags', 'images').in_bulk()
+    
+    recommendations = []
+    for recipe_id, score in entries:
+        recipe = recipes.get(recipe_id)
+        if recipe:
+            recipe.ai_score = score
+            recommendations.append(recipe)
+    return recommendations
+
+def get_smart_recommendations(user, trace=None):
     """
     Algoritmo inteligente de recomendaciones que utiliza múltiples factores:
     1. Análisis de comportamiento del usuario
@@ -683,35 +1075,45 @@ def get_smart_recommendations(user):
     5. Machine Learning básico para scoring
     """
     
+    # Tiempo y consultas de cada etapa (ver main/metrics.py)
+    if trace is None:
+        trace = metrics.Trace('smart_recommendations')
+    
     # 1. Análisis del perfil del usuario
-    user_profile = analyze_user_profile(user)
+    with trace.span('profile'):
+        user_profile = analyze_user_profile(user)
     
     # 2. Encontrar usuarios similares (Collaborative Filtering)
-    similar_users = find_similar_users(user, user_profile)
+    with trace.span('neighbors'):
+        similar_users = find_similar_users(user, user_profile)
     
     # 3. Obtener todas las recetas candidatas
-    candidate_recipes = Recipe.objects.filter(
-        is_published=True
-    ).exclude(
-        author=user
-    ).exclude(
-        likes__user=user
-    ).select_related('author').prefetch_related('tags', 'ingredients', 'likes')
+    with trace.span('candidates'):
+        candidate_recipes = list(Recipe.objects.filter(
+            is_published=True
+        ).exclude(
+            author=user
+        ).exclude(
+            likes__user=user
+        ).select_related('author').prefetch_related('tags', 'ingredients', 'likes'))
     
     # 4. Calcular score inteligente para cada receta
-    scored_recipes = []
-    for recipe in candidate_recipes:
-        score = calculate_smart_score(recipe, user, user_profile, similar_users)
-        if score > 0:  # Solo incluir recetas con score positivo
-            recipe.ai_score = score
-            scored_recipes.append(recipe)
-    
-    # 5. Ordenar por score y aplicar diversidad
-    scored_recipes.sort(key=lambda x: x.ai_score, reverse=True)
+    with trace.span('scoring'):
+        scored_recipes = []
+        for recipe in candidate_recipes:
+            score = calculate_smart_score(recipe, user, user_profile, similar_users)
+            if score > 0:  # Solo incluir recetas con score positivo
+                recipe.ai_score = score
+                scored_recipes.append(recipe)
+        
+        # 5. Ordenar por score y aplicar diversidad
+        scored_recipes.sort(key=lambda x: x.ai_score, reverse=True)
     
     # 6. Aplicar diversidad para evitar recomendaciones repetitivas
-    diverse_recommendations = apply_diversity_filter(scored_recipes, user_profile)
+    with trace.span('diversity'):
+        diverse_recommendations = apply_diversity_filter(scored_recipes, user_profile)
     
+    trace.finish(user_id=user.id, candidates=len(candidate_recipes))
     return diverse_recommendations
 
 def analyze_user_profile(user):
@@ -738,13 +1140,8 @@ def analyze_user_profile(user):
         for ingredient in recipe.ingredients.all():
             profile['liked_ingredients'][ingredient.name] += 1
         
-        # Analizar tiempo de preparación
-        if recipe.total_time <= 30:
-            profile['time_preferences']['rápida'] += 1
-        elif recipe.total_time <= 60:
-            profile['time_preferences']['media'] += 1
-        else:
-            profile['time_preferences']['larga'] += 1
+        # Analizar tiempo de preparación (tramo calculado por la base de datos)
+        profile['time_preferences'][recipe.time_bucket] += 1
         
         # Analizar dificultad
         profile['difficulty_preference'][recipe.difficulty] += 1
@@ -777,9 +1174,9 @@ def find_similar_users(user, user_profile):
     if user_liked_recipes.exists():
         # Encontrar otros usuarios que también han dado like a esas recetas
         potential_similar_users = CustomUser.objects.filter(
-            likes__recipe__in=user_liked_recipes
+            recipelike__recipe__in=user_liked_recipes
         ).exclude(id=user.id).annotate(
-            common_likes=Count('likes', filter=Q(likes__recipe__in=user_liked_recipes))
+            common_likes=Count('recipelike', filter=Q(recipelike__recipe__in=user_liked_recipes))
         ).filter(common_likes__gt=0).order_by('-common_likes')[:10]
         
         for similar_user in potential_similar_users:
@@ -874,13 +1271,7 @@ def calculate_smart_score(recipe, user, user_profile, similar_users):
     diversity_bonus = random.uniform(0.05, 0.15)  # Elemento de diversidad aleatoria
     
     # 7. Score basado en preferencias de tiempo y dificultad
-    time_score = 0
-    if recipe.total_time <= 30 and 'rápida' in user_profile['time_preferences']:
-        time_score = 0.1
-    elif 30 < recipe.total_time <= 60 and 'media' in user_profile['time_preferences']:
-        time_score = 0.1
-    elif recipe.total_time > 60 and 'larga' in user_profile['time_preferences']:
-        time_score = 0.1
+    time_score = 0.1 if recipe.time_bucket in user_profile['time_preferences'] else 0
     
     difficulty_score = 0
     if recipe.difficulty in user_profile['difficulty_preference']:
@@ -1125,6 +1516,7 @@ def admin_tag_delete(request, tag_id):
     return render(request, 'admin_confirm_delete_tag.html', context)
 
 # Vista API para búsqueda de ingredientes
+@use_replica
 def search_ingredients_api(request):
     """API para buscar ingredientes en tiempo real"""
     query = request.GET.get('q', '').strip()
@@ -0,0 +1,112 @@
+"""
+Calentamiento de cachés tras un despliegue.
+
+Renderiza en el propio proceso (con el cliente de pruebas de Django, pasando
+por todos los middlewares) la portada y las primeras páginas del listado, y
+precalcula las recomendaciones inteligentes de los usuarios más activos. Así
+se llenan la caché compartida y la LRU del proceso antes de que lleguen los
+primeros visitantes. El detalle de receta no se calienta: no usa la caché.
+
+Las peticiones de calentamiento se marcan dentro del proceso (warmup_context)
+y no con una cabecera, que cualquier cliente podría enviar. Durante ellas no se
+ejecutan trabajos en hilos (jobs.is_eager): en el maestro de gunicorn un hilo
+vivo o un candado tomado al hacer fork pasaría a todos los workers.
+
+Lo usan el comando warm_caches y el hook when_ready de gunicorn.conf.py (con
+preload_app, el proceso maestro calienta y los workers heredan la LRU).
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import CustomUser
+
+# Las peticiones de calentamiento no cuentan como visitas ni generan eventos
+_warming = contextvars.ContextVar('cache_warmup', default=False)
+
+@dataclass
+class WarmupResult:
+    label: str
+    seconds: float
+    ok: bool
+    detail: str = ''
+
+@contextmanager
+def warmup_context():
+    """Marca como calentamiento las peticiones que se hagan en este hilo dentro del bloque"""
+    token = _warming.set(True)
+    try:
+        yield
+    finally:
+        _warming.reset(token)
+
+def in_warmup():
+    return _warming.get()
+
+def _get_page(path):
+    def run():
+        with warmup_context():
+            response = Client().get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f'HTTP {response.status_code}')
+    return run
+
+def _recommendations(user):
+    def run():
+        from .views import get_cached_smart_recommendations
+        get_cached_smart_recommendations(user)
+    return run
+
+def warmup_targets(list_pages=3, users=20):
+    """[(etiqueta, función)] con todo lo que se va a calentar"""
+    home = reverse('recipe_list')
+    targets = [('portada', _get_page(home))]
+    for sort in ('trending', 'likes'):
+        targets.append((f'listado ?sort={sort}', _get_page(f'{home}?sort={sort}')))
+    for page in range(2, list_pages + 1):
+        targets.append((f'listado página {page}', _get_page(f'{home}?page={page}')))
+
+    since = timezone.now() - timedelta(days=30)
+    active_users = CustomUser.objects.filter(role='user', is_active=True).annotate(
+        activity=Count('recipelike', filter=Q(recipelike__created_at__gte=since))
+    ).filter(activity__gt=0).order_by('-activity')[:users]
+    for user in active_users:
+        targets.append((f'recomendaciones de {user.username}', _recommendations(user)))
+    return targets
+
+def _run(target, deadline=None):
+    label, func = target
+    started = time.perf_counter()
+    if deadline is not None and started > deadline:
+        return WarmupResult(label, 0, False, 'tiempo agotado')
+    try:
+        func()
+    except Exception as e:
+        return WarmupResult(label, time.perf_counter() - started, False, f'{type(e).__name__}: {e}')
+    finally:
+        # Cada hilo usa su propia conexión; se cierra para no dejarla abierta
+        connection.close()
+    return WarmupResult(label, time.perf_counter() - started, True)
+
+def warm(targets, workers=4, progress=None, timeout=None):
+    """
+    Ejecuta los objetivos en paralelo y devuelve [WarmupResult] en el mismo
+    orden. Pasados `timeout` segundos no se empieza ninguno más
+    """
+    deadline = time.perf_counter() + timeout if timeout is not None else None
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(lambda target: _run(target, deadline), targets):
+            if progress:
+                progress(result)
+            results.append(result)
+    return results